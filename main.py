@@ -1,15 +1,30 @@
+import time
+STARTUP_T0 = time.perf_counter()  # reference point for the cold-start benchmark
+
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox
+import tkinter.font as tkfont
 import keyboard
 import threading
-import time
+import queue
 import sys
 import ctypes
 import json
 import os
 import winreg  # Do obsługi autostartu
-from PIL import Image, ImageDraw, ImageTk # Requires: pip install Pillow
-import pystray # Requires: pip install pystray
+# PIL (pip install Pillow) and pystray (pip install pystray) are imported lazily,
+# off the startup path - see create_app_icon() and SettingsApp.run_tray_icon().
+from t9core import (
+    DEFAULT_CHORD_WINDOW_MS, DEFAULT_CYCLE_KEY, DEFAULT_DELAY_MS, DEFAULT_MAPPING, KEY_NAMES,
+    AdaptiveTimeout, ChordDetector, DeadlineScheduler, KeyDispatcher, ModifierState, MultiTapCore,
+    parse_chord,
+)
+from t9dict import layout_index_path, letter_codes, load_dictionary
+from t9output import OutputQueue
+from t9metrics import (
+    Metrics, StatsServer, format_snapshot, read_control_file, remove_control_file, send_command,
+    write_control_file,
+)
 
 # =================================================================================
 # GLOBAL PATH HELPERS
@@ -31,37 +46,62 @@ APP_TITLE = "Mouse T9 Keypad"
 GITHUB_LINK = "github.com/wiciu1000/mouse_t9keypad"
 CONFIG_FILENAME = "mouse_t9keypad_config.json"
 CONFIG_FILE_PATH = os.path.join(get_app_path(), CONFIG_FILENAME)
-
-# Default English T9 mapping
-DEFAULT_MAPPING = {
-    'f13': ['.', ',', '?', '!', '1', '-', '@', ':'],  # Btn 1
-    'f14': ['a', 'b', 'c', '2'],                      # Btn 2
-    'f15': ['d', 'e', 'f', '3'],                      # Btn 3
-    'f16': ['g', 'h', 'i', '4'],                      # Btn 4
-    'f17': ['j', 'k', 'l', '5'],                      # Btn 5
-    'f18': ['m', 'n', 'o', '6'],                      # Btn 6
-    'f19': ['p', 'q', 'r', 's', '7'],                 # Btn 7
-    'f20': ['t', 'u', 'v', '8'],                      # Btn 8
-    'f21': ['w', 'x', 'y', 'z', '9'],                 # Btn 9
-    'f22': ['ENTER'],                                 # Btn 10
-    'f23': [' ', '0'],                                # Btn 11
-    'f24': ['BACKSPACE', '(', ')', '[', ']', '{', '}', '<', '>', '/', '\\', '*', '#'] # Btn 12
-}
+STATS_FILE_PATH = os.path.join(get_app_path(), "mouse_t9keypad_stats.txt")
+SESSION_LOG_PATH = os.path.join(get_app_path(), "mouse_t9keypad_session.t9rec")
+SUGGEST_SHOW_MS = 2500  # how long next-word suggestions stay on the overlay
+ICON_FILENAME = "t9_icon.png"
 
 DEFAULT_CONFIG = {
-    "delay": 800,
+    "delay": DEFAULT_DELAY_MS,
     "minimize_to_tray_on_close": False,
     "start_minimized": False,
     "run_on_startup": False,
+    "adaptive_delay": False,
+    "adaptive_model": {},
+    "predictive": False,
+    "t9_dictionary": "t9_words.txt",
+    "t9_cycle_key": DEFAULT_CYCLE_KEY,
+    "chording": False,  # two buttons pressed together type the chord's entry from "mapping"
+    "chord_window_ms": DEFAULT_CHORD_WINDOW_MS,
+    "snippets": {},  # abbreviation -> expansion, e.g. {";em": "name@example.com"}
+    "next_word": False,  # after a word, Btn 1 first cycles through likely next words
+    "next_word_file": "t9_ngrams",  # learned counts: t9_ngrams.snapshot + t9_ngrams.journal
+    "next_word_contexts": 5000,  # memory bound: previous words remembered per table
+    "output": "sendinput",  # prepared SendInput batches; "keyboard" = keyboard.write per call
+    "record_session": False,  # binary log of keypad events for bug reports (t9record.py reads it)
+    "record_max_mb": 16,
+    "stats_port": 0,  # e.g. 47913 to serve latency stats on 127.0.0.1 (0 = off)
+    "daemon_mode": False,  # run as a lean tray-less daemon (same as --daemon)
+    "daemon_overlay": True,  # daemon keeps the preview overlay (needs Tk)
+    "watch_config": True,  # apply edits other programs make to the config file while running
+    "layouts": {},  # named mappings, e.g. {"Polish": {...}}; "mapping" is the active one
+    "active_layout": "",
     "mapping": DEFAULT_MAPPING
 }
+# Read once at startup; a changed config file only records them
+RESTART_KEYS = ("stats_port", "daemon_mode", "daemon_overlay", "output", "record_max_mb", "watch_config",
+                "next_word_file", "next_word_contexts", "t9_dictionary")
 
 # =================================================================================
 # ICON GENERATOR (Procedural Pixel Art)
 # =================================================================================
 
+def get_icon_path():
+    """
+    Prebuilt icon asset: bundled next to the script (or inside the PyInstaller
+    bundle), otherwise generated once with PIL and cached next to the config.
+    """
+    bundle_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    for path in (os.path.join(bundle_dir, ICON_FILENAME), os.path.join(get_app_path(), ICON_FILENAME)):
+        if os.path.exists(path):
+            return path
+    path = os.path.join(get_app_path(), ICON_FILENAME)
+    create_app_icon().save(path)
+    return path
+
 def create_app_icon():
     """Generates a retro phone icon programmatically using PIL."""
+    from PIL import Image, ImageDraw
     size = 64
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0)) # Transparent bg
     draw = ImageDraw.Draw(img)
@@ -110,12 +150,20 @@ def create_app_icon():
 # =================================================================================
 
 class SystemUtils:
+    _user32 = None
+
+    @staticmethod
+    def user32():
+        """User32.dll handle, loaded once."""
+        if SystemUtils._user32 is None:
+            SystemUtils._user32 = ctypes.WinDLL("User32.dll")
+        return SystemUtils._user32
+
     @staticmethod
     def is_caps_lock_on():
         """Returns True if Caps Lock is toggled on."""
-        hllDll = ctypes.WinDLL("User32.dll")
         vk = 0x14
-        return hllDll.GetKeyState(vk) & 0x0001
+        return SystemUtils.user32().GetKeyState(vk) & 0x0001
 
     @staticmethod
     def set_startup(enable=True):
@@ -145,195 +193,1148 @@ class SystemUtils:
             print(f"Registry error: {e}")
             return False
 
+    @staticmethod
+    def refresh_rate():
+        """Primary display refresh rate in Hz (60 if it cannot be read)."""
+        try:
+            user32 = SystemUtils.user32()
+            hdc = user32.GetDC(0)
+            hz = ctypes.windll.gdi32.GetDeviceCaps(hdc, 116)  # VREFRESH
+            user32.ReleaseDC(0, hdc)
+            return hz if hz > 1 else 60
+        except Exception:
+            return 60
+
+    @staticmethod
+    def rss_mb():
+        """Resident memory (working set) of this process in MB."""
+        try:
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                        "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                        "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize / 2**20
+        except Exception:
+            import resource  # not Windows: peak RSS, in KB on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+    @staticmethod
+    def set_timer_resolution(ms=1):
+        """Asks Windows for 1 ms timer granularity (default is ~15.6 ms)."""
+        try:
+            ctypes.windll.winmm.timeBeginPeriod(ms)
+        except Exception:
+            pass
+
 # =================================================================================
 # CONFIG MANAGER
 # =================================================================================
 
 class ConfigManager:
+    """
+    Write-behind persistence. save() only serializes and returns; a background
+    timer writes the newest snapshot once changes settle (DEBOUNCE_S after the
+    last save(), so a slider drag is one write), skips the write when nothing
+    changed and replaces the file atomically (temp file + rename). A last-known-good copy (.bak) backs up load().
+    Writes are serialized, so the timer and flush() never share a temp file
+    or put an older snapshot over a newer one.
+    """
+    DEBOUNCE_S = 0.5
+    BACKUP_PATH = CONFIG_FILE_PATH + ".bak"
+
+    _lock = threading.Lock()
+    _write_lock = threading.Lock()  # held for a whole write, taken before _lock
+    _pending = None       # newest serialized config waiting to be written
+    _timer = None
+    _last_written = None  # text currently on disk
+
     @staticmethod
     def load():
-        if not os.path.exists(CONFIG_FILE_PATH):
-            print("Config not found. Creating default.")
-            ConfigManager.save(DEFAULT_CONFIG)
-            return DEFAULT_CONFIG.copy()
-        
-        try:
-            with open(CONFIG_FILE_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for key, val in DEFAULT_CONFIG.items():
-                    if key not in data:
-                        data[key] = val
-                return data
-        except Exception as e:
-            print(f"Error loading config: {e}")
-            return DEFAULT_CONFIG.copy()
+        for path in (CONFIG_FILE_PATH, ConfigManager.BACKUP_PATH):
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                data = json.loads(text)
+            except Exception as e:
+                print(f"Error loading config {path}: {e}")
+                continue
+
+            if path == CONFIG_FILE_PATH:
+                ConfigManager.note_written(text)
+            else:
+                print("Config was unreadable, restored last known good copy.")
+            for key, val in DEFAULT_CONFIG.items():
+                if key not in data:
+                    data[key] = json.loads(json.dumps(val))
+            ConfigManager.link_layouts(data)
+            return data
+
+        print("Config not found. Creating default.")
+        data = json.loads(json.dumps(DEFAULT_CONFIG))  # deep copy, DEFAULT_MAPPING stays pristine
+        ConfigManager.save(data)
+        return data
+
+    @staticmethod
+    def validate(data):
+        """Raises ValueError when data cannot be used as a config."""
+        if not isinstance(data, dict):
+            raise ValueError("not a JSON object")
+        for key, default in DEFAULT_CONFIG.items():
+            if key not in data:
+                continue
+            value = data[key]
+            if isinstance(default, bool):
+                ok = isinstance(value, bool)
+            elif isinstance(default, (int, float)):
+                ok = isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+            else:
+                ok = isinstance(value, type(default))
+            if not ok:
+                raise ValueError(f"bad value for {key}: {value!r}")
+        if data.get("delay", DEFAULT_DELAY_MS) <= 0:
+            raise ValueError("delay must be above 0")
+        for mapping in [data.get("mapping", {})] + list(data.get("layouts", {}).values()):
+            if not isinstance(mapping, dict) or not all(
+                    isinstance(chars, list) and all(isinstance(c, str) for c in chars) for chars in mapping.values()):
+                raise ValueError("a mapping needs a list of strings for every key")
+        if not all(isinstance(k, str) and isinstance(v, str) for k, v in data.get("snippets", {}).items()):
+            raise ValueError("snippets need text for both the abbreviation and the expansion")
+
+    @staticmethod
+    def merge(data, new):
+        """
+        Copies what differs in new into data and returns the changed keys. The
+        mapping is updated key by key in place (it may be linked to a layout);
+        the learned adaptive_model is never taken from the file. A new
+        active_layout first makes that layout's keys the mapping, so the old
+        layout keeps its own keys even if the file's mapping still holds them.
+        """
+        changed = set()
+        for key, value in new.items():
+            if key == "adaptive_model" or data.get(key) == value:
+                continue
+            changed.add(key)
+            if key != "mapping":
+                data[key] = value
+        layouts = data.get("layouts") or {}
+        if "active_layout" in changed and data["active_layout"] in layouts:
+            data["mapping"] = layouts[data["active_layout"]]
+        if "mapping" in changed:
+            mapping, value = data["mapping"], new["mapping"]
+            for name in [name for name in mapping if name not in value]:
+                del mapping[name]
+            mapping.update(value)
+        ConfigManager.link_layouts(data)
+        return changed
+
+    @staticmethod
+    def link_layouts(data):
+        """
+        With named layouts, "mapping" is the active one and the layouts entry
+        for it is the same dict, so key edits land in both. Without an
+        "active_layout", the mapping is kept as the "Default" layout.
+        """
+        layouts = data.get("layouts")
+        if not layouts:
+            return
+        active = data.get("active_layout") or "Default"
+        layouts[active] = data["mapping"]
+        data["active_layout"] = active
+
+    @staticmethod
+    def last_written():
+        """The config text on disk as far as this process knows (its own or one it read)."""
+        with ConfigManager._lock:
+            return ConfigManager._last_written
+
+    @staticmethod
+    def note_written(text):
+        with ConfigManager._lock:
+            ConfigManager._last_written = text
 
     @staticmethod
     def save(data):
         try:
-            with open(CONFIG_FILE_PATH, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            text = json.dumps(data, indent=4, ensure_ascii=False)
         except Exception as e:
             print(f"Error saving config: {e}")
+            return
+        with ConfigManager._lock:
+            ConfigManager._pending = text
+            if ConfigManager._timer is not None:
+                ConfigManager._timer.cancel()  # restart the wait
+            timer = threading.Timer(ConfigManager.DEBOUNCE_S, ConfigManager._write_pending)
+            timer.daemon = True
+            ConfigManager._timer = timer
+            timer.start()
+
+    @staticmethod
+    def flush():
+        """Writes any pending change now and waits for a write in flight (call before exit)."""
+        with ConfigManager._lock:
+            timer = ConfigManager._timer
+        if timer is not None:
+            timer.cancel()
+        ConfigManager._write_pending()
+
+    @staticmethod
+    def _write_pending():
+        with ConfigManager._write_lock:
+            with ConfigManager._lock:
+                text = ConfigManager._pending
+                ConfigManager._pending = None
+                ConfigManager._timer = None
+                previous = ConfigManager._last_written
+                if text is None or text == previous:
+                    return
+                # Recorded before the file appears, so the watcher never takes it for another writer's
+                ConfigManager._last_written = text
+            try:
+                ConfigManager._atomic_write(CONFIG_FILE_PATH, text)
+            except Exception as e:
+                ConfigManager.note_written(previous)  # still on disk; the next save tries again
+                print(f"Error saving config: {e}")
+                return
+            try:
+                ConfigManager._atomic_write(ConfigManager.BACKUP_PATH, text)
+            except Exception as e:
+                print(f"Error saving config backup: {e}")
+
+    @staticmethod
+    def _atomic_write(path, text):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+# =================================================================================
+# CONFIG FILE WATCHER
+# =================================================================================
+
+class ConfigWatcher:
+    """
+    Polls the config file's mtime and size. When another program (fleet
+    management, an editor) changes it, the file is read, parsed and validated
+    on the watcher thread and on_change gets the new config dict. Our own
+    writes are recognised by their text; files that fail validation are
+    reported and never reach the engine.
+    """
+    POLL_S = 1.0
+
+    def __init__(self, path, on_change):
+        self.path = path
+        self.on_change = on_change
+        self.stat = self.read_stat()
+        self.reloads = 0
+        self.rejected = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="T9ConfigWatch", daemon=True)
+        self._thread.start()
+
+    def read_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _run(self):
+        while not self._stop.wait(self.POLL_S):
+            stat = self.read_stat()
+            if stat is None or stat == self.stat:
+                continue
+            self.stat = stat
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Config watcher error: {e}")
+
+    def check(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        if text == ConfigManager.last_written():
+            return  # written by ConfigManager
+        try:
+            data = json.loads(text)
+            ConfigManager.validate(data)
+        except ValueError as e:
+            # A half-written file lands here too; the rest of the write changes the stat again
+            self.rejected += 1
+            print(f"Config file change rejected: {e}")
+            return
+        ConfigManager.note_written(text)
+        for key, val in DEFAULT_CONFIG.items():
+            if key not in data:
+                data[key] = json.loads(json.dumps(val))
+        self.reloads += 1
+        self.on_change(data)
+
+    def close(self):
+        self._stop.set()
 
 # =================================================================================
 # OVERLAY CLASS
 # =================================================================================
 
 class OverlayWindow(tk.Toplevel):
+    """
+    Preview next to the mouse pointer: the pending character (or word) in large
+    type, with the rest of the cycle in a strip underneath.
+    Everything is drawn on one Canvas whose items are created once and only
+    re-texted. Text widths come from a glyph cache that is filled for the whole
+    mapping up front (prepare), so a press never measures or re-lays out the
+    window. Redraws are coalesced to one per display frame, and the window is
+    only moved once the pointer has travelled MOVE_THRESHOLD_PX.
+    """
+    BG = "#f0f0f0"
+    FG = "#000000"
+    DIM = "#777777"
+    PAD_X = 15
+    PAD_Y = 5
+    STRIP_GAP = 8
+    OFFSET_PX = 20
+    MOVE_THRESHOLD_PX = 24
+    GLYPH_CACHE_LIMIT = 4096  # words in predictive mode grow the cache; cleared past this
+
     def __init__(self, master):
         super().__init__(master)
         self.overrideredirect(True)
         self.attributes("-topmost", True)
         self.attributes("-alpha", 0.9)
-        
-        self.label = tk.Label(
-            self, 
-            text="", 
-            font=("Roboto", 24, "bold"),
-            bg="#f0f0f0", fg="#000000",
-            padx=15, pady=5, borderwidth=2, relief="solid"
-        )
-        self.label.pack()
+
+        self.font_main = tkfont.Font(family="Roboto", size=24, weight="bold")
+        self.font_strip = tkfont.Font(family="Roboto", size=10)
+        self.font_current = tkfont.Font(family="Roboto", size=10, weight="bold")
+        self.main_h = self.font_main.metrics("linespace")
+        self.strip_h = self.font_strip.metrics("linespace")
+
+        self.canvas = tk.Canvas(self, bg=self.BG, highlightthickness=0, borderwidth=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.border = self.canvas.create_rectangle(0, 0, 0, 0, outline=self.FG, width=2)
+        self.main_item = self.canvas.create_text(0, self.PAD_Y, anchor="n", font=self.font_main, fill=self.FG)
+        self.strip_items = []
+
+        self.glyphs = {}            # (text, font name) -> width in px
+        self.frame_s = 1.0 / SystemUtils.refresh_rate()
+        self.frame_job = None
+        self.last_frame = 0.0
+        self.pending = None         # (text, candidates, index) waiting for the next frame
+        self.shown = None           # what the canvas currently shows
+        self.size = (0, 0)
+        self.placed = None          # (x, y, w, h) of the last geometry() call
+        self.anchor = None          # pointer position the window was last moved for
+        self.visible = False
         self.withdraw()
 
-    def show_char(self, char):
-        self.label.config(text=char)
+    # --- glyph cache ---
+    def measure(self, text, font):
+        key = (text, font.name)
+        width = self.glyphs.get(key)
+        if width is None:
+            if len(self.glyphs) >= self.GLYPH_CACHE_LIMIT:
+                self.glyphs.clear()
+            width = self.glyphs[key] = font.measure(text)
+        return width
+
+    def prepare(self, *tables):
+        """Measures every display string of the CompiledMappings in all three fonts."""
+        self.glyphs.clear()
+        for table in tables:
+            for strip in table.strips:
+                for mode in strip or ():
+                    for text in mode:
+                        self.measure(text, self.font_main)
+                        self.measure(text, self.font_strip)
+                        self.measure(text, self.font_current)
+        self.shown = None
+
+    # --- frame coalescing ---
+    def show(self, text, candidates=(), index=0):
+        self.pending = (text, candidates, index)
+        if self.frame_job is not None:
+            return
+        wait = self.last_frame + self.frame_s - time.perf_counter()
+        if wait <= 0:
+            self.render()
+        else:
+            self.frame_job = self.after(int(wait * 1000) + 1, self.render)
+
+    def render(self):
+        self.frame_job = None
+        if self.pending is None:
+            return
+        self.last_frame = time.perf_counter()
+        if self.pending != self.shown:
+            self.draw(*self.pending)
+            self.shown = self.pending
+        self.place()
+
+    def draw(self, text, candidates, index):
+        strip_n = len(candidates) if len(candidates) > 1 else 0
+        shown = self.shown
+        same_strip = shown is not None and shown[1] == candidates and self.strip_items
+        main_w = self.measure(text, self.font_main)
+        self.canvas.itemconfigure(self.main_item, text=text)
+
+        if same_strip and strip_n:
+            # Same cycle, next candidate: only the two highlighted items change
+            self.highlight(shown[2], False)
+            self.highlight(index, True)
+            width, height = self.size
+        else:
+            # Slots are as wide as the bold glyph, so moving the highlight never re-lays out
+            widths = [max(self.measure(c, self.font_strip), self.measure(c, self.font_current))
+                      for c in candidates[:strip_n]]
+            strip_w = sum(widths) + self.STRIP_GAP * max(0, strip_n - 1)
+            width = max(main_w, strip_w) + 2 * self.PAD_X
+            height = self.main_h + 2 * self.PAD_Y + (self.strip_h + self.PAD_Y if strip_n else 0)
+            while len(self.strip_items) < strip_n:
+                self.strip_items.append(self.canvas.create_text(0, 0, anchor="nw", state="hidden"))
+            x = (width - strip_w) / 2
+            y = self.main_h + self.PAD_Y * 2
+            for i in range(strip_n):
+                self.canvas.itemconfigure(self.strip_items[i], text=candidates[i], state="normal")
+                self.canvas.coords(self.strip_items[i], x, y)
+                self.highlight(i, i == index)
+                x += widths[i] + self.STRIP_GAP
+            for item in self.strip_items[strip_n:]:
+                self.canvas.itemconfigure(item, state="hidden")
+
+        # The big glyph can be wider than the strip it was laid out with
+        width = max(width, main_w + 2 * self.PAD_X)
+        if (width, height) != self.size:
+            self.size = (width, height)
+            self.canvas.coords(self.border, 1, 1, width - 1, height - 1)
+        self.canvas.coords(self.main_item, width / 2, self.PAD_Y)
+
+    def highlight(self, i, current):
+        if 0 <= i < len(self.strip_items):
+            self.canvas.itemconfigure(
+                self.strip_items[i],
+                font=self.font_current if current else self.font_strip,
+                fill=self.FG if current else self.DIM,
+            )
+
+    def place(self):
         try:
-            x, y = self.master.winfo_pointerxy()
-            self.geometry(f"+{x+20}+{y+20}")
+            px, py = self.winfo_pointerxy()
+        except tk.TclError:
+            return
+        if (self.anchor is None or not self.visible
+                or abs(px - self.anchor[0]) > self.MOVE_THRESHOLD_PX
+                or abs(py - self.anchor[1]) > self.MOVE_THRESHOLD_PX):
+            self.anchor = (px, py)
+        geom = (self.anchor[0] + self.OFFSET_PX, self.anchor[1] + self.OFFSET_PX) + self.size
+        if geom != self.placed:
+            self.placed = geom
+            self.geometry(f"{geom[2]}x{geom[3]}+{geom[0]}+{geom[1]}")
+        if not self.visible:
+            self.visible = True
             self.deiconify()
-        except:
-            pass
 
     def hide(self):
-        self.withdraw()
+        if self.frame_job is not None:
+            self.after_cancel(self.frame_job)
+            self.frame_job = None
+        self.pending = None
+        if self.visible:
+            self.visible = False
+            self.withdraw()
+
+class NullOverlay:
+    """Overlay stand-in for the daemon without Tk (daemon_overlay off)."""
+    def prepare(self, *tables):
+        pass
+
+    def show(self, text, candidates=(), index=0):
+        pass
+
+    def hide(self):
+        pass
 
 # =================================================================================
 # T9 ENGINE LOGIC
 # =================================================================================
 
+class KeyboardSink:
+    """Injects committed output through the keyboard module (runs on the OutputQueue thread)."""
+    def prepare(self, *tables):
+        pass  # keyboard.write resolves every character per call
+
+    def write(self, text):
+        keyboard.write(text)
+
+    def send(self, keys):
+        keyboard.send(keys)
+
+
+class HookModifiers(ModifierState):
+    """ModifierState fed by the engine's keyboard hook, seeded with the OS Caps Lock state."""
+    def __init__(self):
+        try:
+            caps = SystemUtils.is_caps_lock_on()
+        except Exception:
+            caps = False
+        super().__init__(caps)
+
+
+
 class T9Engine:
+    """
+    Tk/keyboard host around MultiTapCore: installs the hooks, marshals events
+    onto the GUI thread and acts as the core's view (overlay + status bar).
+    Commits fire on the DeadlineScheduler thread, so every core call holds
+    self.lock. View updates from that thread are put on a queue; the first
+    one after a drain wakes the Tk thread with a <<ViewQueue>> event, sent
+    from the T9ViewWake thread: calling into Tk from another thread waits
+    for the Tk thread, which may itself be waiting for self.lock.
+    With root=None (daemon without overlay) there is no Tk at all: presses
+    are handled on the hook thread, still under self.lock.
+    """
     def __init__(self, root, config_app):
         self.root = root
         self.config_app = config_app
-        self.overlay = OverlayWindow(root)
-        
-        self.current_key = None
-        self.char_index = 0
-        self.timer_id = None
-        
-        self.mapping = self.config_app.config_data["mapping"]
+        self.gui_thread = threading.current_thread()
+        self.overlay = OverlayWindow(root) if root is not None else NullOverlay()
+        SystemUtils.set_timer_resolution()
+        # Per-stage latency histograms; each is written by one thread only
+        self.metrics = Metrics()
+        self.hist_hook = self.metrics.hist['hook']
+        self.hist_queue = self.metrics.hist['hook_to_gui']
+        self.hist_press = self.metrics.hist['press']
+        self.scheduler = DeadlineScheduler(histogram=self.metrics.hist['commit_late'])
+        self.lock = self.scheduler.lock
+        self.modifiers = HookModifiers()
+        # OS injection runs on a writer thread, the GUI thread never waits on it
+        self.sink = self.make_sink()
+        self.output = OutputQueue(self.sink, histogram=self.metrics.hist['inject'])
+        self.stats_server = None
+        self.profiler = None  # t9profile.Profiler while profiling is on
+        self.chords = None    # ChordDetector while chording is on
+        self.recorder = None  # t9record.SessionRecorder while recording
+        self.next_word = False  # suggestions on (the model may still be loading)
+        self.view_queue = queue.SimpleQueue()  # (func, args) for the Tk thread
+        self.view_lock = threading.Lock()
+        self.view_wake_pending = False  # a <<ViewQueue>> event is on its way
+        self.view_wake = threading.Event()
+        self.view_closed = False
+        self.predictive_lock = threading.Lock()  # one set_predictive() at a time
+
+        self.core = MultiTapCore(
+            self.config_app.config_data["mapping"],
+            self.output,
+            self.scheduler,
+            self.modifiers,
+            self.config_app.config_data["delay"],
+            view=self,
+        )
+        self.core.cycle_key = self.config_app.config_data.get("t9_cycle_key", DEFAULT_CYCLE_KEY)
+        self.adaptive = AdaptiveTimeout.from_config(self.config_app.config_data.get("adaptive_model"))
+        self.set_adaptive(self.config_app.config_data.get("adaptive_delay", False))
+        self.set_chording(self.config_app.config_data.get("chording", False))
+        # Hooks go live on the plain mapping; the rest attaches as it is ready
         self.setup_hooks()
+        if self.root is not None:
+            self.root.bind("<<ViewQueue>>", self.drain_view_queue)
+            self.root.after_idle(self.drain_view_queue)  # anything queued before the main loop runs
+            threading.Thread(target=self.wake_gui, name="T9ViewWake", daemon=True).start()
+        if self.config_app.config_data.get("record_session", False):
+            self.start_recording()
+        self.setup_thread = threading.Thread(target=self.finish_setup, name="T9Setup", daemon=True)
+        self.setup_thread.start()
+
+    def finish_setup(self):
+        """
+        Background thread: layouts, output batches and glyphs, dictionary,
+        next-word model and snippets. Each is swapped into the core under
+        self.lock, so presses typed meanwhile just use what is there.
+        """
+        config = self.config_app.config_data
+        try:
+            self.set_layouts(config)  # also prepares the sink and the overlay
+            if config.get("predictive", False):
+                self.set_predictive(True)
+            if config.get("next_word", False):
+                self.set_next_word(True)
+            self.set_snippets(config.get("snippets") or {})
+        except Exception as e:
+            print(f"Startup error: {e}")
+            self.status(f"Startup error: {e}")
+
+    def make_sink(self):
+        if self.config_app.config_data.get("output", "sendinput") == "sendinput":
+            try:
+                from t9win import SendInputSink
+                return SendInputSink(keyboard)
+            except Exception as e:
+                print(f"SendInput output unavailable, using keyboard.write: {e}")
+        return KeyboardSink()
 
     def update_mapping(self, new_mapping):
-        self.mapping = new_mapping
+        with self.lock:
+            self.core.update_mapping(new_mapping)
+        self.prepare_output()
+        if self.core.predictive:
+            # Letters may have moved to other buttons - recompile the index
+            self.set_predictive(True)
+
+    def layout_tables(self):
+        """Every compiled layout (only the mapping's when no layouts are named)."""
+        return [table for mapping, table in self.core.layouts.values()] or [self.core.table]
+
+    def prepare_output(self):
+        # Batches and glyphs for all layouts, so switching needs neither
+        tables = self.layout_tables()
+        self.sink.prepare(*tables)
+        self.on_gui(self.overlay.prepare, *tables)
+
+    def set_layouts(self, config):
+        """Compiles the named layouts up front; the active one becomes the mapping."""
+        ConfigManager.link_layouts(config)
+        with self.lock:
+            self.core.set_layouts(config.get("layouts") or {}, config.get("active_layout"))
+        self.prepare_output()
+        if self.core.predictive:
+            self.set_predictive(True)  # indexes for the new layouts
+
+    def switch_layout(self, name=None):
+        """Named layout (None = the next one). Hooks, batches and glyphs stay as they are."""
+        with self.lock:
+            return self.core.switch_layout(name)
+
+    def set_predictive(self, enabled):
+        """
+        Turns T9 predictive mode on or off. Returns False if no dictionary is
+        available. Every named layout gets its index here (layouts with the
+        same letters share one), so switching layouts only selects one.
+        """
+        with self.predictive_lock:  # the startup thread and the settings UI may both call this
+            if self.core.dictionary is not None:
+                old = {id(d): d for d in [self.core.dictionary, *self.core.layout_dictionaries.values()]}
+                with self.lock:
+                    self.core.set_dictionary(None)
+                for d in old.values():
+                    d.close()
+            if not enabled:
+                return True
+
+            path = self.config_app.config_data.get("t9_dictionary", "t9_words.txt")
+            if not os.path.isabs(path):
+                path = os.path.join(get_app_path(), path)
+            default_codes = letter_codes(DEFAULT_MAPPING)
+            by_codes = {}  # sorted letter codes -> T9Dictionary
+
+            def load(mapping):
+                codes = letter_codes(mapping)
+                key = tuple(sorted(codes.items()))
+                if key not in by_codes:
+                    # The keypad's own letters keep the plain <list>.t9idx
+                    index_path = None if codes == default_codes else layout_index_path(path, codes)
+                    by_codes[key] = load_dictionary(path, mapping, index_path)
+                return by_codes[key]
+
+            try:
+                dictionary = load(self.core.mapping)
+                layouts = {name: load(mapping) for name, (mapping, table) in self.core.layouts.items()}
+            except Exception as e:
+                print(f"Error loading dictionary: {e}")
+                dictionary = None
+            if dictionary is None:
+                for d in by_codes.values():
+                    if d is not None:
+                        d.close()
+                self.status(f"No T9 dictionary: {path}")
+                return False
+            with self.lock:
+                self.core.set_dictionary(dictionary, layout_dictionaries=layouts)
+            return True
+
+    def set_delay(self, delay_ms):
+        self.core.delay_ms = delay_ms
+
+    def set_adaptive(self, enabled):
+        """Per-button learned timeouts; the delay slider becomes the upper bound."""
+        with self.lock:
+            self.core.adaptive = self.adaptive if enabled else None
+
+    def set_chording(self, enabled):
+        """Two-button chords from the mapping's "fNN+fMM" entries."""
+        window_ms = self.config_app.config_data.get("chord_window_ms", DEFAULT_CHORD_WINDOW_MS)
+        with self.lock:
+            if self.chords is not None:
+                self.chords.resolve()
+            # Own scheduler channel, so the chord window never moves the commit deadline
+            self.chords = ChordDetector(self.core, self.scheduler.channel('chord'), window_ms) if enabled else None
+
+    def set_snippets(self, snippets):
+        """Abbreviation expansion. The automaton is only rebuilt when the table changed."""
+        current = self.core.snippets
+        if (current.automaton.snippets if current is not None else {}) == snippets:
+            return
+        expander = None
+        if snippets:
+            from t9snippet import SnippetAutomaton, SnippetExpander  # only loaded when used
+            expander = SnippetExpander(SnippetAutomaton(snippets))
+        with self.lock:
+            self.core.snippets = expander
+
+    def set_next_word(self, enabled):
+        """Next-word suggestions. The model loads on a background thread."""
+        self.next_word = enabled
+        with self.lock:
+            model, self.core.next_words = self.core.next_words, None
+            self.core.suggestions = ()
+        if model is not None:
+            model.close()
+        if enabled:
+            threading.Thread(target=self.load_next_words, name="T9NgramLoad", daemon=True).start()
+
+    def load_next_words(self):
+        from t9ngram import NextWordModel  # only loaded when first used
+        config = self.config_app.config_data
+        path = config.get("next_word_file", "t9_ngrams")
+        if not os.path.isabs(path):
+            path = os.path.join(get_app_path(), path)
+        try:
+            model = NextWordModel(path, config.get("next_word_contexts", 5000)).load()
+        except OSError as e:
+            print(f"Error loading next-word model: {e}")
+            self.status(f"Next-word model error: {e}")
+            return
+        with self.lock:
+            # Switched off (or on again, with another load) while this one was loading
+            attach = self.next_word and self.core.next_words is None
+            if attach:
+                self.core.next_words = model
+        if not attach:
+            model.close()
+
+    def store_adaptive_model(self):
+        """Copies the learned tap timings into config_data (caller saves)."""
+        self.config_app.config_data["adaptive_model"] = self.adaptive.to_config()
+
+    def apply_config(self, config):
+        """Brings the running engine in line with a changed config dict."""
+        self.set_delay(config["delay"])
+        self.set_adaptive(config.get("adaptive_delay", False))
+        self.core.cycle_key = config.get("t9_cycle_key", DEFAULT_CYCLE_KEY)
+        ConfigManager.link_layouts(config)
+        if config["mapping"] != self.core.mapping:
+            self.update_mapping(config["mapping"])
+        layouts = {name: mapping for name, (mapping, table) in self.core.layouts.items()}
+        if (config.get("layouts") or {}) != layouts or (config.get("active_layout") or None) != self.core.layout:
+            self.set_layouts(config)
+        if config.get("predictive", False) != self.core.predictive:
+            self.set_predictive(config.get("predictive", False))
+        chording = config.get("chording", False)
+        window_s = config.get("chord_window_ms", DEFAULT_CHORD_WINDOW_MS) / 1000.0
+        if chording != (self.chords is not None) or (self.chords and self.chords.window_s != window_s):
+            self.set_chording(chording)
+        if config.get("next_word", False) != self.next_word:
+            self.set_next_word(config.get("next_word", False))
+        self.set_snippets(config.get("snippets") or {})
+
+    def apply_file_change(self, config, changed):
+        """Applies the keys ConfigManager.merge() changed; the rest of the engine is untouched."""
+        if "mapping" in changed:
+            self.update_mapping(config["mapping"])  # edited in place, apply_config cannot tell
+        self.apply_config(config)
+        restart = sorted(changed.intersection(RESTART_KEYS))
+        if restart:
+            print(f"Changed {', '.join(restart)}: takes effect after a restart")
+
+    def start_stats_server(self, port, commands=None):
+        """
+        Stats / control socket (None = off, 0 = a port the OS picks); hosts can
+        register extra commands. Its port and token go to the control file.
+        """
+        if port is None:
+            return
+        handlers = {"profile": self.profile_command, "record": self.record_command}
+        handlers.update(commands or {})
+        try:
+            self.stats_server = StatsServer(self.stats_snapshot, port, commands=handlers)
+            print(f"Latency stats on 127.0.0.1:{self.stats_server.port}")
+            write_control_file(self.stats_server.port, self.stats_server.token)
+        except OSError as e:
+            print(f"Stats socket error: {e}")
+
+    def stats_snapshot(self):
+        """Histograms plus the counters owned by the dispatcher, scheduler and output queue."""
+        dispatcher = getattr(self, 'dispatcher', None)
+        return self.metrics.snapshot({
+            "hook_events": dispatcher.events if dispatcher else 0,
+            "suppressed": dispatcher.suppressed if dispatcher else 0,
+            "timer_fired": self.scheduler.fired,
+            "timer_cancelled": self.scheduler.cancelled,
+            "chords": self.chords.chords if self.chords else 0,
+            "snippet_expansions": self.core.snippets.expansions if self.core.snippets else 0,
+            "next_word_contexts": len(self.core.next_words.bigrams.contexts) if self.core.next_words else 0,
+            "recorded": self.recorder.written if self.recorder else 0,
+            "record_dropped": self.recorder.dropped if self.recorder else 0,
+            "output_depth": self.output.depth(),
+        })
+
+    def dump_stats(self):
+        """Writes a readable stats report next to the config file. Returns its path."""
+        with open(STATS_FILE_PATH, 'w', encoding='utf-8') as f:
+            f.write(format_snapshot(self.stats_snapshot()) + "\n")
+        return STATS_FILE_PATH
+
+    # --- On-demand profiling ---
+    def profile_command(self, action):
+        if action == "start":
+            return {"profiling": self.start_profiling()}
+        return {"report": self.stop_profiling()}
+
+    def start_profiling(self):
+        """Profiles the hook, press, commit and injection paths until stopped."""
+        if self.profiler is not None:
+            return True
+        from t9profile import Profiler  # only loaded when first used
+        profiler = Profiler(get_app_path())
+        profiler.start()
+        self.profiler = self.scheduler.profiler = self.output.profiler = profiler
+        self.on_gui(self.config_app.update_status, "Profiling...")
+        return True
+
+    def stop_profiling(self):
+        """Writes the profile report next to the config file. Returns its path."""
+        profiler = self.profiler
+        if profiler is None:
+            return None
+        self.profiler = self.scheduler.profiler = self.output.profiler = None
+        path = profiler.stop()
+        print(f"Profile written to {path}")
+        self.on_gui(self.config_app.update_status, f"Profile: {os.path.basename(path)}")
+        return path
+
+    # --- Session recording ---
+    def record_command(self, action):
+        if action == "start":
+            return {"recording": self.start_recording()}
+        return {"log": self.stop_recording()}
+
+    def start_recording(self):
+        """Logs keypad events, previews, commits and output until stopped."""
+        if self.recorder is not None:
+            return SESSION_LOG_PATH
+        from t9record import SessionRecorder  # only loaded when first used
+        max_mb = self.config_app.config_data.get("record_max_mb", 16)
+        try:
+            recorder = SessionRecorder(SESSION_LOG_PATH, int(max_mb * 2**20))
+        except (OSError, ValueError) as e:
+            print(f"Recorder error: {e}")
+            return None
+        self.recorder = self.output.recorder = recorder
+        self.on_gui(self.config_app.update_status, "Recording session...")
+        return SESSION_LOG_PATH
+
+    def stop_recording(self):
+        """Flushes and closes the session log. Returns its path."""
+        recorder = self.recorder
+        if recorder is None:
+            return None
+        self.recorder = self.output.recorder = None
+        recorder.close()
+        print(f"Session log written to {recorder.path}")
+        return recorder.path
+
+    def shutdown(self):
+        """Commits the pending character and lets the writer threads finish."""
+        with self.lock:
+            if self.chords is not None:
+                self.chords.resolve()
+            self.core.flush()
+            self.store_adaptive_model()
+        self.stop_profiling()
+        self.scheduler.close()
+        self.view_closed = True
+        self.view_wake.set()
+        if self.stats_server is not None:
+            self.stats_server.close()
+            remove_control_file()
+        self.output.wait_idle(0.5)
+        self.output.close()
+        self.stop_recording()
+        if self.core.next_words is not None:
+            self.core.next_words.close()
+
+    @staticmethod
+    def build_scan_table():
+        """scan code -> 'f13'..'f24' for this machine's keyboard layout."""
+        table = {}
+        for key_name in KEY_NAMES:
+            try:
+                for code in keyboard.key_to_scan_codes(key_name):
+                    table[code] = key_name
+            except ValueError:
+                print(f"No scan code for {key_name}, matching by name.")
+        return table
 
     def setup_hooks(self):
         print("Installing hooks...")
         try:
-            for i in range(13, 25):
-                key_name = f'f{i}'
-                keyboard.on_press_key(key_name, self.on_key_press, suppress=True)
+            self.dispatcher = KeyDispatcher(
+                self.build_scan_table(), self.modifiers,
+                self.on_key_press, self.on_key_release,
+            )
+            # One suppressing hook for every key: returning False swallows the event
+            keyboard.hook(self.on_hook_event, suppress=True)
             print("Hooks active.")
         except Exception as e:
             self.config_app.update_status(f"HOOK ERROR: {e}")
 
-    def should_capitalize(self):
-        shift = keyboard.is_pressed('shift')
-        caps = SystemUtils.is_caps_lock_on()
-        return shift != caps 
+    def on_hook_event(self, event):
+        if self.profiler is not None:
+            return self.profiler.call(self.handle_hook_event, event)
+        return self.handle_hook_event(event)
+
+    def handle_hook_event(self, event):
+        t0 = time.perf_counter()
+        name = event.name.lower() if event.name else ''
+        down = event.event_type == keyboard.KEY_DOWN
+        suppress = self.dispatcher.dispatch(event.scan_code, name, down)
+        if suppress and self.recorder is not None:
+            # Keypad events only: the rest of the keyboard is never logged
+            key_name = self.dispatcher.scan_table.get(event.scan_code, name)
+            self.recorder.hook(key_name, down, self.modifiers.snapshot(), event.scan_code)
+        self.hist_hook.record(time.perf_counter() - t0)
+        return not suppress
+
+    def on_key_press(self, key_name, t):
+        if self.root is None:
+            self.process_key_gui_thread(key_name, t)
+        else:
+            self.root.after_idle(lambda: self.process_key_gui_thread(key_name, t))
 
-    def commit_char(self):
-        if self.current_key:
-            char_list = self.mapping.get(self.current_key, [])
-            if not char_list: return
-
-            char_to_type = char_list[self.char_index]
-            
-            is_ctrl = keyboard.is_pressed('ctrl')
-            is_shift = keyboard.is_pressed('shift')
-
-            if char_to_type == 'ENTER':
-                keyboard.send('enter')
-            elif char_to_type == 'SPACE':
-                keyboard.write(' ')
-            elif char_to_type == 'BACKSPACE':
-                keyboard.send('backspace')
+    def on_key_release(self, key_name, t, held_s):
+        if self.root is None:
+            self.release_gui_thread(key_name, held_s)
+        else:
+            self.root.after_idle(lambda: self.release_gui_thread(key_name, held_s))
+
+    def process_key_gui_thread(self, key_name, t=None):
+        t0 = time.perf_counter()
+        if t is not None:
+            self.hist_queue.record(t0 - t)
+        with self.lock:
+            if self.profiler is not None:
+                self.profiler.call(self.press_key, key_name, t)
             else:
-                if is_ctrl:
-                    keyboard.send(char_to_type.lower())
-                    mods = "Ctrl+"
-                    if is_shift: mods += "Shift+"
-                    self.config_app.update_status(f"Shortcut: {mods}{char_to_type.upper()}")
-                else:
-                    if self.should_capitalize() and len(char_to_type) == 1 and char_to_type.isalpha():
-                        char_to_type = char_to_type.upper()
-                    keyboard.write(char_to_type)
-                    self.config_app.update_status(f"Typed: {char_to_type}")
-            
-        self.current_key = None
-        self.char_index = 0
-        self.overlay.hide()
-        self.timer_id = None
-
-    def on_key_press(self, event):
-        key_name = event.name.lower()
-        self.root.after_idle(lambda: self.process_key_gui_thread(key_name))
-
-    def process_key_gui_thread(self, key_name):
-        self.config_app.update_status(f"Signal: {key_name.upper()}")
-        
-        if key_name not in self.mapping:
-            return
+                self.press_key(key_name, t)
+        self.hist_press.record(time.perf_counter() - t0)
 
-        char_list = self.mapping[key_name]
-        if not char_list: return
+    def release_gui_thread(self, key_name, held_s):
+        with self.lock:
+            if self.profiler is not None:
+                self.profiler.call(self.release_key, key_name, held_s)
+            else:
+                self.release_key(key_name, held_s)
 
-        if self.current_key == key_name and self.timer_id is not None:
-            self.root.after_cancel(self.timer_id)
-            self.char_index = (self.char_index + 1) % len(char_list)
+    def press_key(self, key_name, t):
+        if self.chords is not None:
+            self.chords.press(key_name, t)
         else:
-            if self.current_key is not None:
-                self.commit_char()
-            self.current_key = key_name
-            self.char_index = 0
+            self.core.press(key_name)
 
-        preview_char = char_list[self.char_index]
-        
-        display_text = preview_char
-        
-        is_ctrl = keyboard.is_pressed('ctrl')
-        is_shift = keyboard.is_pressed('shift')
-
-        if preview_char == 'BACKSPACE':
-             display_text = "<<"
-        elif preview_char != 'ENTER':
-            if is_ctrl:
-                mods = "Ctrl+"
-                if is_shift: mods += "Shift+"
-                display_text = f"{mods}{preview_char.upper()}"
-            elif self.should_capitalize() and len(preview_char) == 1 and preview_char.isalpha():
-                display_text = preview_char.upper()
-
-        self.overlay.show_char(display_text)
-        
-        delay_ms = self.config_app.config_data["delay"]
-        self.timer_id = self.root.after(delay_ms, self.commit_char)
+    def release_key(self, key_name, held_s):
+        if self.chords is None or not self.chords.release(key_name):
+            self.core.release(key_name, held_s)
+
+    def commit_char(self):
+        with self.lock:
+            self.core.commit()
+
+    def on_gui(self, func, *args):
+        """Runs func on the Tk thread (directly if already there, else queued)."""
+        if self.root is None or threading.current_thread() is self.gui_thread:
+            func(*args)
+        else:
+            self.post_gui(func, *args)
+
+    def post_gui(self, func, *args):
+        """Queues func for the Tk thread; only the first item after a drain wakes it."""
+        self.view_queue.put((func, args))
+        with self.view_lock:
+            if self.view_wake_pending:
+                return
+            self.view_wake_pending = True
+        self.view_wake.set()
+
+    def wake_gui(self):
+        """T9ViewWake thread: the only caller into Tk on behalf of other threads, holding no lock."""
+        while True:
+            self.view_wake.wait()
+            self.view_wake.clear()
+            if self.view_closed:
+                return
+            try:
+                self.root.event_generate("<<ViewQueue>>", when="tail")
+            except Exception as e:  # Tk not running its main loop (any more)
+                print(f"View wake failed: {e}")
+                with self.view_lock:
+                    self.view_wake_pending = False  # the next update tries again
+
+    def drain_view_queue(self, event=None):
+        """Tk thread: applies the queued view updates."""
+        with self.view_lock:
+            self.view_wake_pending = False  # items queued from here on send a new wake
+        while True:
+            try:
+                func, args = self.view_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"View update failed: {e}")
+
+    # --- MultiTapCore view ---
+    def signal(self, key_name):
+        # A press held back for a chord reaches the core on the scheduler thread
+        self.on_gui(self.show_signal, key_name)
+
+    def show_signal(self, key_name):
+        ui = self.config_app.ui
+        ui.set_status(f"Signal: {key_name.upper()}")
+        ui.set_active_key(key_name)
+
+    def preview(self, text, candidates=(), index=0):
+        if self.recorder is not None:
+            self.recorder.preview(self.core.current_key, text)
+        self.on_gui(self.overlay.show, text, candidates, index)
+
+    def hide(self):
+        self.on_gui(self.hide_if_idle)
+
+    def hide_if_idle(self):
+        # A hide posted by the scheduler thread can arrive after the next press
+        # already showed a new preview; only hide when nothing is pending.
+        if self.core.current_key is None and not self.core.word_seq:
+            self.overlay.hide()
+            self.config_app.ui.set_active_key(None)
+
+    def status(self, text):
+        self.on_gui(self.config_app.update_status, text)
+
+    def layout_changed(self, name):
+        # Called inside press() / commit(): the follow-up runs after them
+        self.metrics.incr('layout_switches')
+        if self.root is not None:
+            self.post_gui(self.show_layout, name)
+        else:
+            threading.Thread(target=self.show_layout, args=(name,), daemon=True).start()
+
+    def show_layout(self, name):
+        # The core already selected the layout's dictionary index
+        self.config_app.layout_switched(name)
+
+    def suggest(self, words):
+        self.metrics.incr('suggestions')
+        self.on_gui(self.show_suggestions, words)
+
+    def show_suggestions(self, words):
+        # Only while no new cycle has started; Btn 1 types the first one
+        if self.core.current_key is None and not self.core.word_seq:
+            self.overlay.show(words[0], words, 0)
+            if self.root is not None:
+                self.root.after(SUGGEST_SHOW_MS, self.hide_if_idle)
+
+    def committed(self, seq, char):
+        self.metrics.incr('commits')
+        if self.recorder is not None:
+            self.recorder.commit(self.core.current_key, char)
 
 # =================================================================================
 # UI ELEMENTS
 # =================================================================================
 
+class UiRefresh:
+    """
+    Coalesces status bar and keypad highlight updates for the settings window.
+    Producers only store the latest value; a refresh applies it at most once
+    per FRAME_MS, and nothing is applied while the window is hidden (the
+    latest values are applied when it is shown again). Tk thread only.
+    """
+    FRAME_MS = 50
+
+    def __init__(self, root):
+        self.root = root
+        self.visible = False
+        self.job = None
+        self.status = "Ready"
+        self.active_key = None
+        self.status_label = None
+        self.keys = {}
+        self.shown_status = None
+        self.shown_key = None
+
+    def attach(self, status_label, keys):
+        """Widgets to update, once the settings UI has been built."""
+        self.status_label = status_label
+        self.keys = keys
+        self.shown_status = None
+        self.shown_key = None
+
+    def set_status(self, text):
+        self.status = text
+        self.request()
+
+    def set_active_key(self, key_name):
+        if key_name != self.active_key:
+            self.active_key = key_name
+            self.request()
+
+    def set_visible(self, visible):
+        self.visible = visible
+        if visible:
+            self.request()
+
+    def request(self):
+        if self.visible and self.job is None:
+            self.job = self.root.after(self.FRAME_MS, self.refresh)
+
+    def refresh(self):
+        self.job = None
+        if not self.visible or self.status_label is None:
+            return
+        if self.status != self.shown_status:
+            self.status_label.config(text=self.status)
+            self.shown_status = self.status
+        if self.active_key != self.shown_key:
+            old = self.keys.get(self.shown_key)
+            new = self.keys.get(self.active_key)
+            if old is not None:
+                old.set_active(False)
+            if new is not None:
+                new.set_active(True)
+            self.shown_key = self.active_key
+
+
 class PhoneKey(tk.Frame):
+    BG = "#e1e1e1"
+    BG_ACTIVE = "#b9d4f5"
+
     def __init__(self, master, number, chars, command):
-        super().__init__(master, relief="raised", borderwidth=2, bg="#e1e1e1")
+        super().__init__(master, relief="raised", borderwidth=2, bg=self.BG)
         self.command = command
         self.bind("<Button-1>", self.on_click)
         
         container = tk.Frame(self, bg="#e1e1e1")
         container.pack(expand=True, fill="both", padx=2, pady=2)
         container.bind("<Button-1>", self.on_click)
+        self.container = container
         
         self.lbl_num = tk.Label(container, text=str(number), font=("Roboto", 16, "bold"), bg="#e1e1e1", fg="#333")
         self.lbl_num.pack(pady=(2, 0))
@@ -355,6 +1356,13 @@ class PhoneKey(tk.Frame):
         if "BACKSPACE" in chars: clean_chars = "<<"
         self.lbl_chars.config(text=clean_chars)
 
+    def set_active(self, active):
+        """Lights the key while its button is cycling (called by UiRefresh)."""
+        bg = self.BG_ACTIVE if active else self.BG
+        self.config(bg=bg, relief="sunken" if active else "raised")
+        for widget in (self.container, self.lbl_num, self.lbl_chars):
+            widget.config(bg=bg)
+
     def on_click(self, event):
         if self.command:
             self.command()
@@ -364,47 +1372,103 @@ class PhoneKey(tk.Frame):
 # =================================================================================
 
 class SettingsApp(tk.Tk):
-    def __init__(self):
+    """
+    Startup order matters: the hooks go live first, everything else (icon,
+    tray, the settings window itself) is deferred. With start_minimized the
+    settings UI is only built the first time it is shown.
+
+    With remote (a RemoteEngine) this is the short-lived settings process of
+    a daemon: no hooks, no tray, and config changes go to the daemon.
+    config_data is the config already loaded at startup, if any.
+    """
+    def __init__(self, remote=None, config_data=None):
         try:
             ctypes.windll.shcore.SetProcessDpiAwareness(1)
         except Exception:
             pass 
 
         super().__init__()
+        self.withdraw()  # stays hidden until the UI is built
         self.title(APP_TITLE)
-        
-        # Generowanie i ustawianie ikony aplikacji
-        self.app_icon_img = create_app_icon()
-        self.tk_icon = ImageTk.PhotoImage(self.app_icon_img)
-        self.iconphoto(False, self.tk_icon)
-        
         self.geometry("400x600")
         self.minsize(300, 400)
         self.resizable(True, True) 
         
-        style = ttk.Style()
-        style.configure(".", font=("Roboto", 10))
-        style.configure("TLabel", font=("Roboto", 10))
-        style.configure("TButton", font=("Roboto", 10))
-        
-        self.config_data = ConfigManager.load()
+        self.remote = remote
+        if remote:
+            self.config_data = remote.fetch_config()
+        else:
+            self.config_data = config_data if config_data is not None else ConfigManager.load()
+        ConfigManager.link_layouts(self.config_data)
         
         self.delay_var = tk.IntVar(value=self.config_data["delay"])
         self.minimize_tray_var = tk.BooleanVar(value=self.config_data["minimize_to_tray_on_close"])
         self.startup_var = tk.BooleanVar(value=self.config_data.get("run_on_startup", False))
+        self.adaptive_var = tk.BooleanVar(value=self.config_data.get("adaptive_delay", False))
+        self.predictive_var = tk.BooleanVar(value=self.config_data.get("predictive", False))
+        self.chording_var = tk.BooleanVar(value=self.config_data.get("chording", False))
+        self.next_word_var = tk.BooleanVar(value=self.config_data.get("next_word", False))
+
+        self.ui_built = False
+        self.lbl_status = None
+        self.ui = UiRefresh(self)
+        self.tray_icon = None
+        self.config_watcher = None
         
-        self.create_tray_icon()
-        self.create_widgets()
+        if remote:
+            self.engine = remote
+        else:
+            self.engine = T9Engine(self, self)
+            self.engine.start_stats_server(self.config_data.get("stats_port") or None)
+        self.hooks_live_ms = (time.perf_counter() - STARTUP_T0) * 1000
+        if not remote:
+            print(f"Hooks live after {self.hooks_live_ms:.0f} ms")
+            if self.config_data.get("watch_config", True):
+                self.config_watcher = ConfigWatcher(
+                    CONFIG_FILE_PATH, lambda data: self.after(0, self.config_file_changed, data))
         
+        self.protocol("WM_DELETE_WINDOW", self.on_close_window)
+
+        self.after_idle(self.finish_startup)
+        if remote or not self.config_data.get("start_minimized", False):
+            self.after_idle(self.show_settings)
+
+    def finish_startup(self):
+        """Deferred part of startup: window icon, tray icon, admin check."""
+        try:
+            self.tk_icon = tk.PhotoImage(file=get_icon_path())
+            self.iconphoto(False, self.tk_icon)
+        except Exception as e:
+            print(f"Icon error: {e}")
+        if self.remote:
+            return  # the daemon owns the hooks; this process only lives while the window is open
+        threading.Thread(target=self.run_tray_icon, daemon=True).start()
+
         if not self.is_admin():
             self.show_admin_warning()
-        
-        self.engine = T9Engine(self, self)
-        
-        self.protocol("WM_DELETE_WINDOW", self.on_close_window)
 
-        if self.config_data.get("start_minimized", False):
-            self.withdraw()
+    def build_ui(self):
+        style = ttk.Style()
+        style.configure(".", font=("Roboto", 10))
+        style.configure("TLabel", font=("Roboto", 10))
+        style.configure("TButton", font=("Roboto", 10))
+
+        self.create_widgets()
+        self.ui.attach(self.lbl_status, self.map_keys)
+        self.bind("<Map>", self.on_map_change)
+        self.bind("<Unmap>", self.on_map_change)
+        self.ui_built = True
+        self.ui_ready_ms = (time.perf_counter() - STARTUP_T0) * 1000
+
+    def show_settings(self):
+        if not self.ui_built:
+            self.build_ui()
+        self.deiconify()
+
+    def on_map_change(self, event):
+        # Children's Map/Unmap events reach this binding too
+        if event.widget is self:
+            self.ui.set_visible(event.type == tk.EventType.Map)
 
     def is_admin(self):
         try:
@@ -415,12 +1479,52 @@ class SettingsApp(tk.Tk):
     def show_admin_warning(self):
         tk.messagebox.showwarning("Admin Required", "Run as Administrator to enable key hooks!")
 
-    def create_tray_icon(self):
-        # Używamy tej samej ikony co dla okna, ale w formacie PIL
-        image = self.app_icon_img
+    def run_tray_icon(self):
+        """Tray thread: pystray and PIL are imported here, not at startup."""
+        import pystray
+        from PIL import Image
+
+        image = Image.open(get_icon_path())
         
         def show_window(icon, item):
-            self.after(0, self.deiconify)
+            self.after(0, self.show_settings)
+
+        def dump_stats(icon, item):
+            try:
+                path = self.engine.dump_stats()
+                icon.notify(f"Latency stats written to {path}", "Mouse T9 Keypad")
+            except Exception as e:
+                print(f"Stats dump error: {e}")
+
+        def toggle_profiling(icon, item):
+            try:
+                if self.engine.profiler is None:
+                    self.engine.start_profiling()
+                else:
+                    path = self.engine.stop_profiling()
+                    icon.notify(f"Profile written to {path}", "Mouse T9 Keypad")
+            except Exception as e:
+                print(f"Profiling error: {e}")
+
+        def toggle_recording(icon, item):
+            try:
+                if self.engine.recorder is None:
+                    self.engine.start_recording()
+                else:
+                    path = self.engine.stop_recording()
+                    icon.notify(f"Session log written to {path}", "Mouse T9 Keypad")
+            except Exception as e:
+                print(f"Recorder error: {e}")
+
+        def select_layout(icon, item):
+            self.after(0, self.switch_layout, item.text)
+
+        def layout_items():
+            return [
+                pystray.MenuItem(name, select_layout, radio=True,
+                                 checked=lambda item: item.text == self.config_data.get("active_layout"))
+                for name in self.config_data.get("layouts") or {}
+            ]
 
         def quit_app(icon, item):
             icon.stop()
@@ -428,11 +1532,22 @@ class SettingsApp(tk.Tk):
 
         menu = pystray.Menu(
             pystray.MenuItem('Show Settings', show_window, default=True),
+            pystray.MenuItem('Dump stats', dump_stats),
+            pystray.MenuItem(
+                lambda item: 'Stop profiling' if self.engine.profiler is not None else 'Start profiling',
+                toggle_profiling,
+            ),
+            pystray.MenuItem(
+                lambda item: 'Stop recording' if self.engine.recorder is not None else 'Record session',
+                toggle_recording,
+            ),
+            pystray.MenuItem('Layout', pystray.Menu(layout_items),
+                             visible=lambda item: bool(self.config_data.get("layouts"))),
             pystray.MenuItem('Exit', quit_app)
         )
         
         self.tray_icon = pystray.Icon("MouseT9Keypad", image, "Mouse T9 Keypad", menu)
-        threading.Thread(target=self.tray_icon.run, daemon=True).start()
+        self.tray_icon.run()
 
     def create_widgets(self):
         notebook = ttk.Notebook(self)
@@ -485,6 +1600,14 @@ class SettingsApp(tk.Tk):
         scale = ttk.Scale(lf_time, from_=200, to=2000, variable=self.delay_var, command=self.on_delay_change)
         scale.pack(fill="x", pady=5)
 
+        chk_adaptive = ttk.Checkbutton(
+            lf_time,
+            text="Adapt to my tapping speed (delay above is the maximum)",
+            variable=self.adaptive_var,
+            command=self.toggle_adaptive
+        )
+        chk_adaptive.pack(anchor="w", pady=2)
+
         lf_sys = ttk.LabelFrame(frame, text="System & Startup", padding=10)
         lf_sys.pack(fill="x", pady=10)
         
@@ -504,6 +1627,33 @@ class SettingsApp(tk.Tk):
         )
         chk_startup.pack(anchor="w", pady=2)
 
+        lf_mode = ttk.LabelFrame(frame, text="Typing Mode", padding=10)
+        lf_mode.pack(fill="x", pady=10)
+
+        chk_predictive = ttk.Checkbutton(
+            lf_mode,
+            text="Predictive text (one press per letter, Btn 1 = next word)",
+            variable=self.predictive_var,
+            command=self.toggle_predictive
+        )
+        chk_predictive.pack(anchor="w", pady=2)
+
+        chk_chording = ttk.Checkbutton(
+            lf_mode,
+            text="Chords (press two buttons together, set up on the Keypad tab)",
+            variable=self.chording_var,
+            command=self.toggle_chording
+        )
+        chk_chording.pack(anchor="w", pady=2)
+
+        chk_next_word = ttk.Checkbutton(
+            lf_mode,
+            text="Suggest the next word (Btn 1 after a space)",
+            variable=self.next_word_var,
+            command=self.toggle_next_word
+        )
+        chk_next_word.pack(anchor="w", pady=2)
+
         btn_save = ttk.Button(frame, text="Save Configuration", command=self.save_settings)
         btn_save.pack(pady=20)
 
@@ -511,7 +1661,22 @@ class SettingsApp(tk.Tk):
         frame = ttk.Frame(parent, padding=15)
         frame.pack(fill="both", expand=True)
         
-        ttk.Label(frame, text="Click a key to edit characters.", font=("Roboto", 10, "italic")).pack(pady=(0, 15))
+        ttk.Label(frame, text="Click a key to edit characters.", font=("Roboto", 10, "italic")).pack(pady=(0, 10))
+
+        layout_bar = ttk.Frame(frame)
+        layout_bar.pack(fill="x", pady=(0, 10))
+        ttk.Label(layout_bar, text="Layout:").pack(side="left")
+        self.layout_var = tk.StringVar(value=self.config_data.get("active_layout", ""))
+        self.layout_combo = ttk.Combobox(
+            layout_bar,
+            textvariable=self.layout_var,
+            values=list(self.config_data.get("layouts") or {}),
+            state="readonly",
+            width=16
+        )
+        self.layout_combo.pack(side="left", padx=5)
+        self.layout_combo.bind("<<ComboboxSelected>>", lambda e: self.switch_layout(self.layout_var.get()))
+        ttk.Button(layout_bar, text="New...", command=self.new_layout).pack(side="left")
 
         grid_container = ttk.Frame(frame)
         grid_container.pack(expand=True, fill="both") 
@@ -539,16 +1704,183 @@ class SettingsApp(tk.Tk):
             key_widget.grid(row=r, column=c, padx=3, pady=3, sticky="nsew")
             self.map_keys[key_code] = key_widget
 
+        ttk.Button(frame, text="Edit Chords...", command=self.edit_chords).pack(pady=(10, 0))
+        ttk.Button(frame, text="Edit Snippets...", command=self.edit_snippets).pack(pady=(5, 0))
+
     def toggle_startup(self):
         state = self.startup_var.get()
         success = SystemUtils.set_startup(state)
         if success:
             self.config_data["run_on_startup"] = state
-            ConfigManager.save(self.config_data)
+            self.save_config()
         else:
             messagebox.showerror("Registry Error", "Could not update startup registry key.\nTry running as Administrator.")
             self.startup_var.set(not state)
 
+    def toggle_adaptive(self):
+        state = self.adaptive_var.get()
+        self.engine.set_adaptive(state)
+        self.config_data["adaptive_delay"] = state
+        self.save_config()
+
+    def toggle_predictive(self):
+        state = self.predictive_var.get()
+        if self.engine.set_predictive(state):
+            self.config_data["predictive"] = state
+            self.save_config()
+            self.update_status("Predictive text on." if state else "Multi-tap mode.")
+        else:
+            messagebox.showerror("Dictionary Error", "Could not load the T9 word list.\nCheck 't9_dictionary' in the config file.")
+            self.predictive_var.set(False)
+
+    def toggle_chording(self):
+        state = self.chording_var.get()
+        self.config_data["chording"] = state
+        self.engine.set_chording(state)
+        self.save_config()
+        self.update_status("Chords on." if state else "Chords off.")
+
+    def toggle_next_word(self):
+        state = self.next_word_var.get()
+        self.config_data["next_word"] = state
+        self.engine.set_next_word(state)
+        self.save_config()
+        self.update_status("Next-word suggestions on." if state else "Next-word suggestions off.")
+
+    def config_file_changed(self, data):
+        """The config file was changed by another program and validated: applies the difference."""
+        changed = ConfigManager.merge(self.config_data, data)
+        if not changed:
+            return
+        self.engine.apply_file_change(self.config_data, changed)
+        if "run_on_startup" in changed:
+            SystemUtils.set_startup(self.config_data["run_on_startup"])
+        self.delay_var.set(self.config_data["delay"])
+        self.minimize_tray_var.set(self.config_data["minimize_to_tray_on_close"])
+        self.startup_var.set(self.config_data.get("run_on_startup", False))
+        self.adaptive_var.set(self.config_data.get("adaptive_delay", False))
+        self.predictive_var.set(self.engine.core.predictive)
+        self.chording_var.set(self.config_data.get("chording", False))
+        self.next_word_var.set(self.config_data.get("next_word", False))
+        if self.ui_built:
+            self.lbl_time_val.config(text=f"{self.config_data['delay']} ms")
+            self.layout_var.set(self.config_data.get("active_layout", ""))
+            self.layout_combo.config(values=list(self.config_data.get("layouts") or {}))
+            for key_code, widget in self.map_keys.items():
+                widget.update_chars(self.config_data["mapping"].get(key_code, []))
+        if self.tray_icon is not None:
+            self.tray_icon.update_menu()
+        self.update_status(f"Config reloaded: {', '.join(sorted(changed))}")
+
+    def switch_layout(self, name):
+        if self.engine.switch_layout(name) and self.remote:
+            self.layout_switched(name)  # the daemon's engine reports to its own host
+
+    def layout_switched(self, name):
+        """The engine switched layouts: the config and the Keypad tab follow."""
+        self.config_data["active_layout"] = name
+        self.config_data["mapping"] = self.config_data["layouts"][name]
+        if self.ui_built:
+            self.layout_var.set(name)
+            for key_code, widget in self.map_keys.items():
+                widget.update_chars(self.config_data["mapping"].get(key_code, []))
+        self.save_config()
+        self.update_status(f"Layout: {name}")
+        if self.tray_icon is not None:
+            self.tray_icon.update_menu()
+
+    def new_layout(self):
+        """Copies the current keys into a new named layout and switches to it."""
+        name = simpledialog.askstring("New Layout", "Name for a copy of the current keys:", parent=self)
+        if name is None or not name.strip():
+            return
+        name = name.strip()
+        layouts = self.config_data.setdefault("layouts", {})
+        if name in layouts:
+            messagebox.showerror("Layout Error", f"There is already a layout named {name}.")
+            return
+        layouts[name] = json.loads(json.dumps(self.config_data["mapping"]))
+        ConfigManager.link_layouts(self.config_data)  # the keys so far stay as "Default" if unnamed
+        self.engine.set_layouts(self.config_data)
+        self.layout_combo.config(values=list(layouts))
+        self.switch_layout(name)
+
+    def edit_chords(self):
+        """Chords as 'button+button=character' pairs, e.g. 2+3=e; 5+6=n."""
+        mapping = self.config_data["mapping"]
+        current = [(parse_chord(name), chars) for name, chars in mapping.items() if '+' in name]
+        current_str = "; ".join(
+            f"{KEY_NAMES.index(keys[0]) + 1}+{KEY_NAMES.index(keys[1]) + 1}={chars[0]}"
+            for keys, chars in current if keys and chars
+        )
+
+        new_str = simpledialog.askstring(
+            "Edit Chords",
+            "Enter chords separated by semicolons:\n(e.g., 2+3=e; 5+6=n  -  numbers are the keys)",
+            initialvalue=current_str,
+            parent=self
+        )
+        if new_str is None:
+            return
+
+        chords = {}
+        for item in new_str.split(';'):
+            item = item.strip()
+            if not item:
+                continue
+            pair, sep, char = item.partition('=')
+            try:
+                a, b = sorted(int(n) for n in pair.split('+'))
+                keys = parse_chord(f"{KEY_NAMES[a - 1]}+{KEY_NAMES[b - 1]}") if a > 0 else None
+            except (ValueError, IndexError):
+                keys = None
+            if keys is None or not char.strip():
+                messagebox.showerror("Chord Error", f"Not a chord: {item}")
+                return
+            chords["+".join(keys)] = [char.strip()]
+
+        for name in [name for name in mapping if '+' in name]:
+            del mapping[name]
+        mapping.update(chords)
+        self.save_settings()
+        self.engine.update_mapping(mapping)
+        self.update_status(f"{len(chords)} chords set.")
+
+    def edit_snippets(self):
+        """Snippets as one 'abbreviation=expansion' per line; \\n in an expansion types Enter."""
+        dialog = tk.Toplevel(self)
+        dialog.title("Edit Snippets")
+        dialog.transient(self)
+        ttk.Label(
+            dialog,
+            text="One per line: abbreviation=expansion\n(e.g., ;em=name@example.com  -  \\n in the text = Enter)"
+        ).pack(anchor="w", padx=10, pady=(10, 5))
+        text = tk.Text(dialog, width=50, height=12, font=("Roboto", 10))
+        text.pack(fill="both", expand=True, padx=10)
+        newline = "\\n"
+        text.insert("1.0", "\n".join(
+            f"{abbr}={expansion.replace(chr(10), newline)}"
+            for abbr, expansion in (self.config_data.get("snippets") or {}).items()
+        ))
+
+        def save():
+            snippets = {}
+            for line in text.get("1.0", "end").splitlines():
+                if not line.strip():
+                    continue
+                abbr, sep, expansion = line.partition('=')
+                if not sep or not abbr.strip() or not expansion:
+                    messagebox.showerror("Snippet Error", f"Not a snippet: {line}", parent=dialog)
+                    return
+                snippets[abbr.strip()] = expansion.replace(newline, "\n")
+            self.config_data["snippets"] = snippets
+            self.engine.set_snippets(snippets)
+            self.save_config()
+            self.update_status(f"{len(snippets)} snippets set.")
+            dialog.destroy()
+
+        ttk.Button(dialog, text="Save", command=save).pack(pady=10)
+
     def edit_mapping(self, key, label_num):
         current_list = self.config_data["mapping"].get(key, [])
         current_str = ",".join(current_list)
@@ -571,41 +1903,308 @@ class SettingsApp(tk.Tk):
         val = int(float(val))
         self.lbl_time_val.config(text=f"{val} ms")
         self.config_data["delay"] = val
+        self.engine.set_delay(val)
 
     def save_settings(self):
         self.config_data["delay"] = self.delay_var.get()
         self.config_data["minimize_to_tray_on_close"] = self.minimize_tray_var.get()
-        ConfigManager.save(self.config_data)
+        self.engine.set_delay(self.config_data["delay"])
+        self.engine.store_adaptive_model()
+        self.save_config()
         self.update_status("Settings saved.")
 
+    def save_config(self):
+        if self.remote:
+            self.remote.push_config(self.config_data)  # the daemon is the only writer
+        else:
+            ConfigManager.save(self.config_data)
+
     def update_status(self, text):
-        self.lbl_status.config(text=text)
+        self.ui.set_status(text)
 
     def on_close_window(self):
-        if self.minimize_tray_var.get():
+        if self.minimize_tray_var.get() and not self.remote:
             self.withdraw()
-            self.tray_icon.notify("App is running in the background", "Mouse T9 Keypad")
+            if self.tray_icon is not None:
+                self.tray_icon.notify("App is running in the background", "Mouse T9 Keypad")
         else:
             self.force_quit()
 
     def force_quit(self):
+        if self.remote:
+            self.destroy()
+            sys.exit()
         try:
             keyboard.unhook_all()
         except: pass
-        if hasattr(self, 'tray_icon'):
+        if self.config_watcher is not None:
+            self.config_watcher.close()
+        if hasattr(self, 'engine'):
+            self.engine.shutdown()
+            ConfigManager.save(self.config_data)
+        ConfigManager.flush()
+        if self.tray_icon is not None:
             self.tray_icon.stop()
         self.destroy()
         sys.exit()
 
+# =================================================================================
+# DAEMON MODE (hooks only, settings in a separate process)
+# =================================================================================
+
+class RemoteEngine:
+    """
+    Stands in for T9Engine inside the settings process while a daemon owns
+    the hooks. Changes are forwarded over the daemon's control socket; the
+    daemon applies them and is the only process that writes the config file.
+    Port and token come from the daemon's control file. Only the keys this
+    window changed are pushed, so a layout switch or file edit the daemon
+    picked up meanwhile is not overwritten with this window's older copy.
+    """
+    profiler = None
+
+    def __init__(self, port, token):
+        self.port = port
+        self.token = token
+        self.synced = {}  # the config as the daemon last had it, as far as this window knows
+
+    @staticmethod
+    def copy(config):
+        return json.loads(json.dumps(config))
+
+    def request(self, command, arg=None):
+        line = command if arg is None else f"{command} {json.dumps(arg)}"
+        try:
+            return send_command(line, self.port, token=self.token)
+        except (OSError, ValueError) as e:
+            print(f"Daemon not reachable: {e}")
+            return {"error": str(e)}
+
+    def fetch_config(self):
+        config = self.request("config")
+        if "error" in config:
+            raise OSError(config["error"])
+        self.synced = self.copy(config)
+        return config
+
+    def push_config(self, config):
+        # The learned timings live in the daemon, never overwrite them from here
+        changed = {k: v for k, v in config.items() if k != "adaptive_model" and self.synced.get(k) != v}
+        if "mapping" in changed and "active_layout" in config:
+            changed["active_layout"] = config["active_layout"]  # the layout these keys belong to
+        if changed and self.request("config", changed).get("ok"):
+            self.synced.update(self.copy(changed))
+
+    def set_delay(self, delay_ms):
+        self.request("delay", delay_ms)
+
+    def set_adaptive(self, enabled):
+        self.request("adaptive", enabled)
+
+    def set_predictive(self, enabled):
+        return bool(self.request("predictive", enabled).get("ok"))
+
+    def update_mapping(self, mapping):
+        self.request("mapping", mapping)
+
+    def set_chording(self, enabled):
+        self.request("chording", enabled)
+
+    def set_next_word(self, enabled):
+        self.request("next_word", enabled)
+
+    def set_layouts(self, config):
+        self.push_config(config)
+
+    def set_snippets(self, snippets):
+        self.request("snippets", snippets)
+
+    def switch_layout(self, name=None):
+        return bool(self.request("layout", name).get("ok"))
+
+    def store_adaptive_model(self):
+        pass
+
+    def dump_stats(self):
+        return self.request("dump_stats").get("path")
+
+    def shutdown(self):
+        pass
+
+
+class DaemonHost:
+    """
+    Lean host for --daemon / "daemon_mode": the hook, the engine and, unless
+    "daemon_overlay" is off, a withdrawn Tk root for the preview overlay. No
+    tray, no Pillow, no settings widgets. The settings UI is a separate
+    process (main.py --settings, or launching the app again) that talks to
+    this one over the control socket and exits when its window is closed.
+    """
+    def __init__(self, config_data=None):
+        self.config_data = config_data if config_data is not None else ConfigManager.load()
+        self.root = None
+        if self.config_data.get("daemon_overlay", True):
+            self.root = tk.Tk()
+            self.root.withdraw()
+        self.ui = UiRefresh(self.root)  # never visible: status updates are only stored
+        self.stopped = threading.Event()
+
+        self.engine = T9Engine(self.root, self)
+        self.hooks_live_ms = (time.perf_counter() - STARTUP_T0) * 1000
+        print(f"Daemon hooks live after {self.hooks_live_ms:.0f} ms")
+        # A fixed "stats_port" if configured, otherwise one the OS picks; the
+        # settings process finds it (and the token) in the control file
+        self.port = self.config_data.get("stats_port") or 0
+        self.engine.start_stats_server(self.port, {
+            "config": self.config_command,
+            "delay": lambda v: self.set_value("delay", v, self.engine.set_delay),
+            "adaptive": lambda v: self.set_value("adaptive_delay", v, self.engine.set_adaptive),
+            "mapping": lambda v: self.set_value("mapping", v, self.engine.update_mapping),
+            "predictive": self.predictive_command,
+            "chording": lambda v: self.set_value("chording", v, self.engine.set_chording),
+            "next_word": lambda v: self.set_value("next_word", v, self.engine.set_next_word),
+            "layout": lambda v: {"ok": self.engine.switch_layout(v)},
+            "snippets": lambda v: self.set_value("snippets", v, self.engine.set_snippets),
+            "dump_stats": lambda _: {"path": self.engine.dump_stats()},
+            "quit": lambda _: self.quit() or {"ok": True},
+        })
+        self.config_watcher = None
+        if self.config_data.get("watch_config", True):
+            self.config_watcher = ConfigWatcher(
+                CONFIG_FILE_PATH, lambda data: self.engine.on_gui(self.config_file_changed, data))
+
+    def update_status(self, text):
+        self.ui.set_status(text)
+
+    def layout_switched(self, name):
+        self.config_data["active_layout"] = name
+        self.config_data["mapping"] = self.config_data["layouts"][name]
+        ConfigManager.save(self.config_data)
+        print(f"Layout: {name}")
+
+    def config_file_changed(self, data):
+        changed = ConfigManager.merge(self.config_data, data)
+        if changed:
+            self.engine.apply_file_change(self.config_data, changed)
+            print(f"Config reloaded: {', '.join(sorted(changed))}")
+
+    # --- control socket commands (run on the socket thread) ---
+    def config_command(self, config):
+        if config is None:
+            return self.config_data
+        # The settings process sends the keys it changed; merged like a file edit
+        changed = ConfigManager.merge(self.config_data, config)
+        if changed:
+            self.engine.apply_file_change(self.config_data, changed)
+            ConfigManager.save(self.config_data)
+        return {"ok": True}
+
+    def set_value(self, key, value, apply):
+        apply(value)
+        self.config_data[key] = value
+        ConfigManager.link_layouts(self.config_data)
+        ConfigManager.save(self.config_data)
+        return {"ok": True}
+
+    def predictive_command(self, enabled):
+        ok = self.engine.set_predictive(bool(enabled))
+        if ok:
+            self.config_data["predictive"] = bool(enabled)
+            ConfigManager.save(self.config_data)
+        return {"ok": ok}
+
+    def run(self):
+        try:
+            if self.root is not None:
+                self.root.mainloop()
+            else:
+                while not self.stopped.wait(0.5):  # short waits keep Ctrl+C working
+                    pass
+        except KeyboardInterrupt:
+            self.quit()
+
+    def quit(self):
+        try:
+            keyboard.unhook_all()
+        except Exception:
+            pass
+        if self.config_watcher is not None:
+            self.config_watcher.close()
+        self.engine.shutdown()
+        ConfigManager.save(self.config_data)
+        ConfigManager.flush()
+        self.stopped.set()
+        if self.root is not None:
+            self.root.after(0, self.root.destroy)
+
+
+def open_remote_settings():
+    """Settings process for a running daemon. Returns False if none answers."""
+    try:
+        remote = RemoteEngine(*read_control_file())
+    except (OSError, ValueError, KeyError):
+        return False
+    try:
+        app = SettingsApp(remote)
+    except OSError:
+        return False
+    app.mainloop()
+    return True
+
+
+def report_memory(mode, quit_fn):
+    """--memory-bench: lets startup settle, prints RSS as one JSON line and exits."""
+    print(json.dumps({"mode": mode, "rss_mb": round(SystemUtils.rss_mb(), 1)}))
+    quit_fn()
+
+
 if __name__ == "__main__":
+    if "--settings" in sys.argv:
+        # Settings window for a running daemon; holds no mutex, exits on close
+        if not open_remote_settings():
+            ctypes.windll.user32.MessageBoxW(0, "Mouse T9 Keypad is not running.", "Mouse T9 Keypad", 0x30)
+        sys.exit()
+
     # Single Instance Check
     mutex_name = "MouseT9Keypad_Mutex"
     kernel32 = ctypes.windll.kernel32
     mutex = kernel32.CreateMutexW(None, False, mutex_name)
     
     if kernel32.GetLastError() == 183: # ERROR_ALREADY_EXISTS
-        ctypes.windll.user32.MessageBoxW(0, "The application is already running.", "Mouse T9 Keypad", 0x30)
+        # Launching again while a daemon runs opens its settings instead
+        if not open_remote_settings():
+            ctypes.windll.user32.MessageBoxW(0, "The application is already running.", "Mouse T9 Keypad", 0x30)
+        sys.exit()
+
+    # Loaded once: it picks the mode and is handed to the host
+    config_data = ConfigManager.load()
+    if "--daemon" in sys.argv or config_data.get("daemon_mode", False):
+        daemon = DaemonHost(config_data)
+        if "--profile" in sys.argv:
+            daemon.engine.start_profiling()
+        if "--record" in sys.argv:
+            daemon.engine.start_recording()
+        if "--memory-bench" in sys.argv:
+            threading.Timer(2.0, report_memory, ("daemon", daemon.quit)).start()
+        daemon.run()
         sys.exit()
 
-    app = SettingsApp()
+    app = SettingsApp(config_data=config_data)
+    if "--profile" in sys.argv:
+        # Report is written when profiling is stopped from the tray, or on exit
+        app.engine.start_profiling()
+    if "--record" in sys.argv:
+        app.engine.start_recording()
+    if "--startup-bench" in sys.argv:
+        # Queued after the deferred startup work: report and exit
+        def report_startup():
+            print(json.dumps({
+                "hooks_live_ms": round(app.hooks_live_ms, 1),
+                "ui_ready_ms": round(app.ui_ready_ms, 1) if app.ui_built else None,
+            }))
+            app.force_quit()
+        app.after_idle(report_startup)
+    if "--memory-bench" in sys.argv:
+        # Long enough for the tray thread to have loaded Pillow and pystray
+        app.after(2000, report_memory, "full", app.force_quit)
     app.mainloop()
@@ -0,0 +1,549 @@
+"""
+Replay harness for the headless multi-tap core.
+
+Feeds F13-F24 streams into MultiTapCore on a virtual clock and reports
+per-event latency, throughput and dropped / out-of-order commits.
+Runs anywhere (no Tk, no keyboard hook, no admin rights).
+
+Stream file format - one press per line, '#' starts a comment:
+    0.000 f14
+    0.120 f14
+    1.050 f15
+
+Examples:
+    python replay.py session.txt --speed 2
+    python replay.py --text "hello world" --rate 8
+    python replay.py --bench
+    python replay.py --text "hello world" --save hello.txt
+    python replay.py --text "good home" --dict t9_words.txt   # predictive mode
+    python replay.py --scheduler 200                          # real-time commit lateness
+    python replay.py --chords                                 # chord detection on simulated timings
+    python replay.py --cases                                  # modifier / editing edge cases
+    python replay.py --startup 5                              # cold start of main.py (Windows)
+    python replay.py --memory 3                               # RSS: full app vs --daemon (Windows)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from t9core import (
+    DEFAULT_CHORD_WINDOW_MS, DEFAULT_CYCLE_KEY, DEFAULT_DELAY_MS, DEFAULT_MAPPING, KEY_INDEX,
+    MAX_CANDIDATES, AdaptiveTimeout, ChordDetector, DeadlineScheduler, ModifierState, MultiTapCore,
+    NullView, RecordingSink, StaticModifiers, VirtualClock,
+)
+from t9dict import encode_word, letter_codes, load_dictionary
+from t9output import OutputQueue
+
+BENCH_TEXT = "the quick brown fox jumps over the lazy dog\n" * 20
+BENCH_RATES = (4, 8, 16, 50, 200)
+
+# =================================================================================
+# STREAMS
+# =================================================================================
+
+def load_stream(path):
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            t, key_name = line.split()
+            events.append((float(t), key_name.lower()))
+    return events
+
+
+def save_stream(path, events):
+    with open(path, 'w', encoding='utf-8') as f:
+        for t, key_name in events:
+            f.write(f"{t:.4f} {key_name}\n")
+
+
+def text_to_stream(text, mapping, rate, delay_ms):
+    """
+    Encodes text as the multi-tap presses a user would make at `rate` presses/s.
+    Two characters on the same button need the commit timeout in between.
+    """
+    lookup = {}
+    for key_name, char_list in mapping.items():
+        if key_name not in KEY_INDEX:
+            continue  # chords
+        for idx, char in enumerate(char_list):
+            lookup.setdefault(char, (key_name, idx))
+    lookup.setdefault('\n', lookup.get('ENTER'))
+    lookup.setdefault(' ', lookup.get('SPACE'))
+
+    gap = 1.0 / rate
+    wait = delay_ms / 1000.0 + gap
+    events = []
+    t = 0.0
+    last_key = None
+    for char in text:
+        hit = lookup.get(char) or lookup.get(char.lower())
+        if hit is None:
+            raise ValueError(f"Character {char!r} is not in the mapping")
+        key_name, idx = hit
+        if events:
+            t += wait if key_name == last_key else gap
+        for i in range(idx + 1):
+            if i:
+                t += gap
+            events.append((t, key_name))
+        last_key = key_name
+    return events
+
+def text_to_predictive_stream(text, mapping, dictionary, rate, delay_ms):
+    """
+    Encodes text for predictive mode: one press per letter plus next-candidate
+    presses; anything that is not a dictionary word falls back to multi-tap.
+    """
+    codes = letter_codes(mapping)
+    key_names = [f'f{i}' for i in range(13, 25)]
+    gap = 1.0 / rate
+    events = []
+    t = 0.0
+    for token in text.replace('\n', ' \n ').split(' '):
+        if token in ('', '\n'):
+            if token == '\n':
+                events.extend(text_to_stream('\n', mapping, rate, delay_ms))
+            continue
+        seq = encode_word(token.lower(), codes)
+        words = dictionary.lookup(seq, MAX_CANDIDATES)[0] if seq else []
+        if token.lower() not in words:
+            raise ValueError(f"Word {token!r} is not in the dictionary")
+        for code in seq:
+            events.append((t, key_names[code - 1]))
+            t += gap
+        for _ in range(words.index(token.lower())):
+            events.append((t, DEFAULT_CYCLE_KEY))
+            t += gap
+        events.extend((t + dt, k) for dt, k in text_to_stream(' ', mapping, rate, delay_ms))
+        t += gap
+    events.sort(key=lambda e: e[0])
+    return events
+
+# =================================================================================
+# MEASUREMENT
+# =================================================================================
+
+class ReplayView(NullView):
+    def __init__(self):
+        self.commits = []
+        self.waits = []
+        self.core = None
+        self.in_press = False
+
+    def committed(self, seq, char):
+        self.commits.append(seq)
+        if not self.in_press:
+            # Timeout commit: idle time between the cycle's last press and the commit
+            self.waits.append(self.core.clock.now() - self.core.last_press_t)
+
+
+def percentile(sorted_vals, pct):
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(pct / 100.0 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def replay(events, mapping=None, delay_ms=DEFAULT_DELAY_MS, speed=1.0, dictionary=None,
+           async_output=False, adaptive=False):
+    mapping = mapping or DEFAULT_MAPPING
+    clock = VirtualClock()
+    sink = RecordingSink()
+    output = OutputQueue(sink) if async_output else sink
+    view = ReplayView()
+    core = MultiTapCore(mapping, output, clock, StaticModifiers(), delay_ms, view)
+    view.core = core
+    if adaptive:
+        core.adaptive = AdaptiveTimeout()
+    if dictionary is not None:
+        core.set_dictionary(dictionary)
+
+    press_lat = []
+    opened = []
+    perf = time.perf_counter
+    start = perf()
+    for t, key_name in events:
+        clock.advance_to(t / speed)
+        before_seq = core.cycle_seq
+        view.in_press = True
+        t0 = perf()
+        core.press(key_name)
+        press_lat.append(perf() - t0)
+        view.in_press = False
+        if core.cycle_seq != before_seq:
+            opened.append(core.cycle_seq)
+    clock.advance_to(clock.now() + delay_ms / 1000.0 + 1.0)
+    core.flush()
+    if async_output:
+        output.wait_idle()
+        output.close()
+    elapsed = perf() - start
+
+    committed = view.commits
+    seen = set(committed)
+    out_of_order = sum(1 for a, b in zip(committed, committed[1:]) if b <= a)
+    dropped = sum(1 for seq in opened if seq not in seen)
+
+    lat = sorted(x * 1e6 for x in press_lat)
+    waits = sorted(view.waits)
+    span = clock.now() or 1.0
+    return {
+        "events": len(events),
+        "commits": len(committed),
+        "dropped": dropped,
+        "out_of_order": out_of_order,
+        "p50_us": percentile(lat, 50),
+        "p95_us": percentile(lat, 95),
+        "p99_us": percentile(lat, 99),
+        "max_us": lat[-1] if lat else 0.0,
+        "commit_wait_ms": percentile(waits, 50) * 1000.0,
+        "events_per_s": len(events) / elapsed if elapsed else 0.0,
+        "commits_per_min": len(committed) / span * 60.0,
+        "text": sink.text(),
+        "output": output.stats() if async_output else None,
+    }
+
+
+def bench_scheduler(count, delay_ms=20, extend_every=2):
+    """
+    Real-time run of the DeadlineScheduler: each cycle is extended a few times
+    like a multi-tap burst, then left to fire. Reports commit lateness.
+    """
+    scheduler = DeadlineScheduler()
+    fired = []
+    for i in range(count):
+        for _ in range(extend_every):
+            scheduler.call_later(delay_ms, lambda: fired.append(time.perf_counter()))
+            time.sleep(delay_ms / 4000.0)
+        time.sleep(delay_ms / 1000.0 + 0.005)
+    scheduler.close()
+    stats = scheduler.stats()
+    stats["lost"] = count - len(fired)
+    return stats
+
+
+# =================================================================================
+# CHORDS (press / release timings)
+# =================================================================================
+
+CHORD_TABLE = {"f14+f15": ["e"], "f17+f18": ["n"], "f20+f21": ["s"]}
+
+
+def chord_cases(w):
+    """(name, [(time_ms, key, down)], expected text) for a chord window of w ms."""
+    return [
+        ("chord", [(0, 'f14', 1), (5, 'f15', 1), (90, 'f14', 0), (95, 'f15', 0)], "e"),
+        ("chord, other order", [(0, 'f15', 1), (3, 'f14', 1), (80, 'f14', 0), (85, 'f15', 0)], "e"),
+        ("partner just inside the window", [(0, 'f14', 1), (w - 1, 'f15', 1), (w + 80, 'f14', 0), (w + 90, 'f15', 0)], "e"),
+        ("partner at the window edge", [(0, 'f14', 1), (w, 'f15', 1), (w + 80, 'f14', 0), (w + 90, 'f15', 0)], "ad"),
+        ("partner long after, first held", [(0, 'f14', 1), (w + 30, 'f15', 1), (300, 'f15', 0), (310, 'f14', 0)], "ad"),
+        ("tap released before the partner", [(0, 'f14', 1), (w // 3, 'f14', 0), (w // 2, 'f15', 1), (w, 'f15', 0)], "ad"),
+        ("buttons that do not chord", [(0, 'f14', 1), (4, 'f17', 1), (80, 'f14', 0), (85, 'f17', 0)], "aj"),
+        ("button outside every chord", [(0, 'f16', 1), (80, 'f16', 0)], "g"),
+        ("multi-tap on a chord button", [(0, 'f14', 1), (70, 'f14', 0), (200, 'f14', 1), (270, 'f14', 0)], "b"),
+        ("chord ends a running cycle", [(0, 'f16', 1), (60, 'f16', 0), (200, 'f14', 1), (203, 'f15', 1),
+                                        (280, 'f14', 0), (281, 'f15', 0)], "ge"),
+        ("third button during a chord", [(0, 'f14', 1), (2, 'f15', 1), (10, 'f17', 1), (90, 'f17', 0),
+                                         (95, 'f14', 0), (96, 'f15', 0)], "ej"),
+        ("chords back to back", [(0, 'f14', 1), (4, 'f15', 1), (80, 'f14', 0), (81, 'f15', 0),
+                                 (150, 'f20', 1), (152, 'f21', 1), (230, 'f20', 0), (231, 'f21', 0)], "es"),
+        ("chord then its own button", [(0, 'f17', 1), (6, 'f18', 1), (70, 'f17', 0), (71, 'f18', 0),
+                                       (150, 'f18', 1), (220, 'f18', 0)], "nm"),
+    ]
+
+
+class ChordView(NullView):
+    """Measures how long each press was held back before the core saw it."""
+    def __init__(self, clock):
+        self.clock = clock
+        self.down_at = {}
+        self.holds = []
+
+    def signal(self, key_name):
+        self.holds.append(self.clock.now() - self.down_at[key_name])
+
+
+def run_chord_case(events, window_ms, delay_ms=DEFAULT_DELAY_MS):
+    clock = VirtualClock()
+    sink = RecordingSink()
+    view = ChordView(clock)
+    core = MultiTapCore({**DEFAULT_MAPPING, **CHORD_TABLE}, sink, clock, StaticModifiers(), delay_ms, view)
+    chords = ChordDetector(core, clock, window_ms)
+    for t_ms, key_name, down in events:
+        t = t_ms / 1000.0
+        clock.advance_to(t)
+        if down:
+            view.down_at[key_name] = t
+            chords.press(key_name, t)
+        else:
+            chords.release(key_name)
+    clock.advance_to(clock.now() + (window_ms + delay_ms) / 1000.0 + 1.0)
+    core.flush()
+    return sink.text(), view.holds
+
+
+def chord_suite(window_ms=DEFAULT_CHORD_WINDOW_MS):
+    """
+    Runs every chord case on a virtual clock. A case fails when the typed
+    text differs or a press was held back longer than the window.
+    """
+    failures = []
+    max_hold = 0.0
+    cases = chord_cases(window_ms)
+    for name, events, expected in cases:
+        text, holds = run_chord_case(events, window_ms)
+        hold = max(holds, default=0.0)
+        max_hold = max(max_hold, hold)
+        if text != expected or hold > window_ms / 1000.0 + 1e-9:
+            failures.append(f"{name}: typed {text!r} expected {expected!r}, held back {hold * 1000:.0f} ms")
+    return {"cases": len(cases), "failures": failures, "hold_max_ms": max_hold * 1000.0, "window_ms": window_ms}
+
+
+# =================================================================================
+# EDGE CASES (modifiers, predictive editing)
+# =================================================================================
+
+def edge_cases():
+    """(name, [(time_ms, key, down)], predictive, expected text); 'shift' goes to the modifier state."""
+    return [
+        ("shift released before the next button", [(0, 'shift', 1), (10, 'f14', 1), (60, 'shift', 0),
+                                                   (100, 'f15', 1)], False, "Ad"),
+        ("shift pressed before the next button", [(0, 'f14', 1), (50, 'shift', 1), (100, 'f15', 1),
+                                                  (150, 'shift', 0)], False, "aD"),
+        ("shift released before the timeout", [(0, 'shift', 1), (10, 'f14', 1), (10, 'f14', 1),
+                                               (60, 'shift', 0)], False, "B"),
+        ("shift released before the word ends", [(0, 'shift', 1), (10, 'f16', 1), (20, 'f16', 1),
+                                                 (30, 'shift', 0), (40, 'f23', 1)], True, "Hi "),
+        ("shift on the first letter only", [(0, 'shift', 1), (10, 'f16', 1), (20, 'shift', 0), (30, 'f15', 1),
+                                            (40, 'f17', 1), (50, 'f17', 1), (60, 'f18', 1), (70, 'f23', 1)],
+         True, "Hello "),
+        ("backspace on an unknown stem", [(0, 'f21', 1), (10, 'f21', 1), (20, 'f21', 1), (30, 'f21', 1),
+                                          (40, 'f24', 1), (50, 'f23', 1)], True, "yww "),
+    ]
+
+
+def run_edge_case(events, predictive, dictionary, delay_ms=DEFAULT_DELAY_MS):
+    clock = VirtualClock()
+    sink = RecordingSink()
+    modifiers = ModifierState()
+    core = MultiTapCore(DEFAULT_MAPPING, sink, clock, modifiers, delay_ms)
+    if predictive:
+        core.set_dictionary(dictionary)
+    for t_ms, key_name, down in events:
+        clock.advance_to(t_ms / 1000.0)
+        if key_name in KEY_INDEX:
+            if down:
+                core.press(key_name)
+        else:
+            modifiers.on_key(key_name, down)
+    clock.advance_to(clock.now() + delay_ms / 1000.0 + 1.0)
+    core.flush()
+    return sink.text()
+
+
+def edge_suite():
+    """Runs every edge case on a virtual clock; predictive ones use t9_words.txt."""
+    words = os.path.join(os.path.dirname(os.path.abspath(__file__)), "t9_words.txt")
+    dictionary = load_dictionary(words, DEFAULT_MAPPING)
+    failures = []
+    cases = edge_cases()
+    for name, events, predictive, expected in cases:
+        if predictive and dictionary is None:
+            failures.append(f"{name}: word list not found: {words}")
+            continue
+        text = run_edge_case(events, predictive, dictionary)
+        if text != expected:
+            failures.append(f"{name}: typed {text!r} expected {expected!r}")
+    return {"cases": len(cases), "failures": failures}
+
+
+def run_main(*args):
+    """
+    Runs main.py with a bench flag and returns the JSON line it prints before
+    exiting. Needs the real host (Windows, keyboard hook).
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    out = subprocess.run([sys.executable, script, *args],
+                         capture_output=True, text=True, timeout=60).stdout
+    line = [ln for ln in out.splitlines() if ln.startswith('{')]
+    if not line:
+        raise RuntimeError(f"main.py {' '.join(args)} printed no result:\n{out}")
+    return json.loads(line[-1])
+
+
+def bench_startup(count):
+    """Cold-starts main.py --startup-bench `count` times."""
+    hooks, ui, wall = [], [], []
+    for _ in range(count):
+        t0 = time.perf_counter()
+        r = run_main("--startup-bench")
+        wall.append((time.perf_counter() - t0) * 1000.0)
+        hooks.append(r["hooks_live_ms"])
+        if r["ui_ready_ms"] is not None:
+            ui.append(r["ui_ready_ms"])
+    hooks.sort(); ui.sort(); wall.sort()
+    return {
+        "runs": count,
+        "hooks_live_p50_ms": percentile(hooks, 50),
+        "hooks_live_max_ms": hooks[-1],
+        "ui_ready_p50_ms": percentile(ui, 50) if ui else None,
+        "process_p50_ms": percentile(wall, 50),
+    }
+
+
+def bench_memory(count):
+    """Resident memory after startup: the full tray app vs the lean daemon."""
+    modes = {"full": ("--memory-bench",), "daemon": ("--daemon", "--memory-bench")}
+    result = {}
+    for mode, args in modes.items():
+        rss = sorted(run_main(*args)["rss_mb"] for _ in range(count))
+        result[f"{mode}_rss_mb"] = percentile(rss, 50)
+    result["saved_mb"] = result["full_rss_mb"] - result["daemon_rss_mb"]
+    return result
+
+
+def print_report(name, r):
+    print(f"[{name}] events={r['events']} commits={r['commits']} "
+          f"dropped={r['dropped']} out_of_order={r['out_of_order']}")
+    print(f"  press latency us: p50={r['p50_us']:.1f} p95={r['p95_us']:.1f} "
+          f"p99={r['p99_us']:.1f} max={r['max_us']:.1f}")
+    print(f"  throughput: {r['events_per_s']:.0f} events/s (cpu), "
+          f"{r['commits_per_min']:.0f} commits/min (virtual), "
+          f"median timeout wait {r['commit_wait_ms']:.0f} ms")
+    if r.get("output"):
+        o = r["output"]
+        print(f"  output queue: {o['items']} items in {o['bursts']} bursts, "
+              f"inject avg={o['inject_avg_ms']:.3f}ms max={o['inject_max_ms']:.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay F13-F24 streams through the multi-tap core.")
+    parser.add_argument("stream", nargs="?", help="Recorded stream file (time_s key per line)")
+    parser.add_argument("--text", help="Synthesize a stream that types this text")
+    parser.add_argument("--rate", type=float, default=8.0, help="Presses per second for --text")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time scale for recorded streams")
+    parser.add_argument("--delay", type=int, default=DEFAULT_DELAY_MS, help="Commit timeout in ms")
+    parser.add_argument("--mapping", help="JSON config file to take 'mapping' from")
+    parser.add_argument("--dict", help="Word list: replay in predictive (one press per letter) mode")
+    parser.add_argument("--async-output", action="store_true", help="Route output through the writer-thread queue")
+    parser.add_argument("--save", help="Write the (synthesized) stream to this file")
+    parser.add_argument("--bench", action="store_true", help="Run the built-in benchmark at several rates")
+    parser.add_argument("--max-p99-us", type=float, help="Fail if press p99 latency exceeds this")
+    parser.add_argument("--adaptive", action="store_true", help="Learn per-button timeouts during the replay")
+    parser.add_argument("--scheduler", type=int, metavar="N", help="Measure real commit lateness over N cycles")
+    parser.add_argument("--startup", type=int, metavar="N", help="Measure cold start of main.py over N runs")
+    parser.add_argument("--memory", type=int, metavar="N", help="Compare RSS of the full app and --daemon over N runs")
+    parser.add_argument("--chords", action="store_true", help="Run the chord detection cases on simulated timings")
+    parser.add_argument("--chord-window", type=int, default=DEFAULT_CHORD_WINDOW_MS, help="Chord window in ms")
+    parser.add_argument("--cases", action="store_true", help="Run the modifier / editing edge cases")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.chords:
+        c = chord_suite(args.chord_window)
+        if args.json:
+            print(json.dumps(c))
+        else:
+            print(f"[chords] {c['cases'] - len(c['failures'])}/{c['cases']} cases OK, "
+                  f"longest hold-back {c['hold_max_ms']:.1f} ms (window {c['window_ms']} ms)")
+            for failure in c["failures"]:
+                print(f"  FAIL: {failure}", file=sys.stderr)
+        return 1 if c["failures"] else 0
+
+    if args.cases:
+        e = edge_suite()
+        if args.json:
+            print(json.dumps(e))
+        else:
+            print(f"[cases] {e['cases'] - len(e['failures'])}/{e['cases']} cases OK")
+            for failure in e["failures"]:
+                print(f"  FAIL: {failure}", file=sys.stderr)
+        return 1 if e["failures"] else 0
+
+    if args.startup:
+        s = bench_startup(args.startup)
+        if args.json:
+            print(json.dumps(s))
+        else:
+            ui = f"{s['ui_ready_p50_ms']:.0f}" if s['ui_ready_p50_ms'] is not None else "deferred"
+            print(f"[startup] runs={s['runs']} hooks live p50={s['hooks_live_p50_ms']:.0f}ms "
+                  f"max={s['hooks_live_max_ms']:.0f}ms, settings UI p50={ui}ms, "
+                  f"process p50={s['process_p50_ms']:.0f}ms")
+        return 0
+
+    if args.memory:
+        m = bench_memory(args.memory)
+        if args.json:
+            print(json.dumps(m))
+        else:
+            print(f"[memory] full app {m['full_rss_mb']:.1f} MB, daemon {m['daemon_rss_mb']:.1f} MB "
+                  f"(saves {m['saved_mb']:.1f} MB)")
+        return 0
+
+    if args.scheduler:
+        s = bench_scheduler(args.scheduler)
+        if args.json:
+            print(json.dumps(s))
+        else:
+            print(f"[scheduler] fired={s['fired']} lost={s['lost']} lateness ms: "
+                  f"p50={s['late_p50_ms']:.3f} p99={s['late_p99_ms']:.3f} max={s['late_max_ms']:.3f}")
+        return 1 if s["lost"] else 0
+
+    mapping = DEFAULT_MAPPING
+    if args.mapping:
+        with open(args.mapping, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)["mapping"]
+
+    dictionary = load_dictionary(args.dict, mapping) if args.dict else None
+    if args.dict and dictionary is None:
+        parser.error(f"word list not found: {args.dict}")
+
+    runs = []
+    if dictionary is not None and args.text is not None:
+        events = text_to_predictive_stream(args.text, mapping, dictionary, args.rate, args.delay)
+        r = replay(events, mapping, args.delay, dictionary=dictionary, async_output=args.async_output, adaptive=args.adaptive)
+        r["text_ok"] = r["text"].rstrip(' ') == args.text.rstrip(' ')
+        runs.append((f"predictive {args.rate}/s", r))
+    elif args.bench:
+        for rate in BENCH_RATES:
+            events = text_to_stream(BENCH_TEXT, mapping, rate, args.delay)
+            r = replay(events, mapping, args.delay, async_output=args.async_output, adaptive=args.adaptive)
+            r["text_ok"] = r["text"] == BENCH_TEXT
+            runs.append((f"bench {rate}/s", r))
+    elif args.text is not None:
+        events = text_to_stream(args.text, mapping, args.rate, args.delay)
+        r = replay(events, mapping, args.delay, async_output=args.async_output, adaptive=args.adaptive)
+        r["text_ok"] = r["text"] == args.text
+        runs.append((f"text {args.rate}/s", r))
+    elif args.stream:
+        events = load_stream(args.stream)
+        runs.append((args.stream, replay(events, mapping, args.delay, args.speed, dictionary, args.async_output, args.adaptive)))
+    else:
+        parser.error("give a stream file, --text or --bench")
+
+    if args.save and not args.bench:
+        save_stream(args.save, events)
+
+    failed = False
+    for name, r in runs:
+        if args.json:
+            print(json.dumps({"run": name, **r}, ensure_ascii=False))
+        else:
+            print_report(name, r)
+        if r["dropped"] or r["out_of_order"] or r.get("text_ok") is False:
+            print(f"  FAIL: {name} lost or reordered output", file=sys.stderr)
+            failed = True
+        if args.max_p99_us is not None and r["p99_us"] > args.max_p99_us:
+            print(f"  FAIL: {name} p99 {r['p99_us']:.1f}us > {args.max_p99_us}us", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
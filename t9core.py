@@ -0,0 +1,968 @@
+import threading
+import time
+from collections import deque
+
+# =================================================================================
+# HEADLESS MULTI-TAP CORE
+# =================================================================================
+# Nothing in this file touches Tk, the keyboard module or the Windows API.
+# main.py plugs in the real hook / overlay / injection, replay.py plugs in
+# recorded streams and a virtual clock so the hot path can be measured on Linux.
+
+DEFAULT_DELAY_MS = 800
+DEFAULT_CYCLE_KEY = 'f13'  # next-candidate button in predictive mode
+MAX_CANDIDATES = 8
+DEFAULT_CHORD_WINDOW_MS = 50  # two presses closer than this are one chord
+KEY_NAMES = [f'f{i}' for i in range(13, 25)]
+KEY_INDEX = {key_name: i for i, key_name in enumerate(KEY_NAMES)}
+
+# Modifier modes - index into every compiled entry
+MOD_PLAIN, MOD_CAPITAL, MOD_CTRL, MOD_CTRL_SHIFT = range(4)
+
+# Default English T9 mapping. Chords are extra entries named after their two
+# buttons, e.g. "f14+f15": ["e"] (only used with "chording" on).
+DEFAULT_MAPPING = {
+    'f13': ['.', ',', '?', '!', '1', '-', '@', ':'],  # Btn 1
+    'f14': ['a', 'b', 'c', '2'],                      # Btn 2
+    'f15': ['d', 'e', 'f', '3'],                      # Btn 3
+    'f16': ['g', 'h', 'i', '4'],                      # Btn 4
+    'f17': ['j', 'k', 'l', '5'],                      # Btn 5
+    'f18': ['m', 'n', 'o', '6'],                      # Btn 6
+    'f19': ['p', 'q', 'r', 's', '7'],                 # Btn 7
+    'f20': ['t', 'u', 'v', '8'],                      # Btn 8
+    'f21': ['w', 'x', 'y', 'z', '9'],                 # Btn 9
+    'f22': ['ENTER'],                                 # Btn 10
+    'f23': [' ', '0'],                                # Btn 11
+    'f24': ['BACKSPACE', '(', ')', '[', ']', '{', '}', '<', '>', '/', '\\', '*', '#'] # Btn 12
+}
+
+
+# =================================================================================
+# CLOCKS (time source + one-shot timers, delays in ms)
+# =================================================================================
+
+class MonotonicClock:
+    """Real time. Only provides now(); the host decides how timers run."""
+    def now(self):
+        return time.perf_counter()
+
+
+class VirtualClock:
+    """
+    Deterministic clock for replays. Timers fire only when advance_to() moves
+    time past their deadline, so a 10 minute session replays in milliseconds.
+    """
+    def __init__(self, start=0.0):
+        self.t = start
+        self._timers = {}
+        self._next_id = 0
+
+    def now(self):
+        return self.t
+
+    def call_later(self, delay_ms, callback):
+        self._next_id += 1
+        self._timers[self._next_id] = (self.t + delay_ms / 1000.0, callback)
+        return self._next_id
+
+    def cancel(self, handle):
+        self._timers.pop(handle, None)
+
+    def advance_to(self, t):
+        # Fire due timers in deadline order, each at its own timestamp
+        while self._timers:
+            handle, (deadline, callback) = min(self._timers.items(), key=lambda kv: kv[1][0])
+            if deadline > t:
+                break
+            del self._timers[handle]
+            self.t = max(self.t, deadline)
+            callback()
+        self.t = max(self.t, t)
+
+
+class DeadlineScheduler:
+    """
+    Clock for the live engine: one pending deadline on the monotonic clock,
+    served by one thread. call_later() while a deadline is pending just
+    moves it (no timer objects are created or cancelled per press). The
+    thread sleeps until shortly before the deadline and spins the rest of the
+    way, so commits fire within a fraction of a millisecond of it.
+
+    Several engines (one per input device) can share the thread: each uses
+    its own channel(key), which holds one deadline of its own.
+
+    Callbacks run on the scheduler thread while holding `lock`; callers that
+    touch the same state from other threads must hold it too.
+    """
+    SPIN_S = 0.002           # final stretch handled by yielding instead of sleeping
+    LATENESS_SAMPLES = 1024  # bounded window for percentile stats
+
+    def __init__(self, name="T9Deadline", histogram=None):
+        self.lock = threading.RLock()
+        self._cond = threading.Condition(self.lock)
+        self._slots = {}  # channel key -> (deadline, callback, generation)
+        self._generation = 0
+        self._closed = False
+
+        self.fired = 0
+        self.cancelled = 0
+        self.lateness = deque(maxlen=self.LATENESS_SAMPLES)
+        self.lateness_max = 0.0
+        self.histogram = histogram  # optional t9metrics.Histogram for lateness
+        self.profiler = None        # t9profile.Profiler while profiling is on
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def now(self):
+        return time.perf_counter()
+
+    def call_later(self, delay_ms, callback, key=None):
+        with self._cond:
+            self._generation += 1
+            self._slots[key] = (time.perf_counter() + delay_ms / 1000.0, callback, self._generation)
+            self._cond.notify()
+            return self._generation
+
+    def cancel(self, handle, key=None):
+        with self._cond:
+            slot = self._slots.get(key)
+            if slot is not None and slot[2] == handle:
+                del self._slots[key]
+                self.cancelled += 1
+
+    def channel(self, key):
+        return SchedulerChannel(self, key)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(1.0)
+
+    def stats(self):
+        samples = sorted(self.lateness)
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))] * 1000.0 if samples else 0.0
+        return {
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "late_p50_ms": pct(50),
+            "late_p99_ms": pct(99),
+            "late_max_ms": self.lateness_max * 1000.0,
+        }
+
+    def _run(self):
+        perf = time.perf_counter
+        with self._cond:
+            while not self._closed:
+                if not self._slots:
+                    self._cond.wait()
+                    continue
+                if len(self._slots) == 1:
+                    key, (deadline, callback, _) = next(iter(self._slots.items()))
+                else:
+                    key, (deadline, callback, _) = min(self._slots.items(), key=lambda kv: kv[1][0])
+                remaining = deadline - perf()
+                if remaining > self.SPIN_S:
+                    self._cond.wait(remaining - self.SPIN_S)
+                    continue  # deadline may have moved meanwhile
+                if remaining > 0:
+                    # Release the lock while spinning so presses can still extend it
+                    self._cond.release()
+                    try:
+                        time.sleep(0)
+                    finally:
+                        self._cond.acquire()
+                    continue
+
+                late = perf() - deadline
+                del self._slots[key]
+                self.fired += 1
+                self.lateness.append(late)
+                if late > self.lateness_max:
+                    self.lateness_max = late
+                if self.histogram is not None:
+                    self.histogram.record(late)
+                try:
+                    if self.profiler is not None:
+                        self.profiler.call(callback)
+                    else:
+                        callback()
+                except Exception as e:
+                    print(f"Scheduled callback failed: {e}")
+
+
+class SchedulerChannel:
+    """One device's clock on a shared DeadlineScheduler: same API, own deadline."""
+    def __init__(self, scheduler, key):
+        self.scheduler = scheduler
+        self.key = key
+        self.lock = scheduler.lock
+
+    def now(self):
+        return time.perf_counter()
+
+    def call_later(self, delay_ms, callback):
+        return self.scheduler.call_later(delay_ms, callback, self.key)
+
+    def cancel(self, handle):
+        self.scheduler.cancel(handle, self.key)
+
+
+# =================================================================================
+# PLUGGABLE SINKS / VIEWS / MODIFIERS (no-op defaults)
+# =================================================================================
+
+class NullSink:
+    """Output sink: where committed characters and key actions go."""
+    def write(self, text):
+        pass
+
+    def send(self, keys):
+        pass
+
+
+class RecordingSink(NullSink):
+    """Keeps everything that would have been injected, in order."""
+    def __init__(self):
+        self.events = []
+
+    def write(self, text):
+        self.events.append(('write', text))
+
+    def send(self, keys):
+        self.events.append(('send', keys))
+
+    def text(self):
+        out = []
+        for kind, payload in self.events:
+            if kind == 'write':
+                out.append(payload)
+            elif payload == 'enter':
+                out.append('\n')
+            elif payload == 'backspace' and out:
+                out[-1] = out[-1][:-1]
+        return "".join(out)
+
+
+class NullView:
+    """Feedback side: overlay preview and status bar."""
+    def signal(self, key_name):
+        pass
+
+    def preview(self, text, candidates=(), index=0):
+        """text is the pending output, candidates the whole cycle (index = current)."""
+        pass
+
+    def hide(self):
+        pass
+
+    def status(self, text):
+        pass
+
+    def committed(self, seq, char):
+        pass
+
+    def suggest(self, words):
+        """Next words offered after a word ended (accepted with the cycle key)."""
+        pass
+
+    def layout_changed(self, name):
+        pass
+
+
+# =================================================================================
+# MODIFIER STATE
+# =================================================================================
+
+class ModifierState:
+    """
+    Shift/Ctrl/CapsLock tracked from key events instead of polled per press.
+    on_key() runs on every modifier event and precomputes the snapshot, so the
+    hot path pays one attribute read: the MOD_* mode.
+    """
+    CTRL_KEYS = frozenset(('ctrl', 'left ctrl', 'right ctrl'))
+    SHIFT_KEYS = frozenset(('shift', 'left shift', 'right shift'))
+    CAPS_KEY = 'caps lock'
+    TRACKED = CTRL_KEYS | SHIFT_KEYS | {CAPS_KEY}
+
+    def __init__(self, caps=False):
+        self.held = set()
+        self.caps = bool(caps)
+        self._snapshot = MOD_CAPITAL if self.caps else MOD_PLAIN
+
+    def on_key(self, name, down):
+        if name not in self.TRACKED:
+            return
+        if name == self.CAPS_KEY and down and name not in self.held:
+            self.caps = not self.caps  # toggles on the first down, not on auto-repeat
+        if down:
+            self.held.add(name)
+        else:
+            self.held.discard(name)
+        self._update()
+
+    def set_caps(self, caps):
+        self.caps = bool(caps)
+        self._update()
+
+    def _update(self):
+        ctrl = not self.held.isdisjoint(self.CTRL_KEYS)
+        shift = not self.held.isdisjoint(self.SHIFT_KEYS)
+        self._snapshot = modifier_mode(ctrl, shift, self.caps)
+
+    def snapshot(self):
+        return self._snapshot
+
+
+class StaticModifiers(ModifierState):
+    """Modifier provider with fixed state (replays, tests)."""
+    def __init__(self, ctrl=False, shift=False, caps=False):
+        super().__init__(caps)
+        self._snapshot = modifier_mode(ctrl, shift, caps)
+
+
+def modifier_mode(ctrl, shift, caps):
+    if ctrl:
+        return MOD_CTRL_SHIFT if shift else MOD_CTRL
+    return MOD_CAPITAL if shift != caps else MOD_PLAIN
+
+
+# =================================================================================
+# COMPILED MAPPING
+# =================================================================================
+
+def compile_entry(char):
+    """
+    One mapping entry resolved for all four modifier modes.
+    Each variant is (display, kind, payload, status); kind is 'write', 'send'
+    or 'layout' (LAYOUT switches to the next named layout, LAYOUT:name to that one).
+    """
+    if char == 'LAYOUT' or char.startswith('LAYOUT:'):
+        name = char[len('LAYOUT:'):] or None
+        variant = (name or "LAYOUT", 'layout', name, None)
+        return (variant,) * 4
+    if char == 'ENTER':
+        variant = ("ENTER", 'send', 'enter', None)
+        return (variant,) * 4
+    if char == 'BACKSPACE':
+        variant = ("<<", 'send', 'backspace', None)
+        return (variant,) * 4
+    if char == 'SPACE':
+        variant = ("SPACE", 'write', ' ', "Typed:  ")
+        return (variant,) * 4
+
+    upper = char.upper() if len(char) == 1 and char.isalpha() else char
+    # Hotkey strings split on ',' and '+', and ' ' has no name of its own there
+    key = HOTKEY_NAMES.get(char, char.lower())
+    return (
+        (char, 'write', char, f"Typed: {char}"),
+        (upper, 'write', upper, f"Typed: {upper}"),
+        (f"Ctrl+{char.upper()}", 'send', f"ctrl+{key}", f"Shortcut: Ctrl+{char.upper()}"),
+        (f"Ctrl+Shift+{char.upper()}", 'send', f"ctrl+shift+{key}", f"Shortcut: Ctrl+Shift+{char.upper()}"),
+    )
+
+
+def suggestion_entry(word):
+    """A suggested next word as a compiled entry: types the word and a space."""
+    capital = word[:1].upper() + word[1:]
+    plain = (word, 'write', word + ' ', f"Typed: {word}")
+    return (plain, (capital, 'write', capital + ' ', f"Typed: {capital}"), plain, plain)
+
+
+def parse_chord(name):
+    """'f14+f15' -> ('f14', 'f15'); None for anything that is not a two-button chord."""
+    keys = tuple(name.split('+'))
+    if len(keys) != 2 or keys[0] == keys[1] or not all(k in KEY_INDEX for k in keys):
+        return None
+    return keys
+
+
+class CompiledMapping:
+    """
+    The mapping as a 12-slot array (f13..f24) of precompiled entries, so a
+    press is a dict hit for the button index plus tuple indexing. Built off to
+    the side and swapped in with a single assignment.
+    """
+    def __init__(self, mapping):
+        self.buttons = [None] * len(KEY_NAMES)
+        self.letters = [None] * len(KEY_NAMES)  # first letter on each button
+        self.is_backspace = [False] * len(KEY_NAMES)
+        self.strips = [None] * len(KEY_NAMES)  # per modifier mode: the cycle's display strings
+        for i, key_name in enumerate(KEY_NAMES):
+            char_list = mapping.get(key_name) or []
+            if not char_list:
+                continue
+            self.buttons[i] = tuple(compile_entry(c) for c in char_list)
+            self.strips[i] = tuple(tuple(entry[mode][0] for entry in self.buttons[i]) for mode in range(4))
+            self.letters[i] = next((c for c in char_list if len(c) == 1 and c.isalpha()), None)
+            self.is_backspace[i] = char_list[0] == 'BACKSPACE'
+
+        self.chords = {}  # frozenset of two key names -> compiled entry
+        for name, char_list in mapping.items():
+            if '+' not in name:
+                continue
+            keys = parse_chord(name)
+            if keys is None or not char_list:
+                print(f"Ignoring bad chord: {name}")
+                continue
+            self.chords[frozenset(keys)] = compile_entry(char_list[0])
+        # Buttons that take part in a chord; only these are held back
+        self.chord_keys = frozenset(k for pair in self.chords for k in pair)
+
+
+# =================================================================================
+# ADAPTIVE COMMIT TIMEOUT
+# =================================================================================
+
+class AdaptiveTimeout:
+    """
+    Learns how fast the user cycles each button (interval between taps within
+    one multi-tap cycle) and shortens that button's commit window to fit.
+    State is three numbers per button (EWMA mean, EWMA deviation, count), so
+    it stays tiny and is stored in the config as-is.
+    """
+    ALPHA = 0.1          # EWMA weight of a new sample
+    MIN_SAMPLES = 8      # use the global delay until a button has this many
+    MARGIN_DEVS = 4.0    # timeout = mean + MARGIN_DEVS * deviation + SLACK_MS
+    SLACK_MS = 80.0
+    FLOOR_MS = 250.0     # never commit faster than this
+
+    def __init__(self):
+        self.mean = [0.0] * len(KEY_NAMES)
+        self.dev = [0.0] * len(KEY_NAMES)
+        self.count = [0] * len(KEY_NAMES)
+
+    def observe(self, button, interval_s):
+        ms = interval_s * 1000.0
+        if self.count[button] == 0:
+            self.mean[button] = ms
+            self.dev[button] = ms / 4.0
+        else:
+            diff = ms - self.mean[button]
+            self.mean[button] += self.ALPHA * diff
+            self.dev[button] += self.ALPHA * (abs(diff) - self.dev[button])
+        self.count[button] += 1
+
+    def timeout_ms(self, button, max_ms):
+        if self.count[button] < self.MIN_SAMPLES:
+            return max_ms
+        learned = self.mean[button] + self.MARGIN_DEVS * self.dev[button] + self.SLACK_MS
+        return int(min(max_ms, max(self.FLOOR_MS, learned)))
+
+    def to_config(self):
+        return {
+            KEY_NAMES[i]: [round(self.mean[i], 1), round(self.dev[i], 1), self.count[i]]
+            for i in range(len(KEY_NAMES)) if self.count[i]
+        }
+
+    @classmethod
+    def from_config(cls, data):
+        model = cls()
+        for key_name, values in (data or {}).items():
+            try:
+                i = KEY_INDEX[key_name]
+                mean, dev, count = values
+                model.mean[i], model.dev[i], model.count[i] = float(mean), float(dev), int(count)
+            except (KeyError, TypeError, ValueError):
+                print(f"Ignoring bad adaptive timing entry: {key_name}")
+        return model
+
+
+# =================================================================================
+# HOOK DISPATCH (one low-level hook for everything)
+# =================================================================================
+
+class KeyDispatcher:
+    """
+    Routes raw hook events. F13-F24 are found by scan code in one dict lookup;
+    everything else is handed to the modifier tracker (which ignores
+    non-modifiers) and let through. Presses and releases come out paired,
+    with monotonic timestamps, so hold durations are available.
+    """
+    def __init__(self, scan_table, modifiers, on_press, on_release=None, clock=None):
+        self.scan_table = scan_table  # scan code -> 'f13'..'f24'
+        self.names = frozenset(KEY_NAMES)
+        self.modifiers = modifiers
+        self.on_press = on_press
+        self.on_release = on_release
+        self.clock = clock or MonotonicClock()
+        self.down_at = {}  # key_name -> press timestamp while held
+
+        self.events = 0
+        self.suppressed = 0
+
+    def dispatch(self, scan_code, name, down):
+        """Returns True when the event belongs to the keypad and must be suppressed."""
+        self.events += 1
+        key_name = self.scan_table.get(scan_code)
+        if key_name is None:
+            # Scan codes differ between layouts / drivers, names are the fallback
+            if name not in self.names:
+                self.modifiers.on_key(name, down)
+                return False
+            key_name = name
+
+        self.suppressed += 1
+        now = self.clock.now()
+        if down:
+            if key_name in self.down_at:
+                return True  # auto-repeat while held
+            self.down_at[key_name] = now
+            self.on_press(key_name, now)
+        else:
+            pressed_at = self.down_at.pop(key_name, None)
+            if self.on_release is not None and pressed_at is not None:
+                self.on_release(key_name, now, now - pressed_at)
+        return True
+
+
+# =================================================================================
+# CHORDS (two buttons pressed together)
+# =================================================================================
+
+class ChordDetector:
+    """
+    Sits between the dispatcher and the core and turns two buttons pressed
+    within window_ms of each other into one chord. Only buttons that take
+    part in a chord are held back, and never longer than the window: the
+    press goes through as an ordinary one as soon as its button is released,
+    a button that does not chord with it is pressed, or the window runs out.
+    Windows are measured on the hook timestamps, so a slow hand-off to the
+    core thread cannot turn two separate presses into a chord. Releases of
+    chorded buttons are swallowed. The clock should not be the core's own
+    timer slot (use a scheduler channel).
+    """
+    def __init__(self, core, clock, window_ms=DEFAULT_CHORD_WINDOW_MS):
+        self.core = core
+        self.clock = clock
+        self.window_s = window_ms / 1000.0
+        self.pending = None    # (key_name, t) held back, waiting for a partner
+        self.timer_id = None
+        self.consumed = set()  # chorded buttons whose release is still to come
+        self.chords = 0
+
+    def press(self, key_name, t=None):
+        if t is None:
+            t = self.clock.now()
+        table = self.core.table
+        if self.pending is not None:
+            first, first_t = self.pending
+            if t - first_t < self.window_s and frozenset((first, key_name)) in table.chords:
+                self.cancel()
+                self.pending = None
+                self.consumed.update((first, key_name))
+                self.chords += 1
+                self.core.chord((first, key_name))
+                return
+            self.resolve()
+
+        if key_name in table.chord_keys:
+            self.pending = (key_name, t)
+            remaining_ms = (self.window_s - (self.clock.now() - t)) * 1000.0
+            self.timer_id = self.clock.call_later(max(0.0, remaining_ms), self.resolve)
+        else:
+            self.core.press(key_name)
+
+    def release(self, key_name):
+        """Returns True when the release belonged to a chord (the core never saw the press)."""
+        if key_name in self.consumed:
+            self.consumed.discard(key_name)
+            return True
+        if self.pending is not None and self.pending[0] == key_name:
+            self.resolve()  # tapped and let go before a partner came
+        return False
+
+    def resolve(self):
+        """Lets the held-back press through as an ordinary one."""
+        self.cancel()
+        if self.pending is not None:
+            key_name = self.pending[0]
+            self.pending = None
+            self.core.press(key_name)
+
+    def cancel(self):
+        if self.timer_id is not None:
+            self.clock.cancel(self.timer_id)
+            self.timer_id = None
+
+
+# =================================================================================
+# PER-DEVICE ENGINES
+# =================================================================================
+
+def device_profile(config, device):
+    """
+    Settings for one input device: the global mapping / delay / cycle key,
+    overridden by config["devices"][device] when present. A device's
+    "mapping" only needs the buttons that differ.
+    """
+    profile = {
+        "mapping": config.get("mapping", DEFAULT_MAPPING),
+        "delay": config.get("delay", DEFAULT_DELAY_MS),
+        "t9_cycle_key": config.get("t9_cycle_key", DEFAULT_CYCLE_KEY),
+        "chording": config.get("chording", False),
+        "chord_window_ms": config.get("chord_window_ms", DEFAULT_CHORD_WINDOW_MS),
+    }
+    override = (config.get("devices") or {}).get(str(device)) if device is not None else None
+    if override:
+        profile.update({k: v for k, v in override.items() if k != "mapping"})
+        if "mapping" in override:
+            profile["mapping"] = {**profile["mapping"], **override["mapping"]}
+    return profile
+
+
+class DeviceSlot:
+    """What the router keeps per device. view / extra are host-specific."""
+    def __init__(self, core, dispatcher=None, view=None, profile=None, chords=None):
+        self.core = core
+        self.dispatcher = dispatcher
+        self.view = view
+        self.profile = profile or {}
+        self.chords = chords  # ChordDetector when the device has chording on
+
+
+class DeviceRouter:
+    """
+    Independent multi-tap state per input device, so two operators on one
+    station cannot break each other's cycles. The host's factory builds a
+    DeviceSlot on the device's first event; slots should share the sink and
+    one DeadlineScheduler (a channel each), so the cost stays flat as devices
+    are added, but each keeps its own ModifierState. Lookup is one dict hit per event.
+    """
+    def __init__(self, factory):
+        self.factory = factory
+        self.slots = {}
+
+    def get(self, device):
+        slot = self.slots.get(device)
+        if slot is None:
+            slot = self.slots[device] = self.factory(device)
+        return slot
+
+    def dispatch(self, device, scan_code, name, down):
+        return self.get(device).dispatcher.dispatch(scan_code, name, down)
+
+    def flush(self):
+        for slot in list(self.slots.values()):
+            if slot.chords is not None:
+                slot.chords.resolve()
+            slot.core.flush()
+
+
+# =================================================================================
+# MULTI-TAP STATE MACHINE
+# =================================================================================
+
+HOTKEY_NAMES = {',': 'comma', '+': 'plus', ' ': 'space'}
+
+
+class MultiTapCore:
+    """
+    The multi-tap state machine that used to live inside T9Engine.
+    press() is the per-event hot path, commit() fires when the timer expires.
+    """
+    def __init__(self, mapping, sink, clock, modifiers, delay_ms=DEFAULT_DELAY_MS, view=None):
+        self.mapping = mapping
+        self.sink = sink
+        self.clock = clock
+        self.modifiers = modifiers
+        # Modifiers as seen by the press that produced the current preview;
+        # commit uses them too, so the committed case always matches what the
+        # overlay showed. A new press takes its snapshot only after the
+        # previous cycle is committed.
+        self.mods = modifiers.snapshot()
+        self.delay_ms = delay_ms
+        self.view = view or NullView()
+
+        self.current_key = None
+        self.current_entries = None  # entries of the cycling button, fixed for the cycle
+        self.current_strip = None    # their display strings, for the overlay's candidate strip
+        self.char_index = 0
+        self.timer_id = None
+
+        # Sequence number of the press that opened the current cycle.
+        # Every cycle must end in exactly one committed(seq) - replay checks it.
+        self.cycle_seq = 0
+        self.press_seq = 0
+        self.last_release = None
+        self.last_press_t = 0.0
+
+        # Per-button learned timeout (None = fixed delay_ms for every button)
+        self.adaptive = None
+
+        # Next-word suggestions (t9ngram.NextWordModel), offered after a word ends
+        # as the first entries of the cycle key's next cycle
+        self.next_words = None
+        self.suggestions = ()
+
+        # Abbreviation expansion (t9snippet.SnippetExpander), applied to everything written
+        self.snippets = None
+
+        # Predictive (one press per letter) state, see set_dictionary()
+        self.dictionary = None
+        self.layout_dictionaries = {}  # layout name -> T9Dictionary for its letters
+        self.predictive = False
+        self.cycle_key = DEFAULT_CYCLE_KEY
+        self.word_seq = bytearray()
+        self.word_candidates = []
+        self.word_index = 0
+
+        # Named layouts: name -> (mapping, CompiledMapping), see set_layouts()
+        self.layouts = {}
+        self.layout = None
+        self.update_mapping(mapping)
+
+    def update_mapping(self, new_mapping):
+        self.mapping = new_mapping
+        self.table = CompiledMapping(new_mapping)
+        if self.layout is not None:
+            self.layouts[self.layout] = (new_mapping, self.table)
+
+    def set_layouts(self, layouts, active=None):
+        """Compiles every named layout up front, so switch_layout() only swaps references."""
+        compiled = {}
+        for name, mapping in layouts.items():
+            compiled[name] = (mapping, self.table if mapping is self.mapping else CompiledMapping(mapping))
+        self.layouts = compiled
+        self.layout = None
+        if active in compiled:
+            self.mapping, self.table = compiled[active]
+            self.layout = active
+
+    def switch_layout(self, name=None):
+        """Makes a precompiled layout the active one (None = the next in order)."""
+        if not self.layouts:
+            return False
+        if name is None:
+            names = list(self.layouts)
+            name = names[(names.index(self.layout) + 1) % len(names)] if self.layout in self.layouts else names[0]
+        entry = self.layouts.get(name)
+        if entry is None:
+            self.view.status(f"No layout named {name}")
+            return False
+        # A cycle in progress keeps its own entries and commits as shown; a
+        # word goes out first, its button codes belong to the old letters
+        if self.word_seq:
+            self.commit_word()
+        self.mapping, self.table = entry
+        self.layout = name
+        self.dictionary = self.layout_dictionaries.get(name, self.dictionary)
+        self.view.layout_changed(name)
+        return True
+
+    def release(self, key_name, held_s):
+        """Key-up with how long the button was held; kept for hold-based features."""
+        self.last_release = (key_name, held_s)
+
+    def set_dictionary(self, dictionary, enabled=True, layout_dictionaries=None):
+        """
+        Switches predictive mode on (with a T9Dictionary) or off (None).
+        layout_dictionaries (layout name -> T9Dictionary) are the indexes
+        switch_layout() selects; dictionary is the active layout's.
+        """
+        self.flush()
+        self.dictionary = dictionary
+        self.layout_dictionaries = layout_dictionaries or {}
+        self.predictive = enabled and dictionary is not None
+
+    def press(self, key_name):
+        now = self.clock.now()
+        self.press_seq += 1
+        mods = self.modifiers.snapshot()
+        self.view.signal(key_name)
+
+        button = KEY_INDEX.get(key_name)
+        if button is None:
+            return
+        if self.predictive and self.predict_press(key_name, button, mods):
+            self.suggestions = ()
+            return
+
+        entries = self.table.buttons[button]
+        if not entries:
+            self.suggestions = ()
+            return
+
+        if self.timer_id is not None:
+            self.clock.cancel(self.timer_id)
+
+        if self.current_key == key_name and self.timer_id is not None:
+            self.char_index = (self.char_index + 1) % len(self.current_entries)
+            if self.adaptive is not None:
+                self.adaptive.observe(button, now - self.last_press_t)
+        else:
+            # The previous cycle's timer is cancelled above, otherwise it would
+            # fire later and commit the new cycle early.
+            if self.current_key is not None:
+                self.commit()
+                if self.table.buttons[button] is not entries:
+                    # The commit was a LAYOUT entry: this press belongs to the new layout
+                    entries = self.table.buttons[button]
+                    if not entries:
+                        self.suggestions = ()
+                        return
+            self.current_key = key_name
+            self.current_entries = entries
+            self.current_strip = self.table.strips[button]
+            if self.suggestions and key_name == self.cycle_key:
+                # Set by the commit just above or by the last timeout: a new word starts here
+                self.current_entries = self.suggestions + entries
+                self.current_strip = tuple(tuple(e[mode][0] for e in self.current_entries) for mode in range(4))
+            self.char_index = 0
+            self.cycle_seq = self.press_seq
+        self.suggestions = ()
+        self.mods = mods
+
+        self.view.preview(self.current_entries[self.char_index][self.mods][0],
+                          self.current_strip[self.mods], self.char_index)
+
+        self.last_press_t = now
+        delay_ms = self.delay_ms
+        if self.adaptive is not None:
+            delay_ms = self.adaptive.timeout_ms(button, delay_ms)
+        self.timer_id = self.clock.call_later(delay_ms, self.commit)
+
+    def commit(self):
+        if self.current_key:
+            self.emit(self.current_entries[self.char_index][self.mods])
+
+        self.current_key = None
+        self.current_entries = None
+        self.current_strip = None
+        self.char_index = 0
+        self.view.hide()
+        self.timer_id = None
+        if self.suggestions:
+            self.view.suggest([entry[MOD_PLAIN][0] for entry in self.suggestions])
+
+    def emit(self, variant):
+        display, kind, payload, status = variant
+        if kind == 'write':
+            self.sink.write(payload if self.snippets is None else self.snippets.feed(payload))
+        elif kind == 'send':
+            self.sink.send(payload)
+            if self.snippets is not None:
+                self.snippets.key(payload)
+        else:
+            self.switch_layout(payload)
+            return
+        if status:
+            self.view.status(status)
+        self.view.committed(self.cycle_seq, payload)
+        if self.next_words is not None:
+            self.observe(kind, payload)
+
+    def observe(self, kind, payload):
+        """Feeds committed output to the next-word model; a finished word brings suggestions."""
+        ended = self.next_words.feed(payload) if kind == 'write' else self.next_words.key(payload)
+        if not ended:
+            self.suggestions = ()
+            return
+        words = self.next_words.suggest()
+        if self.next_words.at_sentence_start():
+            words = [w[:1].upper() + w[1:] for w in words]
+        self.suggestions = tuple(suggestion_entry(w) for w in words)
+
+    def chord(self, keys):
+        """Two buttons pressed together (see ChordDetector): commits at once, no cycle."""
+        entry = self.table.chords.get(frozenset(keys))
+        if entry is None:
+            return
+        self.press_seq += 1
+        mods = self.modifiers.snapshot()
+        self.view.signal(keys[0])
+        self.flush()  # a running cycle or word goes out first, with its own modifiers
+        self.mods = mods
+        self.cycle_seq = self.press_seq
+        self.emit(entry[self.mods])
+        self.view.hide()
+        if self.suggestions:
+            self.view.suggest([entry[MOD_PLAIN][0] for entry in self.suggestions])
+
+    def flush(self):
+        """Commits whatever is pending right now (used on shutdown / end of replay)."""
+        if self.timer_id is not None:
+            self.clock.cancel(self.timer_id)
+        if self.current_key is not None:
+            self.commit()
+        if self.word_seq:
+            self.commit_word()
+
+    # --- Predictive mode ---
+    def predict_press(self, key_name, button, mods):
+        """
+        Handles a press in predictive mode. Returns False when the press should
+        fall through to multi-tap (punctuation, space, enter, Ctrl shortcuts).
+        mods is this press's snapshot; a word committed here keeps its own.
+        """
+        if self.table.letters[button] is not None and mods < MOD_CTRL:
+            if self.current_key is not None:
+                self.flush()
+            if not self.word_seq:
+                self.mods = mods  # the word is capitalised from its first letter
+                self.cycle_seq = self.press_seq
+            self.word_seq.append(button + 1)  # dictionary button codes are 1..12
+            self.lookup_word(button)
+            return True
+
+        if not self.word_seq:
+            return False
+
+        if key_name == self.cycle_key:
+            self.word_index = (self.word_index + 1) % len(self.word_candidates)
+            self.preview_word()
+            return True
+
+        if self.table.is_backspace[button]:
+            self.word_seq.pop()
+            if self.word_seq:
+                self.lookup_word(None)
+            else:
+                self.reset_word()
+                self.view.hide()
+            return True
+
+        self.commit_word()
+        return False
+
+    def lookup_word(self, button):
+        words, exact = self.dictionary.lookup(bytes(self.word_seq), MAX_CANDIDATES)
+        if not words:
+            # Unknown sequence: keep the previous stem and add the key's first
+            # letter, or (Backspace, button None) drop the stem's last letter
+            stem = self.word_candidates[self.word_index] if self.word_candidates else ""
+            if button is None:
+                stem = stem[:len(self.word_seq)]
+            else:
+                stem = stem[:len(self.word_seq) - 1] + self.table.letters[button]
+            words = [stem]
+        self.word_candidates = words
+        self.word_index = 0
+        self.preview_word()
+
+    def preview_word(self):
+        self.view.preview(self.word_text(), self.word_candidates, self.word_index)
+
+    def word_text(self):
+        word = self.word_candidates[self.word_index]
+        if self.mods == MOD_CAPITAL and word:
+            word = word[0].upper() + word[1:]
+        return word
+
+    def commit_word(self):
+        word = self.word_text()
+        if word:
+            self.sink.write(word if self.snippets is None else self.snippets.feed(word))
+            self.view.committed(self.cycle_seq, word)
+            if self.next_words is not None:
+                self.next_words.feed(word)
+            self.view.status(f"Typed: {word}")
+        self.reset_word()
+        self.view.hide()
+
+    def reset_word(self):
+        self.word_seq.clear()
+        self.word_candidates = []
+        self.word_index = 0
@@ -0,0 +1,193 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+
+# =================================================================================
+# T9 DICTIONARY INDEX
+# =================================================================================
+# Words are indexed by the sequence of buttons that types them (one press per
+# letter). The compiled index is a flat, sorted array of records that is
+# memory-mapped, so opening it is instant and lookups are a binary search.
+#
+# File layout (little endian):
+#   b'T9IX' | u32 version | u32 count | u32 table_len | table (JSON) |
+#   u32 offsets[count] | records...
+# record: u8 seq_len | seq bytes | u32 freq | u8 word_len | word (utf-8)
+# Records are sorted by (seq, -freq), so exact matches for a sequence come
+# first, best first, followed by the longer words that start with it.
+
+MAGIC = b'T9IX'
+VERSION = 1
+KEY_NAMES = [f'f{i}' for i in range(13, 25)]
+INDEX_SUFFIX = '.t9idx'
+SCAN_LIMIT = 512  # max prefix records inspected when there is no exact match
+
+
+def letter_codes(mapping):
+    """letter -> button code (1..12) for every single-letter entry in the mapping."""
+    codes = {}
+    for num, key_name in enumerate(KEY_NAMES, start=1):
+        for char in mapping.get(key_name, []):
+            if len(char) == 1 and char.isalpha():
+                codes.setdefault(char.lower(), num)
+    return codes
+
+
+def encode_word(word, codes):
+    try:
+        return bytes(codes[c] for c in word)
+    except KeyError:
+        return None
+
+
+def read_wordlist(path):
+    """
+    Word list: one word per line, optionally followed by a count.
+    Without counts, earlier lines rank higher.
+    """
+    words = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [ln.split() for ln in f if ln.strip() and not ln.startswith('#')]
+    for rank, parts in enumerate(lines):
+        word = parts[0].lower()
+        freq = int(parts[1]) if len(parts) > 1 else len(lines) - rank
+        words[word] = max(freq, words.get(word, 0))
+    return words
+
+
+def compile_index(words, codes, out_path):
+    records = []
+    for word, freq in words.items():
+        seq = encode_word(word, codes)
+        if seq and len(seq) < 256:
+            records.append((seq, -freq, word))
+    records.sort()
+
+    table = json.dumps(codes, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    header = MAGIC + struct.pack('<III', VERSION, len(records), len(table)) + table
+    blobs = []
+    offset = len(header) + 4 * len(records)
+    offsets = []
+    for seq, neg_freq, word in records:
+        w = word.encode('utf-8')[:255]
+        blob = struct.pack('<B', len(seq)) + seq + struct.pack('<IB', min(-neg_freq, 0xFFFFFFFF), len(w)) + w
+        offsets.append(offset)
+        offset += len(blob)
+        blobs.append(blob)
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, out_path)
+    return len(records)
+
+
+class T9Dictionary:
+    """Read-only view over a compiled, memory-mapped index."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a T9 index")
+        version, self.count, table_len = struct.unpack_from('<III', self._mm, 4)
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path} has index version {version}, expected {VERSION}")
+        self.codes = json.loads(self._mm[16:16 + table_len].decode('utf-8'))
+        self._offsets = 16 + table_len
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def _seq_at(self, i):
+        off = struct.unpack_from('<I', self._mm, self._offsets + 4 * i)[0]
+        n = self._mm[off]
+        return off, self._mm[off + 1:off + 1 + n]
+
+    def _word_at(self, off, seq_len):
+        off += 1 + seq_len
+        freq, n = struct.unpack_from('<IB', self._mm, off)
+        return self._mm[off + 5:off + 5 + n].decode('utf-8'), freq
+
+    def _lower_bound(self, seq):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._seq_at(mid)[1] < seq:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, seq, limit=8):
+        """
+        Candidates for a button sequence, most frequent first.
+        Returns (words, exact). Without an exact match the best longer word's
+        stem is returned instead so the preview still shows something.
+        """
+        i = self._lower_bound(seq)
+        exact = []
+        best = None
+        end = min(self.count, i + SCAN_LIMIT)
+        while i < end:
+            off, rec_seq = self._seq_at(i)
+            if rec_seq == seq:
+                if len(exact) < limit:
+                    exact.append(self._word_at(off, len(rec_seq))[0])
+            elif rec_seq.startswith(seq):
+                if exact:
+                    break
+                word, freq = self._word_at(off, len(rec_seq))
+                if best is None or freq > best[1]:
+                    best = (word, freq)
+            else:
+                break
+            i += 1
+        if exact:
+            return exact, True
+        if best:
+            return [best[0][:len(seq)]], False
+        return [], False
+
+
+def layout_index_path(wordlist_path, codes):
+    """Index file for a letter layout other than the main one: <list>-<crc32 of the codes>.t9idx."""
+    crc = zlib.crc32(json.dumps(sorted(codes.items())).encode('utf-8'))
+    return f"{os.path.splitext(wordlist_path)[0]}-{crc:08x}{INDEX_SUFFIX}"
+
+
+def load_dictionary(wordlist_path, mapping, index_path=None):
+    """
+    Opens the compiled index next to the word list (or at index_path),
+    rebuilding it when the word list is newer or the mapping puts letters on
+    different buttons. Returns None when there is no word list.
+    """
+    codes = letter_codes(mapping)
+    index_path = index_path or os.path.splitext(wordlist_path)[0] + INDEX_SUFFIX
+    if not os.path.exists(wordlist_path) and not os.path.exists(index_path):
+        return None
+
+    try:
+        stale = (os.path.exists(wordlist_path)
+                 and os.path.getmtime(index_path) < os.path.getmtime(wordlist_path))
+        if not stale:
+            d = T9Dictionary(index_path)
+            if d.codes == codes:
+                return d
+            d.close()
+    except (OSError, ValueError):
+        pass
+
+    if not os.path.exists(wordlist_path):
+        return None
+    count = compile_index(read_wordlist(wordlist_path), codes, index_path)
+    print(f"Compiled T9 index: {count} words -> {index_path}")
+    return T9Dictionary(index_path)
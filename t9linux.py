@@ -0,0 +1,360 @@
+"""
+Native Linux backend: F13-F24 straight from an evdev node, output through a
+uinput virtual keyboard, single instance via a lock file. Stdlib only - no
+keyboard module, no Tk, no Windows API - so it runs on headless kiosks.
+
+    python t9linux.py /dev/input/by-id/usb-Logitech_G600-if01-event-kbd
+    python t9linux.py /dev/input/by-id/<keypad-1> /dev/input/by-id/<keypad-2>
+
+Point it at the *keyboard* interface of the mouse / keypad: the node is
+grabbed exclusively (that is how F13-F24 are suppressed), and every other key
+from it is passed through the virtual keyboard unchanged. The mapping, delay
+and dictionary come from the same config file as the Windows app.
+"""
+import argparse
+import fcntl
+import json
+import os
+import select
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from t9core import (
+    DEFAULT_MAPPING, KEY_NAMES, ChordDetector, DeadlineScheduler, DeviceRouter, DeviceSlot,
+    KeyDispatcher, ModifierState, MultiTapCore, device_profile,
+)
+from t9dict import load_dictionary
+
+CONFIG_FILENAME = "mouse_t9keypad_config.json"
+LOCK_FILENAME = "mouse_t9keypad.lock"
+
+# =================================================================================
+# EVDEV / UINPUT CONSTANTS
+# =================================================================================
+
+EVENT_FORMAT = 'llHHi'  # struct input_event: timeval, type, code, value
+EVENT_SIZE = struct.calcsize(EVENT_FORMAT)
+EV_SYN, EV_KEY = 0x00, 0x01
+SYN_REPORT = 0
+KEY_UP, KEY_DOWN, KEY_REPEAT = 0, 1, 2
+
+EVIOCGRAB = 0x40044590      # _IOW('E', 0x90, int)
+UI_SET_EVBIT = 0x40045564   # _IOW('U', 100, int)
+UI_SET_KEYBIT = 0x40045565  # _IOW('U', 101, int)
+UI_DEV_CREATE = 0x5501      # _IO('U', 1)
+UI_DEV_DESTROY = 0x5502     # _IO('U', 2)
+UINPUT_USER_DEV = '80sHHHHi' + '64i' * 4  # legacy setup struct, works on every kernel
+BUS_USB = 0x03
+
+KEY_F13 = 183
+KEYPAD_CODES = {KEY_F13 + i: key_name for i, key_name in enumerate(KEY_NAMES)}
+MODIFIER_CODES = {29: 'left ctrl', 97: 'right ctrl', 42: 'left shift', 54: 'right shift', 58: 'caps lock'}
+KEY_LEFTCTRL, KEY_LEFTSHIFT = 29, 42
+HELD_CODES = frozenset((29, 97, 42, 54))  # Ctrl / Shift the sink lifts around its own output
+MAX_KEY_CODE = 255
+
+# US layout: char -> (key code, needs shift)
+_ROWS = {
+    'qwertyuiop': 16, 'asdfghjkl': 30, 'zxcvbnm': 44, '1234567890': 2,
+}
+_PLAIN = {' ': 57, '-': 12, '=': 13, '[': 26, ']': 27, ';': 39, "'": 40,
+          '`': 41, '\\': 43, ',': 51, '.': 52, '/': 53, '\n': 28, '\t': 15, '\b': 14}
+_SHIFTED = {'!': '1', '@': '2', '#': '3', '$': '4', '%': '5', '^': '6', '&': '7',
+            '*': '8', '(': '9', ')': '0', '_': '-', '+': '=', '{': '[', '}': ']',
+            ':': ';', '"': "'", '~': '`', '|': '\\', '<': ',', '>': '.', '?': '/'}
+
+
+def build_char_table():
+    table = {}
+    for row, first in _ROWS.items():
+        for i, c in enumerate(row):
+            table[c] = (first + i, False)
+            if c.isalpha():
+                table[c.upper()] = (first + i, True)
+    for c, code in _PLAIN.items():
+        table[c] = (code, False)
+    for c, base in _SHIFTED.items():
+        table[c] = (table[base][0], True)
+    return table
+
+
+CHAR_TABLE = build_char_table()
+NAME_CODES = {'ctrl': KEY_LEFTCTRL, 'shift': KEY_LEFTSHIFT, 'alt': 56, 'enter': 28,
+              'backspace': 14, 'tab': 15, 'space': 57, 'esc': 1, 'comma': 51}
+NAME_CODES.update({c: code for c, (code, shift) in CHAR_TABLE.items() if not shift})
+
+
+def pack_event(ev_type, code, value):
+    return struct.pack(EVENT_FORMAT, 0, 0, ev_type, code, value)
+
+
+SYN = pack_event(EV_SYN, SYN_REPORT, 0)
+
+
+def pack_tap(codes):
+    """Press codes in order, release in reverse - one SYN per state change."""
+    out = [pack_event(EV_KEY, c, KEY_DOWN) + SYN for c in codes]
+    out += [pack_event(EV_KEY, c, KEY_UP) + SYN for c in reversed(codes)]
+    return b''.join(out)
+
+
+# Prebuilt byte sequences, so injecting a character is a dict hit and a write()
+CHAR_SEQUENCES = {c: pack_tap((KEY_LEFTSHIFT, code) if shift else (code,))
+                  for c, (code, shift) in CHAR_TABLE.items()}
+
+# =================================================================================
+# OUTPUT: UINPUT VIRTUAL KEYBOARD
+# =================================================================================
+
+class UinputSink:
+    """
+    MultiTapCore sink writing prebuilt event sequences to /dev/uinput.
+    With create=False the fd is used as-is (a pipe in the tests).
+    Writes come from the reader thread (pass-through) and the deadline
+    thread (commits), so each sequence is written under a lock. A Shift or
+    Ctrl forwarded from a device is still down on the virtual keyboard, so
+    it is released before each sequence and pressed again after it: the
+    prebuilt taps then type exactly what they were built for.
+    """
+    def __init__(self, fd, create=True, name=b"Mouse T9 Keypad"):
+        self.fd = fd
+        self.created = create
+        self._lock = threading.Lock()
+        self._combos = {}
+        self.held = set()  # HELD_CODES forwarded down and not yet up
+        if create:
+            fcntl.ioctl(fd, UI_SET_EVBIT, EV_KEY)
+            for code in range(1, MAX_KEY_CODE + 1):
+                fcntl.ioctl(fd, UI_SET_KEYBIT, code)
+            setup = struct.pack(UINPUT_USER_DEV, name, BUS_USB, 0x1, 0x1, 1, 0, *([0] * 256))
+            os.write(fd, setup)
+            fcntl.ioctl(fd, UI_DEV_CREATE)
+            time.sleep(0.1)  # let the desktop pick up the new device
+
+    def _write(self, data):
+        with self._lock:
+            if self.held:
+                held = sorted(self.held)
+                data = (b''.join(pack_event(EV_KEY, c, KEY_UP) + SYN for c in held) + data
+                        + b''.join(pack_event(EV_KEY, c, KEY_DOWN) + SYN for c in held))
+            os.write(self.fd, data)
+
+    def write(self, text):
+        seq = []
+        for c in text:
+            data = CHAR_SEQUENCES.get(c)
+            if data is None:
+                print(f"No key for {c!r} on the virtual keyboard, skipped")
+                continue
+            seq.append(data)
+        if seq:
+            self._write(b''.join(seq))
+
+    def send(self, keys):
+        data = self._combos.get(keys)
+        if data is None:
+            try:
+                data = self._combos[keys] = pack_tap([NAME_CODES[k] for k in keys.split('+')])
+            except KeyError:
+                print(f"No key for {keys!r} on the virtual keyboard, skipped")
+                return
+        self._write(data)
+
+    def forward(self, code, value):
+        """Pass-through of a key the grab swallowed but that is not ours."""
+        with self._lock:
+            if code in HELD_CODES:
+                if value == KEY_UP:
+                    self.held.discard(code)
+                else:
+                    self.held.add(code)
+            os.write(self.fd, pack_event(EV_KEY, code, value) + SYN)
+
+    def close(self):
+        if self.created:
+            try:
+                fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+            except OSError:
+                pass
+        os.close(self.fd)
+
+# =================================================================================
+# BACKEND
+# =================================================================================
+
+class LinuxBackend:
+    """
+    One reader thread over every keypad's evdev fd (select), one virtual
+    keyboard, one deadline thread. Each device gets its own MultiTapCore and
+    KeyDispatcher through a DeviceRouter, so two operators never share a
+    multi-tap cycle; per-device mapping / delay come from config["devices"]
+    keyed by the device path. F13-F24 run the device's core (on this thread,
+    under the scheduler lock), modifiers update that device's ModifierState
+    (Shift on one keypad does not capitalise another's letters) and
+    everything else is forwarded to the virtual keyboard.
+    """
+    def __init__(self, config, devices, sink, grab=True):
+        self.fds = dict(devices)  # device path -> fd
+        self.by_fd = {fd: device for device, fd in self.fds.items()}
+        self.config = config
+        self.sink = sink
+        self.grabbed = []
+        if grab:
+            for fd in self.fds.values():
+                fcntl.ioctl(fd, EVIOCGRAB, 1)
+                self.grabbed.append(fd)
+
+        self.scheduler = DeadlineScheduler()
+        self.lock = self.scheduler.lock
+        self.dictionary = None
+        if config.get("predictive", False):
+            path = config.get("t9_dictionary", "t9_words.txt")
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+            self.dictionary = load_dictionary(path, config.get("mapping", DEFAULT_MAPPING))
+        self.snippets = None
+        if config.get("snippets"):
+            from t9snippet import SnippetAutomaton
+            self.snippets = SnippetAutomaton(config["snippets"])  # one automaton, a match state per device
+        self.router = DeviceRouter(self.make_slot)
+        for device in self.fds:
+            self.router.get(device)  # build every slot up front, not on the first key
+
+    def make_slot(self, device):
+        profile = device_profile(self.config, device)
+        modifiers = ModifierState()
+        core = MultiTapCore(profile["mapping"], self.sink, self.scheduler.channel(device),
+                            modifiers, profile["delay"])
+        core.cycle_key = profile["t9_cycle_key"]
+        # The index is built for the global mapping; devices with their own letters stay multi-tap
+        if self.dictionary is not None and profile["mapping"] == self.config.get("mapping", DEFAULT_MAPPING):
+            core.set_dictionary(self.dictionary)
+        if self.snippets is not None:
+            from t9snippet import SnippetExpander
+            core.snippets = SnippetExpander(self.snippets)
+
+        chords = None
+        if profile["chording"]:
+            chords = ChordDetector(core, self.scheduler.channel((device, 'chord')), profile["chord_window_ms"])
+
+        def on_press(key_name, t):
+            with self.lock:
+                if chords is not None:
+                    chords.press(key_name, t)
+                else:
+                    core.press(key_name)
+
+        def on_release(key_name, t, held_s):
+            with self.lock:
+                if chords is None or not chords.release(key_name):
+                    core.release(key_name, held_s)
+
+        dispatcher = KeyDispatcher(KEYPAD_CODES, modifiers, on_press, on_release)
+        return DeviceSlot(core, dispatcher, profile=profile, chords=chords)
+
+    def handle(self, device, ev_type, code, value):
+        if ev_type != EV_KEY:
+            return  # SYN / MSC: forward() emits its own SYN
+        name = MODIFIER_CODES.get(code, '')
+        if not self.router.dispatch(device, code, name, value != KEY_UP):
+            self.sink.forward(code, value)
+
+    def run(self):
+        """Blocks until every device has gone away (or hit EOF, for fake devices)."""
+        buf_size = EVENT_SIZE * 64
+        unpack = struct.Struct(EVENT_FORMAT).iter_unpack
+        handle = self.handle
+        open_fds = list(self.by_fd)
+        while open_fds:
+            ready, _, _ = select.select(open_fds, [], [])
+            for fd in ready:
+                try:
+                    data = os.read(fd, buf_size)
+                except OSError as e:
+                    print(f"Device read error ({self.by_fd[fd]}): {e}")
+                    data = b''
+                if not data:
+                    open_fds.remove(fd)
+                    continue
+                device = self.by_fd[fd]
+                for _, _, ev_type, code, value in unpack(data):
+                    handle(device, ev_type, code, value)
+
+    def close(self):
+        with self.lock:
+            self.router.flush()
+        self.scheduler.close()
+        for fd in self.grabbed:
+            try:
+                fcntl.ioctl(fd, EVIOCGRAB, 0)
+            except OSError:
+                pass
+        for fd in self.fds.values():
+            os.close(fd)
+
+# =================================================================================
+# SINGLE INSTANCE / CONFIG
+# =================================================================================
+
+def acquire_lock():
+    """flock()ed lock file; returns the open file (keep it) or None if taken."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    f = open(os.path.join(runtime_dir, LOCK_FILENAME), 'a+')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    f.seek(0)
+    f.truncate()
+    f.write(str(os.getpid()))
+    f.flush()
+    return f
+
+
+def load_config(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading config: {e}")
+    return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mouse T9 Keypad - Linux evdev/uinput backend")
+    parser.add_argument("devices", nargs="*", help="evdev node(s) of the keypads (/dev/input/by-id/...-event-kbd)")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG_FILENAME))
+    parser.add_argument("--no-grab", action="store_true", help="Do not grab the device (keys are not suppressed)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    devices = args.devices or config.get("linux_devices") or []
+    if not devices:
+        parser.error("give the evdev device(s) (or set linux_devices in the config)")
+
+    lock = acquire_lock()
+    if lock is None:
+        print("Mouse T9 Keypad is already running.")
+        return 1
+
+    sink = UinputSink(os.open("/dev/uinput", os.O_WRONLY | os.O_NONBLOCK))
+    backend = LinuxBackend(config, {d: os.open(d, os.O_RDONLY) for d in devices}, sink, grab=not args.no_grab)
+    print(f"Listening on {', '.join(devices)}")
+    try:
+        backend.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.close()
+        sink.close()
+        lock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
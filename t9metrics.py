@@ -0,0 +1,234 @@
+"""
+Latency metrics for the live engine.
+
+Every stage of a press (hook callback, hand-off to the Tk thread, the core's
+press(), commit timer lateness, OS injection) is recorded into a fixed-size
+histogram. Snapshots are served as JSON on a local TCP socket (config
+"stats_port") and written to a file from the tray menu ("Dump stats").
+Commands on that socket (profile, record, the daemon's settings) need the
+per-session token the server writes, with its port, to the control file.
+
+Read a running instance with:
+    python t9metrics.py 47913
+"""
+import bisect
+import hmac
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+
+# =================================================================================
+# HISTOGRAMS
+# =================================================================================
+# Log-scale buckets, 10 per decade from 1 us to 10 s. Recording is one bisect
+# over this list plus a few integer updates, with no allocation, so it can
+# sit on the hook path. Percentiles are reported as the bucket's upper bound
+# (at most ~26% high, never above the recorded max).
+
+BUCKET_BOUNDS_US = [round(10 ** (i / 10.0), 3) for i in range(71)]
+STAGES = ('hook', 'hook_to_gui', 'press', 'commit_late', 'inject')
+DEFAULT_STATS_PORT = 47913
+CONTROL_FILENAME = "mouse_t9keypad_control.json"
+
+
+class Histogram:
+    """
+    Fixed-size latency histogram. Each one is written by a single thread
+    (the stage's own), readers only take snapshots.
+    """
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_US) + 1)
+        self.total = 0
+        self.sum_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, seconds):
+        us = seconds * 1e6
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_US, us)] += 1
+        self.total += 1
+        self.sum_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, pct):
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = pct / 100.0 * total
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKET_BOUNDS_US[i], self.max_us) if i < len(BUCKET_BOUNDS_US) else self.max_us
+        return self.max_us
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "avg_us": self.sum_us / self.total if self.total else 0.0,
+            "p50_us": self.percentile(50),
+            "p95_us": self.percentile(95),
+            "p99_us": self.percentile(99),
+            "max_us": self.max_us,
+        }
+
+
+class Metrics:
+    """One histogram per stage plus free-form counters."""
+    def __init__(self):
+        self.started = time.time()
+        self.hist = {stage: Histogram() for stage in STAGES}
+        self.counters = {}
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self, counters=None):
+        """counters: extra values owned by other objects (dispatcher, scheduler...)."""
+        merged = dict(self.counters)
+        merged.update(counters or {})
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "stages": {stage: h.summary() for stage, h in self.hist.items()},
+            "counters": merged,
+        }
+
+
+def format_snapshot(snap):
+    lines = [f"uptime {snap['uptime_s']:.0f} s"]
+    lines.append(f"{'stage':<12} {'count':>8} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'max us':>10}")
+    for stage, s in snap["stages"].items():
+        lines.append(f"{stage:<12} {s['count']:>8} {s['p50_us']:>9.1f} {s['p95_us']:>9.1f} "
+                     f"{s['p99_us']:>9.1f} {s['max_us']:>10.1f}")
+    lines.append("  ".join(f"{k}={v}" for k, v in sorted(snap["counters"].items())))
+    return "\n".join(lines)
+
+# =================================================================================
+# LOCAL STATS SOCKET
+# =================================================================================
+
+class StatsServer:
+    """
+    One request per connection on 127.0.0.1:port (port 0: chosen by the OS):
+    the client sends a command line ("stats" if it sends nothing) and gets one
+    JSON reply. A command is a name optionally followed by a JSON (or bare
+    word) argument, e.g. "profile start" or "delay 600", and is prefixed with
+    "@<token> ". Besides "stats", which anyone on the machine may read, only
+    the commands the host registers are accepted, and only with the token.
+    """
+    READ_TIMEOUT_S = 1.0
+    MAX_REQUEST = 1 << 20
+
+    def __init__(self, snapshot_fn, port=DEFAULT_STATS_PORT, host='127.0.0.1', commands=None):
+        self.snapshot_fn = snapshot_fn
+        self.commands = commands or {}
+        self.token = secrets.token_hex(16)  # new every session, see write_control_file()
+        self.sock = socket.create_server((host, port))
+        self.port = self.sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._run, name="T9Stats", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # closed
+            try:
+                with conn:
+                    conn.sendall(json.dumps(self.handle(conn)).encode('utf-8') + b'\n')
+            except Exception as e:
+                print(f"Stats socket error: {e}")
+
+    def handle(self, conn):
+        conn.settimeout(self.READ_TIMEOUT_S)
+        try:
+            command = conn.makefile('rb').readline(self.MAX_REQUEST).decode('utf-8', 'replace').strip()
+        except socket.timeout:
+            command = ''  # plain "connect and read" clients
+        authorized = False
+        if command.startswith('@'):
+            token, _, command = command[1:].partition(' ')
+            authorized = hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+        name, _, raw = command.partition(' ')
+        if name in ('', 'stats'):
+            return self.snapshot_fn()
+        if not authorized:
+            return {"error": "not authorized"}
+        handler = self.commands.get(name)
+        if handler is None:
+            return {"error": f"unknown command: {name}"}
+        try:
+            arg = json.loads(raw) if raw else None
+        except ValueError:
+            arg = raw
+        return handler(arg)
+
+    def close(self):
+        self.sock.close()
+
+
+def send_command(command, port=DEFAULT_STATS_PORT, host='127.0.0.1', timeout=5.0, token=None):
+    """Sends one command line to a running instance and returns its JSON reply."""
+    if token:
+        command = f"@{token} {command}"
+    with socket.create_connection((host, port), timeout=timeout) as conn:
+        conn.sendall(command.encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                break
+            chunks.append(data)
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def read_stats(port=DEFAULT_STATS_PORT, host='127.0.0.1', timeout=2.0):
+    return send_command('stats', port, host, timeout)
+
+
+def control_file_path():
+    """Per-user location of the control file (LOCALAPPDATA, XDG_RUNTIME_DIR or home)."""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_RUNTIME_DIR') or os.path.expanduser('~')
+    return os.path.join(base, CONTROL_FILENAME)
+
+
+def write_control_file(port, token, path=None):
+    """
+    Records the running server's port and token for local clients. Created
+    afresh with mode 0600, so an older file's permissions are never kept.
+    """
+    path = path or control_file_path()
+    remove_control_file(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({"port": port, "token": token, "pid": os.getpid()}, f)
+    return path
+
+
+def read_control_file(path=None):
+    """(port, token) of the running instance; OSError / ValueError when there is none."""
+    with open(path or control_file_path(), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return int(data["port"]), str(data["token"])
+
+
+def remove_control_file(path=None):
+    try:
+        os.remove(path or control_file_path())
+    except FileNotFoundError:
+        pass
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_STATS_PORT
+    snap = read_stats(port)
+    if "--json" in sys.argv:
+        print(json.dumps(snap))
+    else:
+        print(format_snapshot(snap))
@@ -0,0 +1,203 @@
+import os
+import threading
+from collections import OrderedDict
+
+# =================================================================================
+# NEXT-WORD MODEL
+# =================================================================================
+# Bigram and trigram counts learned from the committed text. Memory is
+# bounded: each table keeps at most max_contexts contexts (least recently
+# used ones are evicted), and each context keeps its max_followers most
+# frequent next words. A lookup touches two dict entries and sorts at most
+# 2 * max_followers counts, so it stays in the microseconds.
+#
+# Persistence is an append-only journal of observed (w1, w2, next) triples
+# plus a snapshot of the counts. Loading reads the snapshot and replays the
+# journal. Once the journal passes COMPACT_LINES, a background thread writes
+# a new snapshot and empties the journal.
+#
+#   <base>.snapshot   "count w1 next" and "count w1 w2 next" lines
+#   <base>.journal    "w1 w2 next" lines
+
+BOS = '<s>'              # context at the start of a sentence
+SENTENCE_END = '.!?\n'
+COMPACT_LINES = 20000
+MAX_SUGGESTIONS = 4
+TRIGRAM_WEIGHT = 4       # a trigram hit counts this many times a bigram hit
+
+
+class _Table:
+    """context -> {next word: count}, LRU-bounded."""
+    def __init__(self, max_contexts, max_followers):
+        self.contexts = OrderedDict()
+        self.max_contexts = max_contexts
+        self.max_followers = max_followers
+
+    def add(self, context, word, n=1):
+        followers = self.contexts.get(context)
+        if followers is None:
+            followers = self.contexts[context] = {}
+            if len(self.contexts) > self.max_contexts:
+                self.contexts.popitem(last=False)
+        else:
+            self.contexts.move_to_end(context)
+        followers[word] = followers.get(word, 0) + n
+        if len(followers) > self.max_followers:
+            # The newcomer is kept, so it can grow past the old tail
+            weakest = min((w for w in followers if w != word), key=followers.get)
+            del followers[weakest]
+
+    def get(self, context):
+        return self.contexts.get(context)
+
+
+class NextWordModel:
+    """
+    Fed with committed output (feed() for text, key() for sent keys); after a
+    word ends, suggest() offers the likely next words. Calls may come from
+    the GUI and the deadline thread, so they hold a lock of their own.
+    """
+    def __init__(self, base_path=None, max_contexts=5000, max_followers=12):
+        self.base_path = base_path
+        self.bigrams = _Table(max_contexts, max_followers)
+        self.trigrams = _Table(max_contexts, max_followers)
+        self.history = (BOS, BOS)
+        self.word = []
+        self.journal = None
+        self.journal_lines = 0
+        self.compacting = False
+        self._lock = threading.Lock()
+
+    # --- learning ---
+    def feed(self, text):
+        """Returns True when text ended with a word boundary, i.e. a new word comes next."""
+        boundary = False
+        with self._lock:
+            for ch in text:
+                if ch.isalpha() or (ch == "'" and self.word):
+                    self.word.append(ch)
+                    boundary = False
+                else:
+                    self.end_word(ch in SENTENCE_END)
+                    boundary = True
+        return boundary
+
+    def key(self, keys):
+        """Sent keys: Enter ends the word and the sentence, Backspace edits the word."""
+        with self._lock:
+            if keys == 'enter':
+                self.end_word(True)
+                return True
+            if keys == 'backspace':
+                if self.word:
+                    self.word.pop()
+                else:
+                    self.history = (BOS, BOS)  # edited into the previous word: context unknown
+        return False
+
+    def end_word(self, sentence_end):
+        if self.word:
+            word = ''.join(self.word).lower()
+            self.word.clear()
+            self.learn(self.history[0], self.history[1], word)
+            self.write_journal(self.history[0], self.history[1], word)
+            self.history = (self.history[1], word)
+        if sentence_end:
+            self.history = (BOS, BOS)
+
+    def learn(self, w1, w2, word, n=1):
+        self.bigrams.add(w2, word, n)
+        self.trigrams.add((w1, w2), word, n)
+
+    # --- suggestions ---
+    def suggest(self, count=MAX_SUGGESTIONS):
+        with self._lock:
+            if self.word:
+                return []
+            w1, w2 = self.history
+            scores = {}
+            for word, n in (self.bigrams.get(w2) or {}).items():
+                scores[word] = n
+            for word, n in (self.trigrams.get((w1, w2)) or {}).items():
+                scores[word] = scores.get(word, 0) + n * TRIGRAM_WEIGHT
+        return sorted(scores, key=scores.get, reverse=True)[:count]
+
+    def at_sentence_start(self):
+        return self.history[1] == BOS
+
+    # --- persistence ---
+    def load(self):
+        """Reads the snapshot, replays the journal and opens it for appending."""
+        if self.base_path is None:
+            return self
+        try:
+            with open(self.base_path + ".snapshot", 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3:
+                        self.bigrams.add(parts[1], parts[2], int(parts[0]))
+                    elif len(parts) == 4:
+                        self.trigrams.add((parts[1], parts[2]), parts[3], int(parts[0]))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Next-word snapshot unreadable, starting over: {e}")
+        # .journal.old only survives a compaction that was cut short
+        for suffix in (".journal.old", ".journal"):
+            try:
+                with open(self.base_path + suffix, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 3:  # a torn last line is skipped
+                            self.learn(*parts)
+                            self.journal_lines += 1
+            except FileNotFoundError:
+                pass
+        self.journal = open(self.base_path + ".journal", 'a', encoding='utf-8')
+        if self.journal_lines >= COMPACT_LINES:
+            self.compact()
+        return self
+
+    def write_journal(self, w1, w2, word):
+        if self.journal is None:
+            return
+        self.journal.write(f"{w1} {w2} {word}\n")
+        self.journal_lines += 1
+        if self.journal_lines >= COMPACT_LINES and not self.compacting:
+            self.compacting = True
+            threading.Thread(target=self.compact, name="T9NgramCompact", daemon=True).start()
+
+    def compact(self):
+        """Writes the counts as a new snapshot and starts an empty journal."""
+        with self._lock:
+            bigrams = [(w2, dict(f)) for w2, f in self.bigrams.contexts.items()]
+            trigrams = [(ctx, dict(f)) for ctx, f in self.trigrams.contexts.items()]
+            self.journal.close()
+            # Lines learned from here on go to the new journal; the snapshot has the rest
+            if os.path.exists(self.base_path + ".journal.old"):
+                # Left by an earlier cut-short compaction; it was replayed at load
+                os.remove(self.base_path + ".journal.old")
+            os.replace(self.base_path + ".journal", self.base_path + ".journal.old")
+            self.journal = open(self.base_path + ".journal", 'a', encoding='utf-8')
+            self.journal_lines = 0
+        try:
+            tmp_path = self.base_path + ".snapshot.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for w2, followers in bigrams:
+                    f.writelines(f"{n} {w2} {word}\n" for word, n in followers.items())
+                for (w1, w2), followers in trigrams:
+                    f.writelines(f"{n} {w1} {w2} {word}\n" for word, n in followers.items())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.base_path + ".snapshot")
+            os.remove(self.base_path + ".journal.old")
+        except OSError as e:
+            print(f"Next-word compaction failed: {e}")
+        finally:
+            self.compacting = False
+
+    def close(self):
+        with self._lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
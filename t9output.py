@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+
+# =================================================================================
+# ASYNC OUTPUT QUEUE
+# =================================================================================
+# The GUI thread only enqueues. A writer thread does the (slow) OS injection,
+# merging runs of consecutive write() calls into one burst. send() actions
+# (ENTER, BACKSPACE, shortcuts) act as barriers, so the order is never changed.
+
+_STOP = object()
+
+
+class OutputQueue:
+    """Sink wrapper: same write()/send() interface, injection on a worker thread."""
+    def __init__(self, sink, name="T9Output", histogram=None):
+        self.sink = sink
+        self.histogram = histogram  # optional t9metrics.Histogram, one sample per burst
+        self.profiler = None        # t9profile.Profiler while profiling is on
+        self.recorder = None        # t9record.SessionRecorder while recording
+        self._queue = queue.SimpleQueue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+
+        # Stats (written by the worker only)
+        self.bursts = 0
+        self.items = 0
+        self.inject_total = 0.0
+        self.inject_max = 0.0
+        self.inject_last = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    # --- producer side (GUI thread) ---
+    def write(self, text):
+        self._put(('write', text))
+
+    def send(self, keys):
+        self._put(('send', keys))
+
+    def _put(self, item):
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+        self._queue.put(item)
+
+    def depth(self):
+        """Items queued but not injected yet."""
+        return self._pending
+
+    def stats(self):
+        avg = self.inject_total / self.bursts if self.bursts else 0.0
+        return {
+            "depth": self._pending,
+            "items": self.items,
+            "bursts": self.bursts,
+            "inject_avg_ms": avg * 1000.0,
+            "inject_max_ms": self.inject_max * 1000.0,
+            "inject_last_ms": self.inject_last * 1000.0,
+        }
+
+    def wait_idle(self, timeout=None):
+        """Blocks until everything queued so far has been injected."""
+        return self._idle.wait(timeout)
+
+    def close(self, timeout=1.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # --- worker side ---
+    def _drain(self, first):
+        batch = [first]
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain(self._queue.get())
+            stop = _STOP in batch
+            items = [item for item in batch if item is not _STOP]
+
+            # Coalesce adjacent writes, keep sends where they are
+            merged = []
+            for kind, payload in items:
+                if kind == 'write' and merged and merged[-1][0] == 'write':
+                    merged[-1] = ('write', merged[-1][1] + payload)
+                else:
+                    merged.append((kind, payload))
+
+            for kind, payload in merged:
+                t0 = time.perf_counter()
+                try:
+                    inject = self.sink.write if kind == 'write' else self.sink.send
+                    if self.profiler is not None:
+                        self.profiler.call(inject, payload)
+                    else:
+                        inject(payload)
+                except Exception as e:
+                    print(f"Output error: {e}")
+                dt = time.perf_counter() - t0
+                self.bursts += 1
+                self.inject_total += dt
+                self.inject_last = dt
+                if dt > self.inject_max:
+                    self.inject_max = dt
+                if self.histogram is not None:
+                    self.histogram.record(dt)
+                if self.recorder is not None:
+                    self.recorder.output(kind == 'send', payload, dt)
+
+            with self._lock:
+                self.items += len(items)
+                self._pending -= len(items)
+                if self._pending == 0:
+                    self._idle.set()
+            if stop:
+                return
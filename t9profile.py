@@ -0,0 +1,140 @@
+"""
+On-demand profiling of the live engine: cProfile for CPU, tracemalloc for
+allocations. Toggled from the tray menu, started at launch with
+`main.py --profile`, or switched remotely through the stats socket:
+    python t9profile.py start 47913
+    python t9profile.py stop 47913
+
+Nothing here is imported until profiling is first switched on; while it is
+off the engine's entry points only pay an `is not None` check.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+OWN_SOURCES = ('main.py', 't9')  # file name prefixes of the hook / commit path
+# From 3.12 cProfile runs on sys.monitoring: one profiler sees every thread,
+# and enabling a second one raises ValueError
+PROCESS_WIDE = sys.version_info >= (3, 12)
+
+
+class Profiler:
+    """
+    Before 3.12 cProfile only sees the thread it is enabled on, so each
+    profiled entry point (hook thread, Tk thread, deadline thread, output
+    thread) goes through call(), which keeps one cProfile.Profile per thread
+    and enables it only for the duration of the call. From 3.12 start()
+    enables a single process-wide profiler and call() is a plain call.
+    tracemalloc covers every thread by itself.
+    """
+    def __init__(self, out_dir, nframes=8):
+        self.out_dir = out_dir
+        self.nframes = nframes
+        self.active = False
+        self.started = 0.0
+        self._threads = {}  # thread ident -> [Profile, busy, thread name]
+        self._process = None  # the process-wide Profile (3.12+)
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._threads = {}
+        self.started = time.time()
+        if PROCESS_WIDE:
+            self._process = cProfile.Profile()
+            try:
+                self._process.enable()
+            except ValueError as e:  # a debugger or another profiler holds sys.monitoring
+                print(f"cProfile unavailable, allocations only: {e}")
+                self._process = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+        self.active = True
+
+    def call(self, func, *args):
+        if not self.active or PROCESS_WIDE:
+            return func(*args)
+        ident = threading.get_ident()
+        rec = self._threads.get(ident)
+        if rec is None:
+            with self._lock:
+                rec = self._threads[ident] = [cProfile.Profile(), False, threading.current_thread().name]
+        if rec[1]:
+            return func(*args)  # re-entered on the same thread, already profiled
+        rec[1] = True
+        try:
+            return rec[0].runcall(func, *args)
+        finally:
+            rec[1] = False
+
+    def stop(self):
+        """Stops profiling and writes the report. Returns the report path."""
+        self.active = False
+        if self._process is not None:
+            self._process.disable()
+        deadline = time.time() + 1.0
+        while any(rec[1] for rec in list(self._threads.values())) and time.time() < deadline:
+            time.sleep(0.005)  # let calls that are in flight finish
+
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        tracemalloc.stop()
+
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.out_dir, f"mouse_t9keypad_profile_{stamp}")
+        stats = pstats.Stats(self._process) if self._process is not None else None
+        for rec in self._threads.values():
+            if stats is None:
+                stats = pstats.Stats(rec[0])
+            else:
+                stats.add(rec[0])
+        if stats is not None:
+            stats.dump_stats(base + ".pstats")  # for snakeviz / pstats
+
+        with open(base + ".txt", 'w', encoding='utf-8') as f:
+            f.write(self.report(stats, snapshot))
+        return base + ".txt"
+
+    def report(self, stats, snapshot):
+        out = io.StringIO()
+        threads = 'all' if self._process is not None else ', '.join(rec[2] for rec in self._threads.values())
+        out.write(f"Profiled {time.time() - self.started:.1f} s, threads: {threads or 'none'}\n\n")
+        if stats is not None:
+            stats.stream = out
+            out.write("=== Hot functions (cumulative) ===\n")
+            stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            out.write("=== Hot functions (own time) ===\n")
+            stats.sort_stats('tottime').print_stats(TOP_FUNCTIONS)
+        else:
+            out.write("No profiled calls (no keys pressed?)\n\n")
+
+        if snapshot is not None:
+            out.write("=== Allocation sites ===\n")
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+            own = snapshot.filter_traces([
+                tracemalloc.Filter(True, f"*{os.sep}{prefix}*", all_frames=True) for prefix in OWN_SOURCES
+            ])
+            out.write("\n=== Allocation sites in the app (hook / commit path) ===\n")
+            for stat in own.statistics('traceback')[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+                for line in stat.traceback.format(limit=4):
+                    out.write(f"    {line}\n")
+        return out.getvalue()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ('start', 'stop'):
+        sys.exit("usage: python t9profile.py start|stop")
+    from t9metrics import read_control_file, send_command
+    try:
+        port, token = read_control_file()  # written by the running instance, see t9metrics
+    except (OSError, ValueError, KeyError) as e:
+        sys.exit(f"No running instance with a stats socket: {e}")
+    print(json.dumps(send_command(f"profile {sys.argv[1]}", port, token=token)))
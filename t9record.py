@@ -0,0 +1,279 @@
+"""
+Opt-in session recorder for reproducing field complaints ("characters came
+out late", "wrong letter"). The engine logs every keypad hook event,
+preview, commit and injected output as a fixed 32-byte record into an
+in-memory ring. A background thread copies new records into an append-only,
+memory-mapped file of bounded size. When a file fills up it is renamed to
+<name>.1 (replacing the older one) and a new file is started, so a session
+never uses more than twice "record_max_mb" on disk. Starting a session moves
+the previous one's files to <name>.prev and <name>.prev.1, so restarting the
+app after a problem does not wipe its log.
+
+Switched on with "record_session" in the config, `main.py --record`, or
+"record start|stop" on the stats socket. Read a log (streamed, never loaded
+whole) with:
+    python t9record.py mouse_t9keypad_session.t9rec
+    python t9record.py mouse_t9keypad_session.t9rec --follow    # live session
+    python t9record.py mouse_t9keypad_session.t9rec --summary
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from t9core import KEY_INDEX, KEY_NAMES
+
+MAGIC = b'T9REC\x00\x00\x01'
+HEADER = struct.Struct('<8sIIdQQ')  # magic, record size, capacity, wall clock start, count, dropped
+HEADER_SIZE = 64
+RECORD = struct.Struct('<dBBHI16s')  # t (s since start), kind, key, flags, value, text (UTF-8, cut)
+TEXT_BYTES = 16
+
+KIND_HOOK, KIND_PREVIEW, KIND_COMMIT, KIND_OUTPUT = 1, 2, 3, 4
+KIND_NAMES = {KIND_HOOK: 'hook', KIND_PREVIEW: 'preview', KIND_COMMIT: 'commit', KIND_OUTPUT: 'output'}
+NO_KEY = 255
+FLAG_DOWN = 0x10      # hook: key down (low bits: modifier mode)
+FLAG_SEND = 0x01      # output: send() instead of write()
+
+RING_RECORDS = 4096
+FLUSH_S = 0.5
+READ_CHUNK = 4096     # records per read() in the reader
+
+
+class SessionRecorder:
+    """
+    record() is called from the hook, GUI, deadline and output threads: one
+    struct.pack_into into the ring under a lock, no allocation besides the
+    text encode. Only the flush thread touches the file.
+    """
+    def __init__(self, path, max_bytes=16 << 20, ring_records=RING_RECORDS):
+        self.path = path
+        self.capacity = max(1, (max_bytes - HEADER_SIZE) // RECORD.size)  # records per file
+        self.ring_records = ring_records
+        self.ring = bytearray(ring_records * RECORD.size)
+        self.written = 0  # records put into the ring
+        self.flushed = 0  # records taken out of it
+        self.dropped = 0  # overwritten before the flush thread got to them
+        self.t0 = time.perf_counter()
+        self.wall0 = time.time()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.map = None
+        self.keep_previous()
+        self.open_file()
+        self._thread = threading.Thread(target=self._run, name="T9Recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, kind, key=NO_KEY, flags=0, value=None, text=''):
+        """value defaults to the text's length in bytes (the record keeps only TEXT_BYTES)."""
+        data = text.encode('utf-8') if text else b''
+        with self._lock:
+            RECORD.pack_into(self.ring, (self.written % self.ring_records) * RECORD.size,
+                             time.perf_counter() - self.t0, kind, key, flags,
+                             len(data) if value is None else value, data)
+            self.written += 1
+            backlog = self.written - self.flushed
+        if backlog == self.ring_records // 2:
+            self._wake.set()
+
+    def hook(self, key_name, down, mods, scan_code):
+        self.record(KIND_HOOK, KEY_INDEX.get(key_name, NO_KEY), (FLAG_DOWN if down else 0) | mods, scan_code)
+
+    def preview(self, key_name, text):
+        self.record(KIND_PREVIEW, KEY_INDEX.get(key_name, NO_KEY), text=text)
+
+    def commit(self, key_name, text):
+        self.record(KIND_COMMIT, KEY_INDEX.get(key_name, NO_KEY), text=text)
+
+    def output(self, send, text, seconds):
+        self.record(KIND_OUTPUT, NO_KEY, FLAG_SEND if send else 0, int(seconds * 1e6), text)
+
+    # --- flush thread ---
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(FLUSH_S)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Recorder error: {e}")
+
+    def flush(self):
+        with self._lock:
+            start, end = self.flushed, self.written
+            if end - start > self.ring_records:
+                self.dropped += end - start - self.ring_records
+                start = end - self.ring_records
+            first = (start % self.ring_records) * RECORD.size
+            last = (end % self.ring_records) * RECORD.size
+            if start == end:
+                data = b''
+            elif first < last:
+                data = bytes(self.ring[first:last])
+            else:
+                data = bytes(self.ring[first:]) + bytes(self.ring[:last])
+            self.flushed = end
+        if data:
+            self.append(data)
+
+    def keep_previous(self):
+        for suffix in ('', '.1'):
+            old, kept = self.path + suffix, self.path + ".prev" + suffix
+            try:
+                if os.path.exists(old):
+                    os.replace(old, kept)
+                elif os.path.exists(kept):
+                    os.remove(kept)  # from an older session than the one just moved
+            except OSError as e:
+                print(f"Recorder could not keep the previous log ({e}), overwriting {old}")
+
+    def open_file(self):
+        size = HEADER_SIZE + self.capacity * RECORD.size
+        with open(self.path, 'w+b') as f:
+            f.truncate(size)  # sparse where supported; pages are only touched as records land
+            self.map = mmap.mmap(f.fileno(), size)
+        self.count = 0
+        self.write_header()
+
+    def rotate(self):
+        try:
+            self.map.close()
+            os.replace(self.path, self.path + ".1")
+            self.open_file()
+        except OSError as e:
+            # Windows will not rename a file a reader has open: start over in place
+            print(f"Recorder could not rotate ({e}), overwriting {self.path}")
+            if self.map.closed:
+                with open(self.path, 'r+b') as f:
+                    self.map = mmap.mmap(f.fileno(), 0)
+            self.count = 0
+
+    def append(self, data):
+        size = RECORD.size
+        offset = 0
+        while offset < len(data):
+            if self.count == self.capacity:
+                self.rotate()
+            take = min(self.capacity - self.count, (len(data) - offset) // size) * size
+            pos = HEADER_SIZE + self.count * size
+            self.map[pos:pos + take] = data[offset:offset + take]
+            self.count += take // size
+            offset += take
+            # The count goes in last, so a reader never sees a half-copied record
+            self.write_header()
+
+    def write_header(self):
+        HEADER.pack_into(self.map, 0, MAGIC, RECORD.size, self.capacity, self.wall0, self.count, self.dropped)
+
+    def stats(self):
+        return {"recorded": self.written, "dropped": self.dropped, "path": self.path}
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join(1.0)
+        self.flush()
+        self.write_header()
+        self.map.flush()
+        self.map.close()
+
+# =================================================================================
+# READER
+# =================================================================================
+
+def read_header(f):
+    f.seek(0)
+    magic, record_size, capacity, wall0, count, dropped = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError("not a session log")
+    return {"capacity": capacity, "wall0": wall0, "count": count, "dropped": dropped}
+
+
+def iter_records(path, follow=False, poll_s=0.2):
+    """Yields (t, kind, key, flags, value, text) a chunk at a time."""
+    f = open(path, 'rb', buffering=0)  # unbuffered: the header is re-read while following
+    try:
+        done = 0
+        while True:
+            header = read_header(f)
+            if header["count"] < done:
+                done = 0  # the recorder started over in place
+            while done < header["count"]:
+                n = min(header["count"] - done, READ_CHUNK)
+                f.seek(HEADER_SIZE + done * RECORD.size)
+                for t, kind, key, flags, value, text in RECORD.iter_unpack(f.read(n * RECORD.size)):
+                    yield t, kind, key, flags, value, text.rstrip(b'\x00').decode('utf-8', 'replace')
+                done += n
+            if not follow:
+                return
+            if done == header["capacity"] and not os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                # The recorder rotated: continue with the new file
+                f.close()
+                f = open(path, 'rb', buffering=0)
+                done = 0
+                continue
+            time.sleep(poll_s)
+    finally:
+        f.close()
+
+
+def format_record(record):
+    t, kind, key, flags, value, text = record
+    key_name = KEY_NAMES[key] if key < len(KEY_NAMES) else '-'
+    if kind == KIND_HOOK:
+        detail = f"{'down' if flags & FLAG_DOWN else 'up':<4} scan={value} mods={flags & 0x0F}"
+    elif kind == KIND_OUTPUT:
+        detail = f"{'send' if flags & FLAG_SEND else 'write'} {text!r} inject={value} us"
+    else:
+        detail = f"{text!r}"
+        if value > TEXT_BYTES:
+            detail += f" (cut, {value} bytes)"
+    return f"{t:12.6f} {KIND_NAMES.get(kind, kind):<8} {key_name:<4} {detail}"
+
+
+def summarize(path):
+    counts = {}
+    first = last = None
+    inject_max = 0
+    for record in iter_records(path):
+        t, kind = record[0], record[1]
+        counts[kind] = counts.get(kind, 0) + 1
+        first = t if first is None else first
+        last = t
+        if kind == KIND_OUTPUT:
+            inject_max = max(inject_max, record[4])
+    with open(path, 'rb') as f:
+        header = read_header(f)
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(header["wall0"]))
+    span = (last - first) if first is not None else 0.0
+    lines = [f"session started {started}, {span:.1f} s recorded, {header['dropped']} records dropped"]
+    lines.append("  ".join(f"{KIND_NAMES.get(k, k)}={n}" for k, n in sorted(counts.items())))
+    lines.append(f"slowest injection {inject_max} us")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Print a session log written by the recorder.")
+    parser.add_argument("log", nargs="?", help="session log (.t9rec)")
+    parser.add_argument("--follow", action="store_true", help="keep printing records as they are written")
+    parser.add_argument("--summary", action="store_true", help="counts per record kind instead of records")
+    args = parser.parse_args(argv)
+    if not args.log:
+        parser.error("give a session log")
+    if args.summary:
+        print(summarize(args.log))
+        return 0
+    try:
+        for record in iter_records(args.log, args.follow):
+            print(format_record(record))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Abbreviation expansion on the committed text. The abbreviations from the
+config's "snippets" table ({"@me": "jan.kowalski@example.com"}) are compiled
+into one Aho-Corasick automaton, so every committed character costs one
+transition however many snippets there are. When an abbreviation has just
+been typed, the expander returns the replacement instead of the text: a
+backspace per already-typed character, then the expansion, which the sink
+types as one batch.
+
+The automaton is built once per snippet table (T9Engine.set_snippets);
+matching is case-sensitive and fires as soon as the last character lands,
+so abbreviations are best given a prefix that does not occur in words.
+"""
+from collections import deque
+
+
+class SnippetAutomaton:
+    """Aho-Corasick automaton: trie, failure links and the longest match per state."""
+    def __init__(self, snippets):
+        self.snippets = dict(snippets)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [None]  # (abbreviation length, expansion) of the longest match ending here
+        self.depth = 0
+        for abbr, expansion in self.snippets.items():
+            if not abbr:
+                continue
+            state = 0
+            for ch in abbr:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(None)
+                    self.goto[state][ch] = nxt
+                state = nxt
+            self.out[state] = (len(abbr), expansion)
+            self.depth = max(self.depth, len(abbr))
+
+        # Breadth first, so a state's failure target is always finished before it
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                if state:
+                    f = self.fail[state]
+                    while f and ch not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[nxt] = self.goto[f].get(ch, 0)
+                if self.out[nxt] is None:
+                    self.out[nxt] = self.out[self.fail[nxt]]
+
+        # Transitions resolved through the failure links are cached, so a
+        # character seen before from a state is one dict hit
+        self.delta = [dict(edges) for edges in self.goto]
+
+    def step(self, state, ch):
+        nxt = self.delta[state].get(ch)
+        if nxt is None:
+            f = state
+            while f and ch not in self.goto[f]:
+                f = self.fail[f]
+            nxt = self.delta[state][ch] = self.goto[f].get(ch, 0)
+        return nxt
+
+
+class SnippetExpander:
+    """
+    Sits in front of the sink in MultiTapCore: feed() gets every written
+    text and returns what to type instead, key() every sent key. Holds only
+    the match state, so several keypads can share one automaton.
+    """
+    def __init__(self, automaton):
+        self.automaton = automaton
+        self.state = 0
+        # States before the last characters, so Backspace can step back
+        self.history = deque(maxlen=max(1, self.automaton.depth))
+        self.expansions = 0
+
+    def feed(self, text):
+        automaton = self.automaton
+        out = None  # only built once something expands
+        start = 0   # text[start:] is not in out yet
+        for i, ch in enumerate(text):
+            self.history.append(self.state)
+            self.state = automaton.step(self.state, ch)
+            match = automaton.out[self.state]
+            if match is None:
+                continue
+            length, expansion = match
+            if out is None:
+                out = []
+            keep = i + 1 - start - length
+            if keep >= 0:
+                out.append(text[start:start + keep])
+            else:
+                out.append('\b' * -keep)  # the start of it was typed by earlier commits
+            out.append(expansion)
+            start = i + 1
+            # The expansion itself is never matched against
+            self.state = 0
+            self.history.clear()
+            self.expansions += 1
+        if out is None:
+            return text
+        out.append(text[start:])
+        return ''.join(out)
+
+    def key(self, keys):
+        if keys == 'backspace':
+            self.state = self.history.pop() if self.history else 0
+        else:
+            self.reset()  # Enter, Ctrl shortcuts: the cursor may be anywhere now
+
+    def reset(self):
+        self.state = 0
+        self.history.clear()
@@ -0,0 +1,252 @@
+"""
+Windows output path with prepared injection batches.
+
+keyboard.write() resolves every character again on every call and types it
+with its own SendInput calls. SendInputSink resolves each mapping entry once,
+when the mapping is loaded, into a ready INPUT array for the foreground
+keyboard layout, so a commit is a dict hit and a single SendInput call:
+    - Enter / Tab / Backspace and characters the layout has on an unmodified
+      key that Caps Lock does not change (digits, space, most punctuation)
+      go out as real key presses,
+    - letters and everything else (shifted, AltGr and dead-key characters,
+      characters the layout does not have) go out as one batch of Unicode
+      packets, so the result never depends on Caps Lock,
+    - a Shift or Ctrl the user is holding is released in front of the batch
+      and pressed again after it (same SendInput call), so it cannot turn
+      "1" into "!" or Enter into Ctrl+Enter,
+    - send() payloads ("enter", "ctrl+c") still go through the keyboard
+      module, parsed once, with held Shift/Ctrl released around them by
+      SendInput calls of their own; a payload the parser cannot express is
+      reported when the mapping is loaded and skipped when sent.
+Other layouts (Polish, German...) are prepared on their first write.
+"""
+import ctypes
+from ctypes import wintypes
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+MAPVK_VK_TO_VSC = 0
+CONTROL_KEYS = {'\n': 0x0D, '\r': 0x0D, '\t': 0x09, '\b': 0x08}  # VK_RETURN, VK_TAB, VK_BACK
+HELD_MODIFIERS = (0xA0, 0xA1, 0xA2, 0xA3)  # VK_LSHIFT, VK_RSHIFT, VK_LCONTROL, VK_RCONTROL
+EXTENDED_KEYS = frozenset((0xA3,))  # right Ctrl
+MAX_CACHED = 4096  # batches kept per layout for texts outside the mapping (words, bursts)
+
+# =================================================================================
+# SENDINPUT STRUCTURES
+# =================================================================================
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = (("wVk", wintypes.WORD), ("wScan", wintypes.WORD), ("dwFlags", wintypes.DWORD),
+                ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t))
+
+
+class MOUSEINPUT(ctypes.Structure):
+    # Only here so the union (and INPUT) has the size SendInput expects
+    _fields_ = (("dx", wintypes.LONG), ("dy", wintypes.LONG), ("mouseData", wintypes.DWORD),
+                ("dwFlags", wintypes.DWORD), ("time", wintypes.DWORD), ("dwExtraInfo", ctypes.c_size_t))
+
+
+class _INPUT_UNION(ctypes.Union):
+    _fields_ = (("ki", KEYBDINPUT), ("mi", MOUSEINPUT))
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = (("type", wintypes.DWORD), ("u", _INPUT_UNION))
+
+
+def make_input(vk, scan, flags):
+    return INPUT(INPUT_KEYBOARD, _INPUT_UNION(ki=KEYBDINPUT(vk, scan, flags, 0, 0)))
+
+# =================================================================================
+# PER-LAYOUT PLANS
+# =================================================================================
+
+def plan_char(ch, layout):
+    """Key events (vk, scan, flags) that type one character on this layout."""
+    vk = CONTROL_KEYS.get(ch)
+    if vk is not None:
+        key = (vk, layout.scan(vk))
+    else:
+        key = None if ch.isalpha() else layout.vk_scan(ch)
+    if key is not None:
+        return ((key[0], key[1], 0), (key[0], key[1], KEYEVENTF_KEYUP))
+
+    events = []
+    data = ch.encode('utf-16-le')  # characters outside the BMP become two packets
+    for i in range(0, len(data), 2):
+        unit = data[i] | data[i + 1] << 8
+        events.append((0, unit, KEYEVENTF_UNICODE))
+        events.append((0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+    return tuple(events)
+
+
+def modifier_events(held, layout, flags):
+    """INPUTs that release (flags=KEYEVENTF_KEYUP) or press the held modifier keys."""
+    return [make_input(vk, layout.scan(vk), flags | (KEYEVENTF_EXTENDEDKEY if vk in EXTENDED_KEYS else 0))
+            for vk in held]
+
+
+def bracket(batch, held, layout):
+    """The batch with the held modifier keys released before it and pressed again after."""
+    events = modifier_events(held, layout, KEYEVENTF_KEYUP)
+    events += batch
+    events += modifier_events(held, layout, 0)
+    return input_array(events)
+
+
+def input_array(events):
+    return (INPUT * len(events))(*events)
+
+
+def mapping_payloads(*tables):
+    """(write payloads, send payloads) of every entry in the given CompiledMappings."""
+    texts, sends = set(), set()
+    entries = [entry for table in tables for button in table.buttons for entry in button or ()]
+    entries += [entry for table in tables for entry in table.chords.values()]
+    for entry in entries:
+        for display, kind, payload, status in entry:
+            if kind == 'write':
+                texts.add(payload)
+            elif kind == 'send':
+                sends.add(payload)
+    return texts, sends
+
+
+def parse_hotkeys(keyboard_module, sends):
+    """send payload -> parsed hotkey, or None for one the keyboard module cannot parse."""
+    hotkeys = {}
+    for keys in sends:
+        try:
+            hotkeys[keys] = keyboard_module.parse_hotkey(keys)
+        except ValueError as e:
+            print(f"Cannot send {keys!r}, skipped: {e}")
+            hotkeys[keys] = None
+    return hotkeys
+
+
+class Layout:
+    """
+    One keyboard layout (HKL) with its resolved characters and ready INPUT
+    arrays. Read by the output thread; prepare() fills it before it is
+    published, later misses only add entries.
+    """
+    def __init__(self, hkl, user32=None):
+        self.hkl = hkl
+        self.user32 = user32
+        self.chars = {}    # char -> key events
+        self.batches = {}  # text -> INPUT array
+
+    def vk_scan(self, ch):
+        """(vk, scan) when ch is on a key of its own (no Shift / AltGr), else None."""
+        if ord(ch) > 0xFFFF:
+            return None
+        res = self.user32.VkKeyScanExW(ch, self.hkl)
+        if res == -1 or res & 0xFF00:
+            return None
+        return res & 0xFF, self.scan(res & 0xFF)
+
+    def scan(self, vk):
+        return self.user32.MapVirtualKeyExW(vk, MAPVK_VK_TO_VSC, self.hkl)
+
+    def events(self, ch):
+        events = self.chars.get(ch)
+        if events is None:
+            events = self.chars[ch] = plan_char(ch, self)
+        return events
+
+    def batch(self, text):
+        batch = self.batches.get(text)
+        if batch is None:
+            events = [e for ch in text for e in self.events(ch)]
+            batch = (INPUT * len(events))(*(make_input(*e) for e in events))
+            if len(self.batches) < MAX_CACHED:
+                self.batches[text] = batch
+        return batch
+
+    def prepare(self, texts):
+        for text in texts:
+            self.batch(text)
+        return self
+
+# =================================================================================
+# SINK
+# =================================================================================
+
+class SendInputSink:
+    """
+    write()/send() sink for OutputQueue. prepare() takes the new
+    CompiledMappings (on the GUI thread) and swaps in freshly built layouts;
+    the output thread only looks them up.
+    """
+    def __init__(self, keyboard_module):
+        self.keyboard = keyboard_module
+        user32 = self.user32 = ctypes.WinDLL("User32.dll", use_last_error=True)
+        user32.SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+        user32.SendInput.restype = wintypes.UINT
+        user32.VkKeyScanExW.argtypes = (wintypes.WCHAR, wintypes.HKL)
+        user32.VkKeyScanExW.restype = ctypes.c_short
+        user32.MapVirtualKeyExW.argtypes = (wintypes.UINT, wintypes.UINT, wintypes.HKL)
+        user32.GetKeyboardLayout.restype = wintypes.HKL
+        user32.GetAsyncKeyState.argtypes = (ctypes.c_int,)
+        user32.GetAsyncKeyState.restype = ctypes.c_short
+        user32.GetForegroundWindow.restype = wintypes.HWND
+        user32.GetWindowThreadProcessId.argtypes = (wintypes.HWND, ctypes.c_void_p)
+
+        self.texts = frozenset()  # write payloads of the current mapping
+        self.hotkeys = {}         # send payload -> parsed hotkey
+        self.layouts = {}         # HKL -> Layout
+        self.layout_misses = 0
+
+    def prepare(self, *tables):
+        """Builds batches for every given CompiledMapping (all named layouts)."""
+        texts, sends = mapping_payloads(*tables)
+        self.hotkeys = parse_hotkeys(self.keyboard, sends)
+        self.texts = frozenset(texts)
+        hkl = self.foreground_layout()
+        self.layouts = {hkl: Layout(hkl, self.user32).prepare(self.texts)}
+
+    def foreground_layout(self):
+        user32 = self.user32
+        return user32.GetKeyboardLayout(user32.GetWindowThreadProcessId(user32.GetForegroundWindow(), None))
+
+    def layout(self):
+        hkl = self.foreground_layout()
+        layout = self.layouts.get(hkl)
+        if layout is None:
+            # The user switched layouts since the mapping was loaded
+            self.layout_misses += 1
+            layout = self.layouts[hkl] = Layout(hkl, self.user32).prepare(self.texts)
+        return layout
+
+    def held_modifiers(self):
+        return [vk for vk in HELD_MODIFIERS if self.user32.GetAsyncKeyState(vk) & 0x8000]
+
+    def inject(self, batch):
+        if batch and self.user32.SendInput(len(batch), batch, ctypes.sizeof(INPUT)) != len(batch):
+            raise ctypes.WinError(ctypes.get_last_error())  # e.g. blocked by an elevated window
+
+    def write(self, text):
+        layout = self.layout()
+        batch = layout.batch(text)
+        held = self.held_modifiers()
+        if held and batch:
+            batch = bracket(batch, held, layout)
+        self.inject(batch)
+
+    def send(self, keys):
+        hotkey = self.hotkeys.get(keys, keys)
+        if hotkey is None:
+            return
+        held = self.held_modifiers()
+        if not held:
+            self.keyboard.send(hotkey)
+            return
+        # keyboard.send() makes its own SendInput calls, so the bracket cannot share one
+        layout = self.layout()
+        self.inject(input_array(modifier_events(held, layout, KEYEVENTF_KEYUP)))
+        try:
+            self.keyboard.send(hotkey)
+        finally:
+            self.inject(input_array(modifier_events(held, layout, 0)))
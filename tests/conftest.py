@@ -0,0 +1,31 @@
+import os
+import shutil
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# main.py imports the Windows registry module for the autostart entry only
+if 'winreg' not in sys.modules:
+    try:
+        import winreg  # noqa: F401
+    except ImportError:
+        sys.modules['winreg'] = types.ModuleType('winreg')
+
+
+@pytest.fixture
+def words_path(tmp_path):
+    """A copy of the shipped word list, so the compiled index lands in the test's tmp dir."""
+    path = tmp_path / "t9_words.txt"
+    shutil.copy(os.path.join(ROOT, "t9_words.txt"), path)
+    return str(path)
+
+
+@pytest.fixture
+def user_dir(tmp_path, monkeypatch):
+    """Per-user directory of the control file, kept inside the test's tmp dir."""
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,256 @@
+import threading
+import time
+
+import pytest
+
+import replay
+from t9core import (
+    DEFAULT_MAPPING, MOD_CAPITAL, MOD_CTRL, MOD_PLAIN, AdaptiveTimeout, CompiledMapping, DeadlineScheduler,
+    KeyDispatcher, ModifierState, MultiTapCore, NullView, RecordingSink, StaticModifiers, VirtualClock,
+    compile_entry,
+)
+from t9dict import layout_index_path, letter_codes, load_dictionary
+
+
+def make_core(mapping=DEFAULT_MAPPING, modifiers=None):
+    sink = RecordingSink()
+    clock = VirtualClock()
+    core = MultiTapCore(mapping, sink, clock, modifiers or StaticModifiers())
+    return core, sink, clock
+
+
+def test_cycle_commits_after_the_delay():
+    core, sink, clock = make_core()
+    core.press('f14')
+    core.press('f14')
+    assert sink.text() == ""
+    clock.advance_to(1.0)
+    assert sink.text() == "b"
+
+
+def test_switching_keys_cancels_the_old_timer():
+    core, sink, clock = make_core()
+    core.press('f14')
+    clock.advance_to(0.5)
+    core.press('f15')      # commits 'a'; the timer armed by the first press must not fire at 0.8
+    clock.advance_to(1.0)
+    assert sink.text() == "a"
+    clock.advance_to(1.4)
+    assert sink.text() == "ad"
+
+
+def test_enter_and_backspace_are_sent():
+    core, sink, clock = make_core()
+    for key in ('f14', 'f22', 'f24'):
+        core.press(key)
+    core.flush()
+    assert sink.events == [('write', 'a'), ('send', 'enter'), ('send', 'backspace')]
+
+
+@pytest.mark.parametrize("modifiers, typed", [
+    (StaticModifiers(shift=True), "A"),
+    (StaticModifiers(caps=True), "A"),
+    (StaticModifiers(shift=True, caps=True), "a"),
+])
+def test_capitalization(modifiers, typed):
+    core, sink, clock = make_core(modifiers=modifiers)
+    core.press('f14')
+    core.flush()
+    assert sink.text() == typed
+
+
+def test_modifier_state_from_events():
+    modifiers = ModifierState()
+    modifiers.on_key('left shift', True)
+    assert modifiers.snapshot() == MOD_CAPITAL
+    modifiers.on_key('caps lock', True)
+    modifiers.on_key('caps lock', True)  # auto-repeat does not toggle again
+    modifiers.on_key('caps lock', False)
+    modifiers.on_key('left shift', False)
+    assert modifiers.snapshot() == MOD_CAPITAL
+    modifiers.on_key('a', True)  # untracked keys are ignored
+    modifiers.on_key('right ctrl', True)
+    assert modifiers.snapshot() == MOD_CTRL
+
+
+def test_commit_matches_the_preview():
+    modifiers = ModifierState()
+    core, sink, clock = make_core(modifiers=modifiers)
+    modifiers.on_key('shift', True)
+    core.press('f14')
+    modifiers.on_key('shift', False)  # released before the timeout
+    clock.advance_to(1.0)
+    assert sink.text() == "A"
+
+
+def test_ctrl_shortcut_is_an_explicit_combo():
+    core, sink, clock = make_core(modifiers=StaticModifiers(ctrl=True))
+    core.press('f14')
+    core.flush()
+    assert sink.events == [('send', 'ctrl+a')]
+
+
+@pytest.mark.parametrize("name, events, predictive, expected", replay.edge_cases(),
+                         ids=[case[0] for case in replay.edge_cases()])
+def test_edge_case(name, events, predictive, expected, words_path):
+    dictionary = load_dictionary(words_path, DEFAULT_MAPPING) if predictive else None
+    assert replay.run_edge_case(events, predictive, dictionary) == expected
+
+
+def test_shift_snapshot_belongs_to_the_cycle():
+    modifiers = ModifierState()
+    core, sink, clock = make_core(modifiers=modifiers)
+    modifiers.on_key('shift', True)
+    core.press('f14')
+    modifiers.on_key('shift', False)
+    core.press('f15')  # commits the previous cycle as it was previewed
+    assert sink.events == [('write', 'A')]
+    core.flush()
+    assert sink.text() == "Ad"
+
+
+@pytest.mark.parametrize("char, keys", [(',', 'comma'), (' ', 'space'), ('+', 'plus'), ('a', 'a')])
+def test_ctrl_variants_use_hotkey_names(char, keys):
+    plain, capital, ctrl, ctrl_shift = compile_entry(char)
+    assert ctrl[2] == f"ctrl+{keys}"
+    assert ctrl_shift[2] == f"ctrl+shift+{keys}"
+    assert plain[2] == char
+
+
+def test_entries_are_compiled_for_every_mode():
+    assert compile_entry('a') == (
+        ('a', 'write', 'a', "Typed: a"),
+        ('A', 'write', 'A', "Typed: A"),
+        ('Ctrl+A', 'send', 'ctrl+a', "Shortcut: Ctrl+A"),
+        ('Ctrl+Shift+A', 'send', 'ctrl+shift+a', "Shortcut: Ctrl+Shift+A"),
+    )
+    assert set(compile_entry('ENTER')) == {("ENTER", 'send', 'enter', None)}
+    table = CompiledMapping(DEFAULT_MAPPING)
+    assert table.letters[1] == 'a' and table.is_backspace[11] and table.buttons[9][0][0][2] == 'enter'
+
+
+def test_cycle_keeps_its_entries_across_a_mapping_edit():
+    core, sink, clock = make_core()
+    core.press('f14')
+    core.update_mapping(dict(DEFAULT_MAPPING, f14=['x']))
+    core.press('f14')
+    core.flush()
+    assert sink.text() == "b"
+
+
+def test_dispatcher_routes_by_scan_code():
+    clock = VirtualClock()
+    modifiers = ModifierState()
+    presses, releases = [], []
+    dispatcher = KeyDispatcher({100: 'f13'}, modifiers, lambda k, t: presses.append(k),
+                               lambda k, t, held: releases.append((k, held)), clock)
+    assert dispatcher.dispatch(100, 'unknown', True)
+    assert dispatcher.dispatch(100, 'unknown', True)  # auto-repeat is swallowed
+    clock.advance_to(0.25)
+    assert dispatcher.dispatch(100, 'unknown', False)
+    assert dispatcher.dispatch(7, 'f14', True)  # unknown scan code, matched by name
+    assert not dispatcher.dispatch(42, 'shift', True)
+    assert presses == ['f13', 'f14'] and releases == [('f13', 0.25)]
+    assert modifiers.snapshot() == MOD_CAPITAL
+    assert not dispatcher.dispatch(42, 'shift', False) and modifiers.snapshot() == MOD_PLAIN
+    assert dispatcher.events == 6 and dispatcher.suppressed == 4
+
+
+def test_scheduler_moves_one_deadline():
+    scheduler = DeadlineScheduler()
+    fired = []
+    try:
+        t0 = time.perf_counter()
+        scheduler.call_later(20, lambda: fired.append('first'))
+        scheduler.call_later(40, lambda: fired.append(time.perf_counter() - t0))  # replaces the first
+        time.sleep(0.15)
+        assert len(fired) == 1 and fired[0] >= 0.04
+        handle = scheduler.call_later(20, lambda: fired.append('cancelled'))
+        scheduler.cancel(handle)
+        time.sleep(0.05)
+        assert len(fired) == 1 and scheduler.stats()["fired"] == 1
+    finally:
+        scheduler.close()
+
+
+def test_core_commits_from_the_scheduler_thread():
+    scheduler = DeadlineScheduler()
+    sink = RecordingSink()
+    committed = threading.Event()
+    sink.write = lambda text: (RecordingSink.write(sink, text), committed.set())
+    core = MultiTapCore(DEFAULT_MAPPING, sink, scheduler, StaticModifiers(), delay_ms=30)
+    try:
+        with scheduler.lock:
+            core.press('f14')
+            core.press('f14')
+        assert committed.wait(1.0)
+        assert sink.text() == "b"
+    finally:
+        scheduler.close()
+
+
+def test_preview_carries_the_whole_cycle():
+    class PreviewView(NullView):
+        def __init__(self):
+            self.previews = []
+
+        def preview(self, text, candidates=(), index=0):
+            self.previews.append((text, candidates, index))
+
+    view = PreviewView()
+    core = MultiTapCore(DEFAULT_MAPPING, RecordingSink(), VirtualClock(), StaticModifiers(shift=True), view=view)
+    core.press('f14')
+    core.press('f14')
+    strip = ('A', 'B', 'C', '2')
+    assert view.previews == [('A', strip, 0), ('B', strip, 1)]
+
+
+def test_adaptive_timeout_learns_the_cadence():
+    model = AdaptiveTimeout()
+    for _ in range(AdaptiveTimeout.MIN_SAMPLES - 1):
+        model.observe(1, 0.2)
+    assert model.timeout_ms(1, 800) == 800  # too few samples yet
+    model.observe(1, 0.2)
+    assert model.timeout_ms(1, 800) < 800 and model.timeout_ms(1, 300) == 300
+    restored = AdaptiveTimeout.from_config(model.to_config())
+    assert restored.timeout_ms(1, 800) == model.timeout_ms(1, 800)
+    assert AdaptiveTimeout.from_config({"f99": [1, 2, 3], "f13": "bad"}).count == [0] * 12
+
+
+def test_adaptive_replay_keeps_the_text():
+    events = replay.text_to_stream(replay.BENCH_TEXT[:200], DEFAULT_MAPPING, 4, replay.DEFAULT_DELAY_MS)
+    assert replay.replay(events, DEFAULT_MAPPING, adaptive=True)["text"] == replay.BENCH_TEXT[:200]
+
+
+def test_chord_cases():
+    result = replay.chord_suite()
+    assert result["failures"] == [] and result["cases"] == 13
+
+
+@pytest.mark.parametrize("rate", replay.BENCH_RATES)
+def test_bench_text_survives_every_rate(rate):
+    events = replay.text_to_stream(replay.BENCH_TEXT[:200], DEFAULT_MAPPING, rate, replay.DEFAULT_DELAY_MS)
+    result = replay.replay(events, DEFAULT_MAPPING)
+    assert result["text"] == replay.BENCH_TEXT[:200]
+    assert result["dropped"] == 0 and result["out_of_order"] == 0
+
+
+def test_layout_switch_selects_its_dictionary(tmp_path, words_path):
+    swapped = dict(DEFAULT_MAPPING, f14=DEFAULT_MAPPING['f15'], f15=DEFAULT_MAPPING['f14'])
+    plain = load_dictionary(words_path, DEFAULT_MAPPING)
+    other = load_dictionary(words_path, swapped, layout_index_path(words_path, letter_codes(swapped)))
+
+    core, sink, clock = make_core()
+    core.set_layouts({"Plain": DEFAULT_MAPPING, "Swapped": swapped}, "Plain")
+    core.set_dictionary(plain, layout_dictionaries={"Plain": plain, "Swapped": other})
+    core.press('f14')        # a word on the old letters ...
+    assert core.switch_layout("Swapped")
+    assert sink.text() == "a"  # ... goes out before the switch
+    assert core.dictionary is other
+    core.press('f15')
+    core.flush()
+    assert sink.text() == "aa"
+    assert sorted(p.name for p in tmp_path.glob("*.t9idx")) == sorted(
+        ["t9_words.t9idx", layout_index_path("t9_words.txt", letter_codes(swapped))])
+    plain.close()
+    other.close()
@@ -0,0 +1,512 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import main
+from main import ConfigManager, ConfigWatcher, DaemonHost, RemoteEngine, T9Engine, UiRefresh
+from t9core import DEFAULT_MAPPING
+from t9metrics import control_file_path, read_control_file, send_command
+
+SWAPPED = dict(DEFAULT_MAPPING, f14=DEFAULT_MAPPING['f15'], f15=DEFAULT_MAPPING['f14'])
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    """Config file and its backup in the test's tmp dir, with ConfigManager's state reset."""
+    path = str(tmp_path / main.CONFIG_FILENAME)
+    monkeypatch.setattr(main, "CONFIG_FILE_PATH", path)
+    monkeypatch.setattr(ConfigManager, "BACKUP_PATH", path + ".bak")
+    monkeypatch.setattr(ConfigManager, "DEBOUNCE_S", 0.05)
+    monkeypatch.setattr(ConfigManager, "_pending", None)
+    monkeypatch.setattr(ConfigManager, "_timer", None)
+    monkeypatch.setattr(ConfigManager, "_last_written", None)
+    monkeypatch.setattr(ConfigWatcher, "POLL_S", 60)  # the tests call check() themselves
+    yield path
+    ConfigManager.flush()
+
+
+def write_config(path, **values):
+    data = json.loads(json.dumps(main.DEFAULT_CONFIG))
+    data.update(values)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    return data
+
+
+def read_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class FakeRoot:
+    """
+    Tk root stand-in: after() jobs and generated events run when the test says
+    so. after() and bind() only from the thread that made it; event_generate()
+    records which thread sent it.
+    """
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.jobs = []
+        self.bindings = {}
+        self.events = []  # (sequence, sending thread's name)
+        self.delivered = 0
+        self.generated = threading.Event()
+
+    def after(self, ms, func, *args):
+        assert threading.current_thread() is self.thread, "Tk called from another thread"
+        self.jobs.append((func, args))
+        return len(self.jobs)
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def bind(self, sequence, func):
+        assert threading.current_thread() is self.thread, "Tk called from another thread"
+        self.bindings[sequence] = func
+
+    def event_generate(self, sequence, when=None):
+        self.events.append((sequence, threading.current_thread().name))
+        self.generated.set()
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for func, args in jobs:
+            func(*args)
+        events, self.delivered = self.events[self.delivered:], len(self.events)
+        for sequence, _ in events:
+            self.bindings[sequence](None)
+
+    def run_until(self, done, timeout=2.0):
+        """Runs jobs and events until done(): a wake sent from another thread may still be on its way."""
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            self.run()
+            time.sleep(0.005)
+        return done()
+
+
+class RecordingOverlay:
+    def __init__(self, master=None):
+        self.calls = []
+
+    def prepare(self, *tables):
+        pass
+
+    def show(self, text, candidates=(), index=0):
+        self.calls.append(('show', text))
+
+    def hide(self):
+        self.calls.append(('hide',))
+
+
+class FakeApp:
+    """What T9Engine needs from SettingsApp / DaemonHost."""
+    def __init__(self, root, config_data):
+        self.config_data = config_data
+        self.ui = UiRefresh(root)
+        self.statuses = []
+        self.layouts = []
+
+    def update_status(self, text):
+        self.statuses.append(text)
+
+    def layout_switched(self, name):
+        self.layouts.append(name)
+
+
+@pytest.fixture
+def hooks(monkeypatch):
+    """keyboard's hook and output, recorded instead of reaching the OS."""
+    installed = []
+    written = []
+    monkeypatch.setattr(main.keyboard, "hook", lambda callback, suppress=False: installed.append(callback))
+    monkeypatch.setattr(main.keyboard, "unhook_all", lambda: None)
+    monkeypatch.setattr(main.keyboard, "key_to_scan_codes", lambda name: (100 + main.KEY_NAMES.index(name),))
+    monkeypatch.setattr(main.keyboard, "write", written.append)
+    monkeypatch.setattr(main.keyboard, "send", lambda keys: written.append(f"<{keys}>"))
+    return installed, written
+
+
+@pytest.fixture
+def engine(hooks, monkeypatch):
+    monkeypatch.setattr(main, "OverlayWindow", RecordingOverlay)
+    root = FakeRoot()
+    config = json.loads(json.dumps(main.DEFAULT_CONFIG))
+    config.update(output="keyboard", layouts={"Plain": DEFAULT_MAPPING, "Swapped": SWAPPED},
+                  active_layout="Plain")
+    engine = T9Engine(root, FakeApp(root, config))
+    engine.setup_thread.join(5.0)
+    yield engine
+    engine.shutdown()
+
+
+def test_import_leaves_pillow_and_pystray_alone():
+    assert "PIL" not in sys.modules and "pystray" not in sys.modules
+
+
+def test_icon_ships_prebuilt():
+    assert os.path.dirname(main.get_icon_path()) == os.path.dirname(os.path.abspath(main.__file__))
+
+
+# --- ConfigManager ---
+
+def test_missing_config_is_created_from_defaults(config_path):
+    data = ConfigManager.load()
+    assert data == main.DEFAULT_CONFIG and data["mapping"] is not DEFAULT_MAPPING
+    ConfigManager.flush()
+    assert read_config(config_path) == main.DEFAULT_CONFIG
+    assert read_config(config_path + ".bak") == main.DEFAULT_CONFIG
+
+
+def test_unreadable_config_falls_back_to_backup(config_path):
+    write_config(config_path + ".bak", delay=321)
+    with open(config_path, 'w', encoding='utf-8') as f:
+        f.write('{"delay": ')
+    assert ConfigManager.load()["delay"] == 321
+
+
+@pytest.mark.parametrize("values", [
+    {"delay": True}, {"delay": -5}, {"delay": 0}, {"predictive": 1}, {"mapping": {"f13": "abc"}},
+    {"layouts": {"Polish": {"f13": [1]}}}, {"snippets": {";em": 5}},
+])
+def test_validate_rejects(values):
+    with pytest.raises(ValueError):
+        ConfigManager.validate(dict(main.DEFAULT_CONFIG, **values))
+
+
+def test_validate_accepts_defaults():
+    ConfigManager.validate(json.loads(json.dumps(main.DEFAULT_CONFIG)))
+
+
+def test_merge_updates_the_linked_mapping_in_place():
+    data = json.loads(json.dumps(main.DEFAULT_CONFIG))
+    data.update(layouts={"Plain": data["mapping"]}, active_layout="Plain", adaptive_model={"f13": 1})
+    mapping = data["mapping"]
+    new = dict(json.loads(json.dumps(data)), delay=700, adaptive_model={})
+    new["mapping"]["f13"] = ["x"]
+    assert ConfigManager.merge(data, new) == {"delay", "mapping"}
+    assert data["mapping"] is mapping and data["layouts"]["Plain"] is mapping
+    assert mapping["f13"] == ["x"] and data["adaptive_model"] == {"f13": 1}
+
+
+def test_link_layouts_keeps_the_mapping_as_default():
+    data = {"mapping": {"f13": ["a"]}, "layouts": {"Polish": {"f13": ["ą"]}}, "active_layout": ""}
+    ConfigManager.link_layouts(data)
+    assert data["active_layout"] == "Default" and data["layouts"]["Default"] is data["mapping"]
+
+
+def test_saves_are_collapsed_and_flushed(config_path, monkeypatch):
+    data = ConfigManager.load()
+    ConfigManager.flush()
+    writes = []
+    atomic_write = ConfigManager._atomic_write
+    monkeypatch.setattr(ConfigManager, "_atomic_write",
+                        staticmethod(lambda path, text: writes.append(path) or atomic_write(path, text)))
+    for delay in (300, 400, 500):
+        data["delay"] = delay
+        ConfigManager.save(data)
+    ConfigManager.flush()
+    ConfigManager.flush()  # nothing pending, nothing written
+    assert writes == [config_path, config_path + ".bak"]
+    assert read_config(config_path)["delay"] == 500
+
+
+def test_saves_wait_until_changes_settle(config_path, monkeypatch):
+    data = ConfigManager.load()
+    ConfigManager.flush()
+    writes = []
+    atomic_write = ConfigManager._atomic_write
+    monkeypatch.setattr(ConfigManager, "_atomic_write",
+                        staticmethod(lambda path, text: writes.append(path) or atomic_write(path, text)))
+    for delay in range(300, 420, 10):  # a drag lasting well over DEBOUNCE_S
+        data["delay"] = delay
+        ConfigManager.save(data)
+        time.sleep(ConfigManager.DEBOUNCE_S / 4)
+    assert writes == []
+    time.sleep(ConfigManager.DEBOUNCE_S * 4)
+    assert writes == [config_path, config_path + ".bak"]
+    assert read_config(config_path)["delay"] == 410
+
+
+def test_flush_waits_for_a_write_in_flight(config_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    active, overlaps = [], []
+    atomic_write = ConfigManager._atomic_write
+
+    def slow_write(path, text):
+        if active:
+            overlaps.append(path)
+        active.append(path)
+        started.set()
+        release.wait(2.0)
+        atomic_write(path, text)
+        active.pop()
+
+    monkeypatch.setattr(ConfigManager, "_atomic_write", staticmethod(slow_write))
+    data = json.loads(json.dumps(main.DEFAULT_CONFIG))
+    ConfigManager.save(dict(data, delay=300))
+    assert started.wait(2.0)  # the debounce timer is writing 300 ...
+    ConfigManager.save(dict(data, delay=400))
+    flusher = threading.Thread(target=ConfigManager.flush)
+    flusher.start()
+    flusher.join(0.2)
+    assert flusher.is_alive()  # ... and flush() waits for it instead of writing alongside
+    release.set()
+    flusher.join(2.0)
+    assert not flusher.is_alive() and not overlaps
+    assert read_config(config_path)["delay"] == 400
+    assert read_config(config_path + ".bak")["delay"] == 400
+
+
+def test_our_write_is_recorded_before_the_file_appears(config_path, monkeypatch):
+    data = ConfigManager.load()
+    ConfigManager.flush()
+    seen = []
+    atomic_write = ConfigManager._atomic_write
+
+    def watched_write(path, text):
+        if path == config_path:
+            seen.append(ConfigManager.last_written() == text)
+        atomic_write(path, text)
+
+    monkeypatch.setattr(ConfigManager, "_atomic_write", staticmethod(watched_write))
+    ConfigManager.save(dict(data, delay=300))
+    ConfigManager.flush()
+    assert seen == [True]  # a watcher polling mid-replace sees our own text
+
+
+def test_failed_write_is_tried_again(config_path, monkeypatch):
+    data = ConfigManager.load()
+    ConfigManager.flush()
+    atomic_write = ConfigManager._atomic_write
+
+    def failing_write(path, text):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(ConfigManager, "_atomic_write", staticmethod(failing_write))
+    ConfigManager.save(dict(data, delay=300))
+    ConfigManager.flush()
+    assert read_config(config_path)["delay"] != 300
+    monkeypatch.setattr(ConfigManager, "_atomic_write", staticmethod(atomic_write))
+    ConfigManager.save(dict(data, delay=300))
+    ConfigManager.flush()
+    assert read_config(config_path)["delay"] == 300
+
+
+
+# --- ConfigWatcher ---
+
+def test_watcher_reports_other_writers(config_path):
+    ConfigManager.load()
+    ConfigManager.flush()
+    changes = []
+    watcher = ConfigWatcher(config_path, changes.append)
+    try:
+        watcher.check()  # our own write
+        assert changes == []
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({"delay": 450}, f)
+        watcher.check()
+        assert changes[0]["delay"] == 450 and changes[0]["mapping"] == DEFAULT_MAPPING
+        with open(config_path, 'w', encoding='utf-8') as f:
+            f.write('{"delay": 0}')
+        watcher.check()
+        assert len(changes) == 1 and watcher.rejected == 1 and watcher.reloads == 1
+    finally:
+        watcher.close()
+
+
+# --- UiRefresh ---
+
+class FakeLabel:
+    def __init__(self):
+        self.texts = []
+
+    def config(self, text):
+        self.texts.append(text)
+
+
+class FakeKey:
+    def __init__(self):
+        self.states = []
+
+    def set_active(self, active):
+        self.states.append(active)
+
+
+def test_ui_refresh_coalesces_while_visible():
+    root = FakeRoot()
+    ui = UiRefresh(root)
+    label, keys = FakeLabel(), {"f13": FakeKey(), "f14": FakeKey()}
+    ui.attach(label, keys)
+    ui.set_status("one")
+    assert root.jobs == []  # hidden: only stored
+    ui.set_visible(True)
+    ui.set_status("two")
+    ui.set_active_key("f13")
+    ui.set_active_key("f14")
+    assert len(root.jobs) == 1
+    root.run()
+    assert label.texts == ["two"]
+    assert keys["f13"].states == [] and keys["f14"].states == [True]
+    ui.set_active_key(None)
+    root.run()
+    assert keys["f14"].states == [True, False] and label.texts == ["two"]
+
+
+# --- T9Engine ---
+
+def test_hooks_go_live_before_the_heavy_setup(hooks, monkeypatch):
+    seen = []
+    monkeypatch.setattr(main.keyboard, "hook", lambda callback, suppress=False: seen.append(
+        (hasattr(callback.__self__, "setup_thread"), dict(callback.__self__.core.layouts))))
+    config = dict(json.loads(json.dumps(main.DEFAULT_CONFIG)), output="keyboard",
+                  layouts={"Plain": DEFAULT_MAPPING, "Swapped": SWAPPED}, active_layout="Plain")
+    engine = T9Engine(None, FakeApp(None, config))
+    engine.setup_thread.join(5.0)
+    try:
+        assert seen == [(False, {})]  # installed before the setup thread, on the plain mapping
+        assert set(engine.core.layouts) == {"Plain", "Swapped"}
+    finally:
+        engine.shutdown()
+
+
+def test_view_updates_from_other_threads_are_queued(engine):
+    root = engine.root
+    time.sleep(0.05)
+    root.run()  # the first drain, and the setup thread's status updates
+    root.generated.clear()
+    sent = len(root.events)
+
+    def commit_on_scheduler_thread():
+        with engine.lock:  # the scheduler commits holding the lock; Tk must not be called here
+            engine.preview("a")
+            engine.status("busy")
+
+    thread = threading.Thread(target=commit_on_scheduler_thread)
+    thread.start()
+    thread.join(2.0)
+    assert not thread.is_alive()
+    assert root.generated.wait(2.0)
+    assert engine.overlay.calls == [] and "busy" not in engine.config_app.statuses
+    time.sleep(0.05)
+    # One wake for both updates, sent by the thread that holds no lock
+    assert root.events[sent:] == [("<<ViewQueue>>", "T9ViewWake")]
+    root.run()
+    assert engine.overlay.calls == [('show', 'a')] and "busy" in engine.config_app.statuses
+    assert root.jobs == []  # nothing polls while the queue is empty
+
+
+def test_engine_switches_layouts(engine, hooks):
+    written = hooks[1]
+    assert engine.switch_layout("Swapped")
+    assert engine.root.run_until(lambda: engine.config_app.layouts)
+    assert engine.config_app.layouts == ["Swapped"]
+    engine.process_key_gui_thread('f14')
+    engine.commit_char()
+    engine.output.wait_idle(1.0)
+    assert written == [DEFAULT_MAPPING['f15'][0]]
+
+
+# --- DaemonHost ---
+
+@pytest.fixture
+def daemon(config_path, user_dir, hooks):
+    write_config(config_path, daemon_overlay=False, output="keyboard",
+                 layouts={"Plain": DEFAULT_MAPPING, "Swapped": SWAPPED}, active_layout="Plain")
+    host = DaemonHost()
+    host.engine.setup_thread.join(5.0)
+    yield host
+    if not host.stopped.is_set():
+        host.quit()
+
+
+def test_daemon_takes_the_config_loaded_at_startup(config_path, user_dir, hooks, monkeypatch, capsys):
+    config = ConfigManager.load()  # no file yet: created from the defaults
+    config.update(daemon_overlay=False, output="keyboard")
+    monkeypatch.setattr(ConfigManager, "load", staticmethod(lambda: pytest.fail("config loaded twice")))
+    host = DaemonHost(config)
+    host.engine.setup_thread.join(5.0)
+    host.quit()
+    assert host.config_data is config
+    assert capsys.readouterr().out.count("Config not found") == 1
+
+
+def test_daemon_commands_need_the_control_file_token(daemon):
+    port, token = read_control_file()
+    assert send_command("delay 300", port) == {"error": "not authorized"}
+    assert send_command("delay 300", port, token=token) == {"ok": True}
+    assert daemon.config_data["delay"] == 300 and daemon.engine.core.delay_ms == 300
+    assert send_command("config", port, token=token)["delay"] == 300
+
+
+def test_daemon_switches_layout_and_saves_it(daemon, config_path):
+    port, token = read_control_file()
+    assert send_command('layout "Swapped"', port, token=token) == {"ok": True}
+    for _ in range(100):
+        if daemon.config_data["active_layout"] == "Swapped":
+            break
+        time.sleep(0.01)
+    assert daemon.config_data["mapping"] is daemon.config_data["layouts"]["Swapped"]
+    ConfigManager.flush()
+    assert read_config(config_path)["active_layout"] == "Swapped"
+
+
+def test_settings_push_only_what_they_changed(daemon):
+    remote = RemoteEngine(*read_control_file())
+    config = remote.fetch_config()  # the settings window opens on "Plain"
+    daemon.engine.switch_layout("Swapped")  # then a chord switches the daemon's layout
+    for _ in range(100):
+        if daemon.config_data["active_layout"] == "Swapped":
+            break
+        time.sleep(0.01)
+    config["delay"] = 321
+    remote.push_config(config)
+    assert daemon.config_data["delay"] == 321 and daemon.engine.core.delay_ms == 321
+    assert daemon.config_data["active_layout"] == "Swapped" and daemon.engine.core.layout == "Swapped"
+
+    config["mapping"]["f13"] = ["x"]  # a key edit goes to the layout the window shows
+    remote.push_config(config)
+    assert daemon.config_data["active_layout"] == "Plain"
+    assert daemon.config_data["layouts"]["Plain"]["f13"] == ["x"]
+    assert daemon.config_data["layouts"]["Swapped"] == SWAPPED
+
+
+def test_daemon_applies_config_file_edits(daemon, config_path):
+    write_config(config_path, daemon_overlay=False, output="keyboard", delay=650, chording=True,
+                 layouts={"Plain": DEFAULT_MAPPING, "Swapped": SWAPPED}, active_layout="Plain")
+    daemon.config_watcher.check()
+    assert daemon.engine.core.delay_ms == 650 and daemon.engine.chords is not None
+
+
+def test_daemon_follows_an_edit_of_active_layout_alone(daemon, hooks, config_path):
+    written = hooks[1]
+    ConfigManager.flush()
+    data = read_config(config_path)
+    data["active_layout"] = "Swapped"  # "mapping" still holds the Plain keys
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    daemon.config_watcher.check()
+    config = daemon.config_data
+    assert config["mapping"] is config["layouts"]["Swapped"]
+    assert config["layouts"] == {"Plain": DEFAULT_MAPPING, "Swapped": SWAPPED}
+    assert daemon.engine.core.layout == "Swapped"
+    daemon.engine.process_key_gui_thread('f14')
+    daemon.engine.commit_char()
+    daemon.engine.output.wait_idle(1.0)
+    assert written == [DEFAULT_MAPPING['f15'][0]]
+
+
+def test_daemon_quit_types_the_pending_character(daemon, hooks, config_path):
+    written = hooks[1]
+    port, token = read_control_file()
+    daemon.engine.process_key_gui_thread('f14')
+    assert send_command("quit", port, token=token) == {"ok": True}
+    assert daemon.stopped.wait(2.0)
+    assert written == ["a"]
+    assert not os.path.exists(control_file_path())
+    assert os.path.exists(config_path)
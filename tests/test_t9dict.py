@@ -0,0 +1,47 @@
+from t9core import DEFAULT_MAPPING, MultiTapCore, RecordingSink, StaticModifiers, VirtualClock
+from t9dict import encode_word, letter_codes, load_dictionary
+
+CODES = letter_codes(DEFAULT_MAPPING)
+
+
+def test_lookup_exact_and_stem(words_path):
+    dictionary = load_dictionary(words_path, DEFAULT_MAPPING)
+    try:
+        words, exact = dictionary.lookup(encode_word("hello", CODES))
+        assert exact and words[0] == "hello"
+        words, exact = dictionary.lookup(encode_word("hel", CODES))
+        assert not exact and len(words[0]) == 3
+        assert dictionary.lookup(bytes([9, 9, 9, 9, 9, 9])) == ([], False)
+    finally:
+        dictionary.close()
+
+
+def test_index_follows_the_mapping(words_path):
+    load_dictionary(words_path, DEFAULT_MAPPING).close()
+    swapped = dict(DEFAULT_MAPPING, f14=DEFAULT_MAPPING['f15'], f15=DEFAULT_MAPPING['f14'])
+    dictionary = load_dictionary(words_path, swapped)  # letters moved: the index is rebuilt
+    try:
+        assert dictionary.codes == letter_codes(swapped)
+        assert dictionary.lookup(encode_word("hello", letter_codes(swapped)))[0][0] == "hello"
+    finally:
+        dictionary.close()
+
+
+def test_missing_word_list(tmp_path):
+    assert load_dictionary(str(tmp_path / "none.txt"), DEFAULT_MAPPING) is None
+
+
+def test_predictive_typing(words_path):
+    dictionary = load_dictionary(words_path, DEFAULT_MAPPING)
+    sink = RecordingSink()
+    core = MultiTapCore(DEFAULT_MAPPING, sink, VirtualClock(), StaticModifiers())
+    core.set_dictionary(dictionary)
+    for key in ('f16', 'f18', 'f18', 'f15'):  # 4663
+        core.press(key)
+    first, second = core.word_candidates[:2]
+    assert {first, second} <= {"good", "home", "gone", "hood", "hoof"}
+    core.press('f13')  # next candidate
+    core.press('f23')  # space accepts the word
+    core.flush()
+    assert sink.text() == second + " "
+    dictionary.close()
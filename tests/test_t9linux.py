@@ -0,0 +1,132 @@
+import os
+import struct
+import threading
+import time
+
+import pytest
+
+t9linux = pytest.importorskip("t9linux")  # fcntl: not on Windows
+from t9core import MOD_CAPITAL, MOD_PLAIN
+from t9linux import (
+    CHAR_TABLE, EV_KEY, EVENT_FORMAT, KEY_DOWN, KEY_F13, KEY_LEFTSHIFT, KEY_UP, NAME_CODES, SYN,
+    LinuxBackend, UinputSink, pack_event,
+)
+
+F14, F15 = KEY_F13 + 1, KEY_F13 + 2
+DELAY_MS = 60
+
+
+def decode_output(data):
+    """Turns the virtual keyboard's event stream back into text."""
+    by_code = {(code, shift): c for c, (code, shift) in CHAR_TABLE.items()}
+    names = {code: name for name, code in NAME_CODES.items() if len(name) > 1}
+    out, shift = [], False
+    for _, _, ev_type, code, value in struct.iter_unpack(EVENT_FORMAT, data):
+        if ev_type != EV_KEY:
+            continue
+        if code == KEY_LEFTSHIFT:
+            shift = value != KEY_UP
+        elif value == KEY_DOWN:
+            out.append(by_code.get((code, shift)) or f"<{names.get(code, code)}>")
+    return "".join(out)
+
+
+def read_all(fd):
+    chunks = []
+    while True:
+        data = os.read(fd, 65536)
+        if not data:
+            break
+        chunks.append(data)
+    os.close(fd)
+    return b''.join(chunks)
+
+
+@pytest.fixture
+def keypads():
+    """Two pipes standing in for two keypads' evdev nodes, one for /dev/uinput; returns the typed text."""
+    dev_a_r, dev_a_w = os.pipe()
+    dev_b_r, dev_b_w = os.pipe()
+    out_r, out_w = os.pipe()
+    backend = LinuxBackend({"delay": DELAY_MS}, {"a": dev_a_r, "b": dev_b_r},
+                           UinputSink(out_w, create=False), grab=False)
+    reader = threading.Thread(target=backend.run, daemon=True)
+    reader.start()
+
+    def typed():
+        os.close(dev_a_w)
+        os.close(dev_b_w)
+        reader.join(2.0)
+        backend.close()
+        os.close(out_w)
+        return decode_output(read_all(out_r))
+
+    return dev_a_w, dev_b_w, typed
+
+
+def key(dev, code, value):
+    os.write(dev, pack_event(EV_KEY, code, value) + SYN)
+    time.sleep(0.002)  # keep the two pipes' events in this order
+
+
+def tap(dev, code):
+    key(dev, code, KEY_DOWN)
+    key(dev, code, KEY_UP)
+
+
+def settle():
+    time.sleep(DELAY_MS * 3 / 1000.0)
+
+
+def test_devices_keep_their_own_cycles(keypads):
+    dev_a, dev_b, typed = keypads
+    tap(dev_a, F14)
+    tap(dev_b, F14)  # the other operator's 'a' must not end A's cycle
+    tap(dev_a, F14)  # ... so A still gets 'b'; B commits first
+    settle()
+    tap(dev_a, F15)
+    settle()
+    key(dev_a, 42, KEY_DOWN)  # Shift from the device itself
+    tap(dev_a, F14)
+    key(dev_a, 42, KEY_UP)
+    settle()
+    tap(dev_a, 45)  # 'x' on a grabbed device passes through
+    time.sleep(0.05)
+    assert typed() == "abdAx"
+
+
+def test_forwarded_shift_does_not_reach_another_keypad(keypads):
+    dev_a, dev_b, typed = keypads
+    key(dev_b, 42, KEY_DOWN)  # held on the virtual keyboard ...
+    tap(dev_a, F15)           # ... but A's 'd' is lifted out of it
+    settle()
+    key(dev_b, 42, KEY_UP)
+    time.sleep(0.05)
+    assert typed() == "d"
+
+
+def test_modifier_state_per_device():
+    backend = LinuxBackend({"delay": 10_000}, {"a": os.open(os.devnull, os.O_RDONLY),
+                                               "b": os.open(os.devnull, os.O_RDONLY)},
+                           UinputSink(os.open(os.devnull, os.O_WRONLY), create=False), grab=False)
+    backend.handle("b", EV_KEY, 42, KEY_DOWN)
+    assert backend.router.get("b").core.modifiers.snapshot() == MOD_CAPITAL
+    assert backend.router.get("a").core.modifiers.snapshot() == MOD_PLAIN
+    backend.close()
+    backend.sink.close()
+
+
+def test_held_shift_brackets_output():
+    out_r, out_w = os.pipe()
+    sink = UinputSink(out_w, create=False)
+    sink.forward(KEY_LEFTSHIFT, KEY_DOWN)
+    sink.write("A1")
+    sink.send("ctrl+comma")
+    sink.forward(KEY_LEFTSHIFT, KEY_UP)
+    os.close(out_w)
+    data = read_all(out_r)
+    shift = [value for _, _, ev_type, code, value in struct.iter_unpack(EVENT_FORMAT, data)
+             if ev_type == EV_KEY and code == KEY_LEFTSHIFT]
+    # Forwarded down; lifted before each sequence and down again after it ("A" has its own tap); forwarded up
+    assert shift == [KEY_DOWN, KEY_UP, KEY_DOWN, KEY_UP, KEY_DOWN, KEY_UP, KEY_DOWN, KEY_UP]
+    assert decode_output(data) == "A1<ctrl>,"
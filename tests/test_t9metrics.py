@@ -0,0 +1,53 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from t9metrics import (
+    Histogram, Metrics, StatsServer, read_control_file, remove_control_file, send_command, write_control_file,
+)
+
+
+def test_histogram_percentiles():
+    hist = Histogram()
+    for us in range(1, 101):
+        hist.record(us / 1e6)
+    assert hist.total == 100
+    assert 50 <= hist.percentile(50) <= 64
+    assert hist.percentile(99) == hist.max_us == 100
+
+
+@pytest.fixture
+def server():
+    calls = []
+    server = StatsServer(Metrics().snapshot, 0, commands={"delay": lambda v: calls.append(v) or {"ok": True}})
+    server.calls = calls
+    yield server
+    server.close()
+
+
+def test_os_chooses_the_port(server):
+    assert server.port != 0
+
+
+def test_commands_need_the_token(server):
+    assert send_command("delay 500", server.port) == {"error": "not authorized"}
+    assert send_command("delay 500", server.port, token="0" * 32) == {"error": "not authorized"}
+    assert send_command("delay 500", server.port, token=server.token) == {"ok": True}
+    assert server.calls == [500]
+
+
+def test_stats_stay_readable(server):
+    assert "error" not in send_command("stats", server.port)
+
+
+def test_control_file_is_private(user_dir, server):
+    (user_dir / "mouse_t9keypad_control.json").write_text("{}")
+    path = write_control_file(server.port, server.token)
+    assert os.path.dirname(path) == str(user_dir)
+    if sys.platform != 'win32':
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert read_control_file() == (server.port, server.token)
+    remove_control_file()
+    assert not os.path.exists(path)
@@ -0,0 +1,26 @@
+from t9ngram import NextWordModel
+
+TEXT = ("the quick brown fox jumps over the lazy dog. the quick brown cat sleeps on the warm mat. "
+        "thank you for your message. i will call you back in the morning. ") * 3
+
+
+def test_learns_and_persists(tmp_path):
+    base = str(tmp_path / "ngrams")
+    model = NextWordModel(base).load()
+    model.feed(TEXT)
+    model.close()
+    model = NextWordModel(base).load()  # everything comes back from the journal
+
+    words = TEXT.split()
+    hits = 0
+    for word in words:
+        if word.strip('.') in model.suggest():
+            hits += 1
+        model.feed(word + ' ')
+    assert hits > len(words) * 0.8
+
+    model.compact()
+    model.close()
+    reloaded = NextWordModel(base).load()
+    assert reloaded.bigrams.get('quick') == model.bigrams.get('quick')
+    reloaded.close()
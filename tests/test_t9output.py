@@ -0,0 +1,48 @@
+import threading
+
+from t9core import RecordingSink
+from t9output import OutputQueue
+
+
+class GatedSink(RecordingSink):
+    """Holds the first write until released, so the queue fills up behind it."""
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.started.set()
+        self.release.wait(2.0)
+        super().write(text)
+
+
+def test_writes_merge_and_sends_stay_in_place():
+    sink = GatedSink()
+    output = OutputQueue(sink)
+    output.write("a")
+    assert sink.started.wait(2.0)
+    for payload in ("b", "c"):
+        output.write(payload)
+    output.send("enter")
+    output.write("d")
+    assert output.depth() == 5
+    sink.release.set()
+    assert output.wait_idle(2.0)
+    output.close()
+    assert sink.events == [('write', 'a'), ('write', 'bc'), ('send', 'enter'), ('write', 'd')]
+    assert output.stats()["items"] == 5 and output.depth() == 0
+
+
+def test_a_failing_injection_does_not_stop_the_writer():
+    class FailingSink(RecordingSink):
+        def send(self, keys):
+            raise OSError("blocked")
+
+    sink = FailingSink()
+    output = OutputQueue(sink)
+    output.send("enter")
+    output.write("x")
+    assert output.wait_idle(2.0)
+    output.close()
+    assert sink.events == [('write', 'x')]
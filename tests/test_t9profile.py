@@ -0,0 +1,52 @@
+import os
+import threading
+
+from t9profile import Profiler
+
+
+def busy_work(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profiled_calls_show_up_in_the_report(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    assert profiler.call(busy_work, 10) == 285  # off: a plain call
+    profiler.start()
+    assert profiler.call(busy_work, 1000) == busy_work(1000)
+    path = profiler.stop()
+    with open(path, encoding='utf-8') as f:
+        report = f.read()
+    assert "busy_work" in report and "Allocation sites" in report
+    assert os.path.exists(path[:-len(".txt")] + ".pstats")
+
+
+def test_overlapping_calls_from_two_threads(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    both_inside = threading.Barrier(2, timeout=2.0)
+    results, errors = [], []
+
+    def hook_side(n):
+        both_inside.wait()  # the other thread is inside its profiled call too
+        return busy_work(n)
+
+    def commit_side(n):
+        both_inside.wait()
+        return busy_work(n) + 1
+
+    def run(func, n):
+        try:
+            results.append(profiler.call(func, n))
+        except Exception as e:
+            errors.append(e)
+
+    profiler.start()
+    threads = [threading.Thread(target=run, args=(func, 100)) for func in (hook_side, commit_side)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+    path = profiler.stop()
+    assert errors == [] and sorted(results) == [328350, 328351]
+    with open(path, encoding='utf-8') as f:
+        report = f.read()
+    assert "hook_side" in report and "commit_side" in report
@@ -0,0 +1,52 @@
+import os
+
+from t9core import KEY_NAMES
+from t9record import HEADER_SIZE, RECORD, SessionRecorder, format_record, iter_records
+
+
+def test_records_read_back(tmp_path):
+    path = str(tmp_path / "session.t9rec")
+    recorder = SessionRecorder(path)
+    recorder.hook('f14', True, 0, 0x64)
+    recorder.preview('f14', 'ą')
+    recorder.commit('f14', 'żółć' * 4)
+    recorder.output(False, 'ą', 42e-6)
+    recorder.close()
+    got = [format_record(r) for r in iter_records(path)]
+    assert len(got) == 4
+    assert "'ą'" in got[1] and "cut, 32 bytes" in got[2] and "inject=42 us" in got[3]
+
+
+def test_rotation_bounds_the_files(tmp_path):
+    path = str(tmp_path / "session.t9rec")
+    # Tiny files and ring, so rotation and the ring wrap are both exercised
+    recorder = SessionRecorder(path, max_bytes=HEADER_SIZE + 1000 * RECORD.size, ring_records=256)
+    for i in range(20000):
+        recorder.hook(KEY_NAMES[i % 12], True, 0, i)
+        if i % 200 == 0:
+            recorder.flush()  # stands in for the flush thread, which wakes at half a ring
+    recorder.close()
+    current = sum(1 for _ in iter_records(path))
+    previous = sum(1 for _ in iter_records(path + ".1"))
+    assert recorder.dropped == 0
+    assert current + previous <= 2000
+    assert os.path.getsize(path) <= HEADER_SIZE + 1000 * RECORD.size
+
+
+def test_new_session_keeps_the_previous_log(tmp_path):
+    path = str(tmp_path / "session.t9rec")
+    recorder = SessionRecorder(path, max_bytes=HEADER_SIZE + 10 * RECORD.size)
+    for i in range(15):
+        recorder.commit('f14', str(i))
+    recorder.close()
+    current = sum(1 for _ in iter_records(path))
+    previous = sum(1 for _ in iter_records(path + ".1"))
+
+    SessionRecorder(path).close()
+    assert sum(1 for _ in iter_records(path)) == 0
+    assert not os.path.exists(path + ".1")
+    assert sum(1 for _ in iter_records(path + ".prev")) == current
+    assert sum(1 for _ in iter_records(path + ".prev.1")) == previous
+
+    SessionRecorder(path).close()  # a session without a .1 leaves no stale .prev.1 behind
+    assert not os.path.exists(path + ".prev.1")
@@ -0,0 +1,43 @@
+import random
+
+from t9snippet import SnippetAutomaton, SnippetExpander
+
+
+def test_expansion_across_commits():
+    expander = SnippetExpander(SnippetAutomaton({";em": "jan@example.com", "sig": "Regards,\nJan", "ig": "!"}))
+    typed = [expander.feed(c) for c in ";e"] + [expander.feed("m sig")]
+    assert typed == [";", "e", "\b\bjan@example.com Regards,\nJan"]
+
+
+def test_backspace_steps_back():
+    expander = SnippetExpander(SnippetAutomaton({";em": "jan@example.com"}))
+    expander.feed(";e")
+    expander.key('backspace')
+    assert expander.feed("em") == "\bjan@example.com"  # ";" stayed, "e" was deleted
+
+
+def test_longest_match_wins():
+    expander = SnippetExpander(SnippetAutomaton({"sig": "Regards,\nJan", "ig": "!"}))
+    expander.feed("s")
+    assert expander.feed("ig") == "\bRegards,\nJan"
+    assert expander.feed("xig") == "x!"
+
+
+def test_matches_a_naive_scan():
+    rng = random.Random(7)
+    alphabet = "abcdefghij;"
+    snippets = {''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 8))): "<X>" for _ in range(2000)}
+    stream = ''.join(rng.choice(alphabet) for _ in range(50000))
+    expander = SnippetExpander(SnippetAutomaton(snippets))
+    fired = sum(expander.feed(ch) != ch for ch in stream)
+
+    naive = 0
+    since = 0  # characters since the last expansion
+    for i in range(len(stream)):
+        since += 1
+        for length in range(min(since, 8), 2, -1):
+            if stream[i + 1 - length:i + 1] in snippets:
+                naive += 1
+                since = 0
+                break
+    assert fired == naive == expander.expansions
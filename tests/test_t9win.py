@@ -0,0 +1,136 @@
+import sys
+
+import pytest
+
+from t9core import DEFAULT_MAPPING, CompiledMapping
+from t9win import (
+    KEYEVENTF_EXTENDEDKEY, KEYEVENTF_KEYUP, KEYEVENTF_UNICODE, Layout, SendInputSink, bracket, plan_char,
+)
+
+
+class FakeUSLayout(Layout):
+    """Unshifted US keys only, so the plans can be checked off Windows."""
+    PLAIN = "`1234567890-=[]\\;',./ "
+
+    def vk_scan(self, ch):
+        return (ord(ch), 0x10 + self.PLAIN.index(ch)) if ch in self.PLAIN else None
+
+    def scan(self, vk):
+        return 0x1C
+
+
+class FakeUser32:
+    """The User32 calls SendInputSink makes, with a US layout and settable held keys."""
+    def __init__(self):
+        self.held = set()
+        self.sent = []
+
+    def GetForegroundWindow(self):
+        return 1
+
+    def GetWindowThreadProcessId(self, hwnd, pid):
+        return 2
+
+    def GetKeyboardLayout(self, thread_id):
+        return 0x0409
+
+    def VkKeyScanExW(self, ch, hkl):
+        return ord(ch) if ch in FakeUSLayout.PLAIN else -1
+
+    def MapVirtualKeyExW(self, vk, map_type, hkl):
+        return 0x1C
+
+    def GetAsyncKeyState(self, vk):
+        return -0x8000 if vk in self.held else 0
+
+    def SendInput(self, count, batch, size):
+        self.sent.append([(e.u.ki.wVk, e.u.ki.wScan, e.u.ki.dwFlags) for e in batch])
+        return count
+
+
+@pytest.fixture
+def keyboard_parser(monkeypatch):
+    """The real keyboard module; off Windows its name table (dumpkeys) is stubbed, the parser is not."""
+    keyboard = pytest.importorskip("keyboard")
+    if sys.platform != 'win32':
+        monkeypatch.setattr(keyboard._os_keyboard, "map_name", lambda name: iter(((1, ()),)))
+    return keyboard
+
+
+@pytest.fixture
+def sink(keyboard_parser):
+    sink = SendInputSink.__new__(SendInputSink)  # without loading User32.dll
+    sink.keyboard = keyboard_parser
+    sink.user32 = FakeUser32()
+    sink.texts = frozenset()
+    sink.hotkeys = {}
+    sink.layouts = {}
+    sink.layout_misses = 0
+    return sink
+
+
+@pytest.mark.parametrize("ch, events", [
+    ('1', ((ord('1'), 0x11, 0), (ord('1'), 0x11, KEYEVENTF_KEYUP))),
+    ('\n', ((0x0D, 0x1C, 0), (0x0D, 0x1C, KEYEVENTF_KEYUP))),
+    ('a', ((0, ord('a'), KEYEVENTF_UNICODE), (0, ord('a'), KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))),
+    ('ą', ((0, 0x0105, KEYEVENTF_UNICODE), (0, 0x0105, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))),
+    ('!', ((0, ord('!'), KEYEVENTF_UNICODE), (0, ord('!'), KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))),
+])
+def test_plan_char(ch, events):
+    assert plan_char(ch, FakeUSLayout(0x0409)) == events
+
+
+def test_batches_are_prepared_once():
+    layout = FakeUSLayout(0x0409)
+    assert [e[1] for e in layout.events('\U0001F600')] == [0xD83D, 0xD83D, 0xDE00, 0xDE00]
+    assert len(layout.batch("zażółć 1")) == 16
+    assert layout.batch("ż") is layout.batch("ż")
+
+
+def test_bracket_releases_held_modifiers():
+    layout = FakeUSLayout(0x0409)
+    held = [(e.u.ki.wVk, e.u.ki.dwFlags) for e in bracket(layout.batch("1"), (0xA0, 0xA3), layout)]
+    assert held == [(0xA0, KEYEVENTF_KEYUP), (0xA3, KEYEVENTF_EXTENDEDKEY | KEYEVENTF_KEYUP),
+                    (ord('1'), 0), (ord('1'), KEYEVENTF_KEYUP), (0xA0, 0), (0xA3, KEYEVENTF_EXTENDEDKEY)]
+
+
+def test_prepare_default_mapping_with_real_parser(sink):
+    sink.prepare(CompiledMapping(DEFAULT_MAPPING))
+    assert sink.hotkeys['ctrl+comma'] is not None
+    assert sink.hotkeys['ctrl+shift+space'] is not None
+    assert sink.hotkeys['backspace'] is not None
+    assert "a" in sink.texts and 0x0409 in sink.layouts
+
+
+def test_unparseable_payload_is_skipped(sink, monkeypatch):
+    sink.prepare(CompiledMapping({'f13': ['a'], 'f14': ['ENTER']}))
+    sink.hotkeys['ctrl+,'] = None  # what parse_hotkeys records for one it cannot parse
+    sent = []
+    monkeypatch.setattr(sink.keyboard, "send", sent.append)
+    sink.send('ctrl+,')
+    sink.send('enter')
+    assert sent == [sink.hotkeys['enter']]
+
+
+def test_write_lifts_held_shift(sink):
+    sink.prepare(CompiledMapping(DEFAULT_MAPPING))
+    sink.user32.held = {0xA0}
+    sink.write("1")
+    assert sink.user32.sent[-1] == [(0xA0, 0x1C, KEYEVENTF_KEYUP), (ord('1'), 0x1C, 0),
+                                    (ord('1'), 0x1C, KEYEVENTF_KEYUP), (0xA0, 0x1C, 0)]
+    sink.user32.held = set()
+    sink.write("1")
+    assert len(sink.user32.sent[-1]) == 2
+
+
+def test_send_lifts_held_ctrl(sink, monkeypatch):
+    sink.prepare(CompiledMapping(DEFAULT_MAPPING))
+    monkeypatch.setattr(sink.keyboard, "send", lambda hotkey: sink.user32.sent.append(hotkey))
+    sink.user32.held = {0xA3}
+    sink.send('enter')
+    assert sink.user32.sent == [[(0xA3, 0x1C, KEYEVENTF_EXTENDEDKEY | KEYEVENTF_KEYUP)],
+                                sink.hotkeys['enter'],
+                                [(0xA3, 0x1C, KEYEVENTF_EXTENDEDKEY)]]
+    sink.user32.held = set()
+    sink.send('enter')
+    assert sink.user32.sent[3:] == [sink.hotkeys['enter']]